@@ -0,0 +1,237 @@
+"""Controle de admissão: vagas de renderização e fila de espera globais, compartilhadas entre threads e processos."""
+
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: o limite vale só dentro do processo
+    fcntl = None  # type: ignore[assignment]
+
+
+# Renderizações simultâneas (entre threads e processos) e fila de espera
+RENDER_MAX_CONCURRENCY = int(os.environ.get("GERADOR_MAX_RENDERS", "0")) or (os.cpu_count() or 2)
+RENDER_MAX_QUEUE = int(os.environ.get("GERADOR_MAX_QUEUE", "8"))
+RENDER_QUEUE_TIMEOUT_S = float(os.environ.get("GERADOR_QUEUE_TIMEOUT_S", "60"))
+RENDER_SLOTS_DIR = os.environ.get("GERADOR_SLOTS_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_slots"
+)
+
+
+class RenderBusyError(Exception):
+    """Fila de renderização cheia (ou espera estourou o tempo): tente de novo em `retry_after_s`."""
+
+    def __init__(self, message: str, retry_after_s: int) -> None:
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe, mas é de outro usuário
+    return True
+
+
+class RenderAdmission:
+    """Semáforo de renderização compartilhado entre threads e processos.
+
+    Cada vaga é um arquivo em `slots_dir` travado com flock; como o flock vale por descritor
+    aberto, ele separa tanto processos (Flask com vários workers + Streamlit) quanto threads.
+    A fila de espera também é global: quem espera segura uma "senha" (outro arquivo travado);
+    sem senha livre, a renderização é recusada na hora com uma sugestão de nova tentativa.
+
+    Quem trava um arquivo grava nele o próprio pid (e apaga ao soltar). A contagem de ocupação
+    (stats, is_saturated) só lê esses pids: travar para contar ocuparia vagas de verdade por
+    um instante e faria renderizações concorrentes serem recusadas sem carga real.
+    """
+
+    def __init__(self, slots_dir: str, max_concurrency: int, max_queue: int, timeout_s: float) -> None:
+        self.slots_dir = slots_dir
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._held_local: set[str] = set()
+        self._stats = {"admitted": 0, "rejected": 0, "timeouts": 0, "in_flight": 0, "waiting": 0}
+        self._wait_total_s = 0.0
+        self._wait_max_s = 0.0
+        self._wait_last_s = 0.0
+        self._render_avg_s = 10.0  # média móvel da duração das renderizações (para o Retry-After)
+        os.makedirs(slots_dir, exist_ok=True)
+
+    def _paths(self, kind: str, count: int) -> list[str]:
+        return [os.path.join(self.slots_dir, f"{kind}-{index}.lock") for index in range(count)]
+
+    def _try_lock(self, path: str) -> Any:
+        if fcntl is None:
+            with self._lock:
+                if path in self._held_local:
+                    return None
+                self._held_local.add(path)
+                return path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        try:
+            # Marca de ocupação para os leitores (_count_held), que não travam nada
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, f"{os.getpid()} {time.time():.0f}\n".encode("ascii"), 0)
+        except OSError:
+            pass
+        return fd
+
+    def _unlock(self, handle: Any) -> None:
+        if fcntl is None:
+            with self._lock:
+                self._held_local.discard(handle)
+            return
+        try:
+            os.ftruncate(handle, 0)  # apaga a marca antes de soltar a trava
+        except OSError:
+            pass
+        try:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            os.close(handle)
+
+    def _try_any(self, paths: list[str]) -> Any:
+        for path in paths:
+            handle = self._try_lock(path)
+            if handle is not None:
+                return handle
+        return None
+
+    def _count_held(self, paths: list[str]) -> int:
+        """Quantos arquivos estão ocupados, pela marca gravada por quem os travou (só leitura)."""
+        if fcntl is None:
+            with self._lock:
+                return sum(1 for path in paths if path in self._held_local)
+        held = 0
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    pid = int(f.read(64).split()[0])
+            except (OSError, ValueError, IndexError):
+                continue  # livre (vazio) ou nunca usado
+            if _pid_alive(pid):
+                held += 1  # marca de processo morto: a trava já foi solta pelo kernel
+        return held
+
+    def retry_after_s(self) -> int:
+        with self._lock:
+            avg = self._render_avg_s
+        queued = self._count_held(self._paths("queue", self.max_queue))
+        return max(1, math.ceil(avg * (queued + 1) / self.max_concurrency))
+
+    def is_saturated(self) -> bool:
+        """True se uma nova renderização seria recusada agora (todas as vagas e senhas ocupadas)."""
+        slots = self._paths("slot", self.max_concurrency)
+        tickets = self._paths("queue", self.max_queue)
+        return self._count_held(slots) >= len(slots) and self._count_held(tickets) >= len(tickets)
+
+    @contextmanager
+    def slot(self) -> Iterator[float]:
+        """Ocupa uma vaga de renderização; devolve o tempo de espera em segundos."""
+        slots = self._paths("slot", self.max_concurrency)
+        start = time.monotonic()
+        handle = self._try_any(slots)
+        if handle is None:
+            ticket = self._try_any(self._paths("queue", self.max_queue))
+            if ticket is None:
+                with self._lock:
+                    self._stats["rejected"] += 1
+                raise RenderBusyError("Fila de renderização cheia.", self.retry_after_s())
+            with self._lock:
+                self._stats["waiting"] += 1
+            try:
+                delay = 0.05
+                deadline = start + self.timeout_s
+                while handle is None and time.monotonic() < deadline:
+                    time.sleep(delay)
+                    delay = min(delay * 1.5, 0.5)
+                    handle = self._try_any(slots)
+            finally:
+                self._unlock(ticket)
+                with self._lock:
+                    self._stats["waiting"] -= 1
+            if handle is None:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise RenderBusyError("Tempo de espera na fila esgotado.", self.retry_after_s())
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self._stats["admitted"] += 1
+            self._stats["in_flight"] += 1
+            self._wait_total_s += waited
+            self._wait_max_s = max(self._wait_max_s, waited)
+            self._wait_last_s = waited
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self._unlock(handle)
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._render_avg_s = 0.8 * self._render_avg_s + 0.2 * (time.monotonic() - started)
+
+    def stats(self) -> dict[str, Any]:
+        global_in_flight = self._count_held(self._paths("slot", self.max_concurrency))
+        global_waiting = self._count_held(self._paths("queue", self.max_queue))
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+            admitted = stats["admitted"]
+            stats.update({
+                "limit": self.max_concurrency,
+                "queue_limit": self.max_queue,
+                "global_in_flight": global_in_flight,
+                "global_waiting": global_waiting,
+                "free_slots": max(self.max_concurrency - global_in_flight, 0),
+                "wait_avg_s": round(self._wait_total_s / admitted, 3) if admitted else 0.0,
+                "wait_max_s": round(self._wait_max_s, 3),
+                "wait_last_s": round(self._wait_last_s, 3),
+                "render_avg_s": round(self._render_avg_s, 3),
+            })
+        return stats
+
+
+_admission: RenderAdmission | None = None
+_admission_lock = threading.Lock()
+
+def get_admission() -> RenderAdmission:
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = RenderAdmission(
+                RENDER_SLOTS_DIR, RENDER_MAX_CONCURRENCY, RENDER_MAX_QUEUE, RENDER_QUEUE_TIMEOUT_S
+            )
+        return _admission
+
+def admission_stats() -> dict[str, Any]:
+    return get_admission().stats()
+
+
+# Lidos na hora da raspagem do /metrics (contam todos os processos que dividem RENDER_SLOTS_DIR)
+metrics.gauge("gerador_render_slots_in_use", "Vagas de renderização ocupadas (global)").set_function(
+    lambda: admission_stats()["global_in_flight"]
+)
+metrics.gauge("gerador_render_slots_free", "Vagas de renderização livres (global)").set_function(
+    lambda: admission_stats()["free_slots"]
+)
+metrics.gauge("gerador_render_queue_waiting", "Renderizações esperando vaga (global)").set_function(
+    lambda: admission_stats()["global_waiting"]
+)
@@ -1,90 +1,105 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import Flask, Response, render_template, request, send_file, jsonify
 from flask_cors import CORS
-import os
-import tempfile
-import subprocess
-import shutil
-import time
-import sys
-from datetime import datetime
+from typing import Any
 from werkzeug.utils import secure_filename
 
+import metrics
+
+from admission import RENDER_MAX_QUEUE
+from artifacts import ARTIFACT_ENCODINGS
+from utils_render import get_render_engine
+
 app = Flask(__name__)
 CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limite de 16MB para upload
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# Long-poll: tempo máximo que /status segura a requisição esperando o job terminar
+MAX_STATUS_WAIT_S = 25.0
+
+# Cache dos ativos endereçados por conteúdo (/assets/): um ano
+ASSET_MAX_AGE_S = 365 * 24 * 3600
+
+# Motor compartilhado com o Streamlit e o build; as requisições HTTP só enfileiram no
+# pool de jobs dele e retornam na hora
+engine = get_render_engine()
+render_jobs = engine.jobs
+# Aquece o Quarto/tema em segundo plano; /ready só responde 200 depois disso
+engine.start_warmup()
+
+metrics.gauge('gerador_jobs', 'Jobs do pool de renderização do Flask, por estado', ('status',)).set_function(
+    lambda: {(status,): render_jobs.stats()[status] for status in ('queued', 'running')}
+)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def _copy_template(src: str, dst: str) -> None:
-    ignore = shutil.ignore_patterns(
-        '.quarto',
-        '_site',
-        '*.html',
-        '*.pdf',
-        '*.log',
+def _executar_render(
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    uploads: list[tuple[str, bytes]],
+    perfil: bool | None = None,
+) -> tuple[dict[str, Any], int]:
+    """Roda no pool: renderiza e grava o HTML para download. Retorna (payload JSON, status HTTP)."""
+    # Renderização compartilhada com o Streamlit (inclui o cache em disco)
+    html_bytes, erro, debug = engine.render(
+        titulo=titulo,
+        subtitulo=subtitulo,
+        instituto=instituto,
+        conteudo=conteudo,
+        uploaded_files=uploads,
+        profile=perfil,
     )
-    shutil.copytree(src, dst, dirs_exist_ok=True, ignore=ignore)
-
-
-def _safe_rmtree(path: str, attempts: int = 6, delay_s: float = 0.25) -> None:
-    if not os.path.exists(path):
-        return
-    last_exc: Exception | None = None
-    for _ in range(attempts):
-        try:
-            shutil.rmtree(path)
-            return
-        except Exception as exc:
-            last_exc = exc
-            time.sleep(delay_s)
-    # Em Windows, arquivos podem ficar em uso (lock). Não derrubar o servidor por isso.
-    try:
-        shutil.rmtree(path, ignore_errors=True)
-    except Exception:
-        if last_exc:
-            raise last_exc
-
-
-def _find_rendered_html(work_dir: str) -> str | None:
-    candidates = [
-        os.path.join(work_dir, "apresentacao.html"),
-        os.path.join(work_dir, "_site", "apresentacao.html"),
-        os.path.join(work_dir, "_site", "index.html"),
-    ]
-    for candidate in candidates:
-        if os.path.exists(candidate):
-            return candidate
-
-    # Fallback: procurar recursivamente (Quarto pode colocar em subpastas dependendo do project/output-dir)
-    found_html: list[str] = []
-    found_apresentacao: list[str] = []
-    for root, dirs, files in os.walk(work_dir):
-        # evita passear por caches muito grandes se existirem
-        dirs[:] = [d for d in dirs if d not in {".quarto", "node_modules"}]
-        for filename in files:
-            if filename.lower().endswith(".html"):
-                full_path = os.path.join(root, filename)
-                found_html.append(full_path)
-                if filename.lower() == "apresentacao.html":
-                    found_apresentacao.append(full_path)
-
-    if found_apresentacao:
-        # preferir o mais "raso" (mais próximo do work_dir)
-        found_apresentacao.sort(key=lambda p: p.count(os.sep))
-        return found_apresentacao[0]
-
-    if len(found_html) == 1:
-        return found_html[0]
-
-    # Se houver vários, preferir index.html dentro de _site
-    for p in found_html:
-        if p.lower().endswith(os.sep + "_site" + os.sep + "index.html"):
-            return p
-    return None
+
+    if erro:
+        if debug.get('busy'):
+            return {'erro': erro, 'retry_after': debug.get('retry_after')}, 429
+        if 'exit_code' in debug and debug['exit_code'] is None:
+            return {
+                'erro': 'Comando "quarto" não encontrado',
+                'detalhes': 'Certifique-se de que o Quarto CLI está instalado e no PATH do sistema. Baixe em: https://quarto.org/docs/get-started/'
+            }, 500
+        erro_detalhado = (
+            f"Erro do Quarto:\n\nSTDOUT:\n{debug.get('stdout', '')}"
+            f"\n\nSTDERR:\n{debug.get('stderr', '')}"
+            f"\n\nCódigo de saída: {debug.get('exit_code')}"
+        )
+        return {'erro': erro, 'detalhes': erro_detalhado}, 500
+
+    # Guarda para download (já com as variantes comprimidas)
+    artifact_id = engine.artifacts.put(html_bytes)
+    payload = {'sucesso': True, 'arquivo': f'{artifact_id}.html'}
+    if 'profile' in debug:
+        # Só o id: os arquivos do perfil ficam no servidor (GERADOR_PROFILE_DIR)
+        payload['perfil'] = debug['profile']['id']
+    return payload, 200
+
+
+def _ocupado(retry_after: int):
+    response = jsonify({
+        'erro': f'Servidor ocupado gerando outras apresentações. Tente novamente em {retry_after} s.',
+        'retry_after': retry_after,
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _job_payload(job: dict[str, Any]) -> dict[str, Any]:
+    payload: dict[str, Any] = {'job': job['id'], 'status': job['status']}
+    if job['status'] == 'queued':
+        payload['posicao'] = job.get('position')
+    elif job['status'] == 'done':
+        resultado, _codigo = job['result']
+        payload.update(resultado)
+    elif job['status'] == 'error':
+        payload['erro'] = job.get('error', 'Erro desconhecido')
+    return payload
+
 
 @app.route('/')
 def index():
@@ -98,145 +113,119 @@ def gerar_apresentacao():
         subtitulo = request.form.get('subtitulo', 'Autor')
         instituto = request.form.get('instituto', 'Instituto Federal de Sergipe')
         conteudo = request.form.get('conteudo', '')
-        
-        # Criar diretório temporário (não usar TemporaryDirectory aqui por causa de locks do Quarto no Windows)
-        tmpdirname = tempfile.mkdtemp(prefix="gerador_apresentacao_")
-        try:
-            # Copiar template
-            base_path = os.path.dirname(os.path.abspath(__file__))
-            template_path = os.path.join(base_path, "template")
-            work_dir = os.path.join(tmpdirname, "projeto")
-            
-            if os.path.exists(template_path):
-                _copy_template(template_path, work_dir)
-            else:
-                return jsonify({'erro': 'Template não encontrado'}), 500
-            
-            # Criar pasta de imagens
-            figuras_dir = os.path.join(work_dir, "Figuras")
-            os.makedirs(figuras_dir, exist_ok=True)
-            
-            # Salvar imagens enviadas
-            if 'imagens' in request.files:
-                imagens = request.files.getlist('imagens')
-                for imagem in imagens:
-                    if imagem and allowed_file(imagem.filename):
-                        filename = secure_filename(imagem.filename)
-                        imagem.save(os.path.join(figuras_dir, filename))
-            
-            # Criar arquivo .qmd
-            qmd_content = f"""---
-title: "{titulo}"
-subtitle: "{subtitulo}"
-institute: "{instituto}"
-date: today
-date-format: "D [de] MMMM [de] YYYY"
-lang: pt-BR
-title-slide-attributes:
-  class: title-slide
-format:
-  revealjs:
-    theme: [simple, assets/ufs.scss]
-    css: assets/custom.css
-    logo: assets/logo_IFS.png
-    footer: "IFS | Apresentação do TCC"
-    slide-number: true
-    controls: true
-    width: 1280
-    height: 720
-    transition: slide
-    background-transition: fade
-    preview-links: auto
----
-
-{conteudo}
-"""
-            
-            qmd_path = os.path.join(work_dir, "apresentacao.qmd")
-            with open(qmd_path, "w", encoding="utf-8") as f:
-                f.write(qmd_content)
-            
-            # Executar Quarto
-            # Observação: o template original é um projeto Quarto com output-dir: _site.
-            # Tentamos sobrescrever para gerar na raiz, mas também tratamos o caso de sair em _site/.
-            cmd = [
-                "quarto",
-                "render",
-                "apresentacao.qmd",
-                "--to",
-                "revealjs",
-                "--embed-resources",
-                "--output-dir",
-                ".",
-            ]
-            
-            try:
-                env = os.environ.copy()
-                env["QUARTO_PYTHON"] = sys.executable
-                result = subprocess.run(
-                    cmd,
-                    cwd=work_dir,
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8',
-                    check=False,
-                    env=env,
-                )
-                
-                # Verificar se o arquivo foi gerado (pode ir para _site/ dependendo do _quarto.yml)
-                output_file = _find_rendered_html(work_dir)
-
-                if not output_file:
-                    erro_detalhado = (
-                        f"Erro do Quarto:\n\nSTDOUT:\n{result.stdout}"
-                        f"\n\nSTDERR:\n{result.stderr}"
-                        f"\n\nCódigo de saída: {result.returncode}"
-                    )
-                    site_dir = os.path.join(work_dir, "_site")
-                    arquivos_site = os.listdir(site_dir) if os.path.isdir(site_dir) else []
-                    return jsonify({
-                        'erro': 'Arquivo HTML não foi gerado',
-                        'detalhes': erro_detalhado,
-                        'arquivos_gerados': os.listdir(work_dir),
-                        'arquivos_site': arquivos_site,
-                    }), 500
-                    
-            except FileNotFoundError:
-                return jsonify({
-                    'erro': 'Comando "quarto" não encontrado',
-                    'detalhes': 'Certifique-se de que o Quarto CLI está instalado e no PATH do sistema. Baixe em: https://quarto.org/docs/get-started/'
-                }), 500
-            
-            # Copiar para pasta temporária para download
-            download_path = os.path.join(
-                tempfile.gettempdir(),
-                f"apresentacao_{datetime.now().strftime('%Y%m%d%H%M%S')}.html",
-            )
-            shutil.copy2(output_file, download_path)
-            
-            return jsonify({'sucesso': True, 'arquivo': os.path.basename(download_path)})
-        finally:
-            _safe_rmtree(tmpdirname)
-            
+        # perfil=1 grava o rastro desta renderização (spans, log do Quarto, RSS); sem o campo, vale a amostragem
+        perfil = True if request.values.get('perfil') in ('1', 'true', 'sim') else None
+
+        # Imagens enviadas (apenas extensões permitidas, com nome saneado).
+        # Lidas aqui: o stream do upload não existe mais quando o job rodar.
+        uploads: list[tuple[str, bytes]] = []
+        if 'imagens' in request.files:
+            for imagem in request.files.getlist('imagens'):
+                if imagem and allowed_file(imagem.filename):
+                    uploads.append((secure_filename(imagem.filename), imagem.read()))
+
+        # Backpressure: com a fila cheia, recusa já (429) em vez de acumular jobs
+        admission = engine.admission
+        if render_jobs.stats()['queued'] >= RENDER_MAX_QUEUE or admission.is_saturated():
+            return _ocupado(admission.retry_after_s())
+
+        job_id = engine.submit(_executar_render, titulo, subtitulo, instituto, conteudo, uploads, perfil)
+        return jsonify({
+            'job': job_id,
+            'status': 'queued',
+            'status_url': f'/status/{job_id}',
+        }), 202
+
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+@app.route('/status/<job_id>')
+def status(job_id):
+    # ?wait=N segura a requisição até N segundos esperando o job (long-poll)
+    try:
+        wait_s = min(float(request.args.get('wait', 0)), MAX_STATUS_WAIT_S)
+    except ValueError:
+        wait_s = 0.0
+    job = render_jobs.get(job_id, wait_s=max(wait_s, 0.0))
+    if job is None:
+        return jsonify({'erro': 'Job não encontrado'}), 404
+    return jsonify(_job_payload(job))
+
+@app.route('/resultado/<job_id>')
+def resultado(job_id):
+    job = render_jobs.get(job_id)
+    if job is None:
+        return jsonify({'erro': 'Job não encontrado'}), 404
+    if job['status'] != 'done':
+        return jsonify(_job_payload(job)), 409
+    payload, codigo = job['result']
+    if codigo == 429:
+        return _ocupado(payload['retry_after'])
+    if codigo != 200:
+        return jsonify(payload), codigo
+    return download(payload['arquivo'])
+
+@app.route('/capacidade')
+def capacidade():
+    # Profundidade da fila e tempos de espera, para dimensionar GERADOR_MAX_RENDERS/GERADOR_MAX_QUEUE
+    return jsonify({'admissao': engine.admission.stats(), 'jobs': render_jobs.stats()})
+
+@app.route('/ready')
+def pronto():
+    # Readiness do balanceador: 503 até o aquecimento terminar; inclui a capacidade livre agora
+    estado = engine.readiness()
+    response = jsonify(estado)
+    response.status_code = 200 if estado['ready'] else 503
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/metrics')
+def metricas():
+    # Formato texto do Prometheus: contadores/histogramas do pipeline + fila e caches
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/assets/<name>')
+def ativo(name):
+    # Ativos do preview linkado (GERADOR_ASSETS_URL=/assets/): o nome traz o hash do conteúdo,
+    # então a resposta nunca muda e pode ficar no cache do navegador/CDN para sempre
+    path = engine.assets.path(name)
+    if path is None:
+        return "Arquivo não encontrado", 404
+    response = send_file(path, conditional=True, etag=name, max_age=ASSET_MAX_AGE_S)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE_S}, immutable'
+    return response
+
 @app.route('/download/<filename>')
 def download(filename):
+    # Serve a variante pré-comprimida aceita pelo navegador; send_file(conditional=True)
+    # cuida de ETag/If-None-Match e Range (downloads retomados).
     try:
-        file_path = os.path.join(tempfile.gettempdir(), filename)
-        if os.path.exists(file_path):
-            response = send_file(file_path, as_attachment=True, download_name='minha_apresentacao_tcc.html')
-            # Agendar remoção do arquivo após download
-            @response.call_on_close
-            def cleanup():
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            return response
-        else:
+        store = engine.artifacts
+        artifact_id = filename[:-len('.html')] if filename.endswith('.html') else filename
+        if store.path(artifact_id) is None:
             return "Arquivo não encontrado", 404
+        # Acesso recente: fica por último na fila de remoção quando o disco passa do orçamento
+        store.touch(artifact_id)
+
+        encoding = None
+        for candidate in ARTIFACT_ENCODINGS:
+            if request.accept_encodings[candidate] and store.path(artifact_id, candidate):
+                encoding = candidate
+                break
+
+        response = send_file(
+            store.path(artifact_id, encoding),
+            mimetype='text/html',
+            as_attachment=True,
+            download_name='minha_apresentacao_tcc.html',
+            conditional=True,
+            etag=f'{artifact_id}-{encoding or "identity"}',
+            max_age=3600,
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
     except Exception as e:
         return str(e), 500
 
@@ -0,0 +1,423 @@
+"""Artefatos servidos ao usuário: HTMLs para download (com variantes comprimidas), páginas do preview e ativos linkados."""
+
+import gzip
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any, Iterable
+from urllib.parse import unquote
+
+from utils_fs import atomic_write
+
+try:
+    import brotli  # opcional: sem ele, só a variante gzip é gerada
+except ImportError:
+    brotli = None  # type: ignore[assignment]
+
+
+# HTMLs prontos para download (com variantes pré-comprimidas)
+ARTIFACTS_DIR = os.environ.get("GERADOR_ARTIFACTS_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_artifacts"
+)
+ARTIFACT_TTL_S = float(os.environ.get("GERADOR_ARTIFACT_TTL_MIN", "60")) * 60
+# Orçamento total em disco dos artefatos; acima dele, os menos acessados saem primeiro
+ARTIFACT_MAX_BYTES = int(float(os.environ.get("GERADOR_ARTIFACT_MAX_MB", "1024")) * 1024 * 1024)
+# Intervalo da limpeza em segundo plano (expirados e orçamento)
+ARTIFACT_SWEEP_S = float(os.environ.get("GERADOR_ARTIFACT_SWEEP_S", "60"))
+
+# Preview com ativos linkados (sem --embed-resources): reveal.js, tema, fontes e imagens vão para
+# um diretório endereçado por conteúdo, servido com cache longo, e o HTML do preview só os referencia
+PREVIEW_LINKED_ASSETS = os.environ.get("GERADOR_PREVIEW_LINKED", "1").strip().lower() in ("1", "true", "yes", "sim")
+# Páginas do preview do Streamlit: único diretório publicado pela rota do componente (os downloads
+# ficam fora dele, no ArtifactStore)
+PREVIEW_DIR = os.environ.get("GERADOR_PREVIEW_DIR") or os.path.join(ARTIFACTS_DIR, "preview")
+# Dentro de PREVIEW_DIR por padrão: o Streamlit serve o preview e os ativos pela mesma rota
+ASSETS_DIR = os.environ.get("GERADOR_ASSETS_DIR") or os.path.join(PREVIEW_DIR, "assets")
+# URL base dos ativos no HTML do preview (relativa ao HTML, ou absoluta: /assets/ do Flask, CDN)
+ASSETS_URL = os.environ.get("GERADOR_ASSETS_URL", "assets/").rstrip("/") + "/"
+
+
+# --- Artefatos para download ------------------------------------------------------------------
+
+_ARTIFACT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Content-Encoding -> sufixo do arquivo pré-comprimido, em ordem de preferência
+ARTIFACT_ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+class ArtifactStore:
+    """HTMLs gerados, endereçados pelo hash do conteúdo, com cópias gzip/brotli ao lado.
+
+    A compressão é feita uma vez, ao gravar; o download só escolhe a variante. Cada artefato
+    tem validade própria: o mtime do .html guarda quando ele expira e o atime, o último acesso.
+    Uma thread de limpeza remove os expirados e, acima de `max_bytes`, os menos acessados
+    recentemente; put() e o download não varrem o diretório.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        ttl_s: float,
+        max_bytes: int = ARTIFACT_MAX_BYTES,
+        sweep_interval_s: float = ARTIFACT_SWEEP_S,
+    ) -> None:
+        self.root_dir = root_dir
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.sweep_interval_s = sweep_interval_s
+        os.makedirs(root_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"stores": 0, "expired": 0, "evictions": 0, "sweeps": 0}
+        # Ocupação medida na última varredura + o que este processo gravou desde então
+        self._bytes = 0
+        self._entries = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._janitor: threading.Thread | None = None
+        self._start_janitor()
+
+    def put(self, data: bytes, compress: bool = True, ttl_s: float | None = None) -> str:
+        # compress=False pula as variantes gzip/brotli (preview do Streamlit: lido uma vez, na mesma máquina)
+        # ttl_s: validade deste artefato (padrão: self.ttl_s); regravar o mesmo conteúdo só a estende
+        artifact_id = sha256(data).hexdigest()[:32]
+        path = os.path.join(self.root_dir, artifact_id + ".html")
+        written = 0
+        if compress and not os.path.exists(path + ".gz"):
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            atomic_write(path + ".gz", gz)
+            written += len(gz)
+            if brotli is not None:
+                br = brotli.compress(data, quality=9)
+                atomic_write(path + ".br", br)
+                written += len(br)
+        now = time.time()
+        expires_at = now + (self.ttl_s if ttl_s is None else ttl_s)
+        try:
+            expires_at = max(expires_at, os.stat(path).st_mtime)
+        except FileNotFoundError:
+            # O HTML por último: ele é quem marca o artefato como completo
+            atomic_write(path, data)
+            written += len(data)
+        os.utime(path, (now, expires_at))
+
+        with self._lock:
+            self._stats["stores"] += 1
+            self._bytes += written
+            over_budget = self._bytes > self.max_bytes
+        self._start_janitor()
+        if over_budget:
+            self._wake.set()  # não espera o próximo ciclo para voltar ao orçamento
+        return artifact_id
+
+    def path(self, artifact_id: str, encoding: str | None = None) -> str | None:
+        if not _ARTIFACT_ID_RE.match(artifact_id):
+            return None
+        path = os.path.join(self.root_dir, artifact_id + ".html")
+        if encoding:
+            path += ARTIFACT_ENCODINGS[encoding]
+        return path if os.path.exists(path) else None
+
+    def touch(self, artifact_id: str) -> None:
+        """Marca o acesso (ordem do LRU) sem mudar a validade."""
+        path = self.path(artifact_id)
+        if path is None:
+            return
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    def sweep(self) -> None:
+        """Remove expirados, sobras de escritas interrompidas e, acima do orçamento, os menos acessados."""
+        now = time.time()
+        groups: dict[str, list[tuple[str, os.stat_result]]] = {}
+        removed_expired = 0
+        try:
+            with os.scandir(self.root_dir) as it:
+                for entry in it:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue  # ex.: assets/ do preview linkado, que tem a própria varredura
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if entry.name.endswith(".tmp"):
+                        if now - st.st_mtime > 3600:
+                            _remove_quietly(entry.path)
+                        continue
+                    groups.setdefault(entry.name.split(".", 1)[0], []).append((entry.path, st))
+        except OSError:
+            return
+
+        entries: list[tuple[float, int, list[str]]] = []
+        for artifact_id, files in groups.items():
+            html = next((st for path, st in files if path.endswith(artifact_id + ".html")), None)
+            paths = [path for path, _st in files]
+            if html is None:
+                # Variantes sem o .html: put() em andamento (recente) ou interrompido (antigo)
+                if now - max(st.st_mtime for _path, st in files) > 3600:
+                    for path in paths:
+                        _remove_quietly(path)
+                continue
+            if html.st_mtime <= now:
+                for path in paths:
+                    _remove_quietly(path)
+                removed_expired += 1
+                continue
+            entries.append((html.st_atime, sum(st.st_size for _path, st in files), paths))
+
+        total = sum(size for _atime, size, _paths in entries)
+        evicted = 0
+        entries.sort()
+        for _atime, size, paths in entries:
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                _remove_quietly(path)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._bytes = total
+            self._entries = len(entries) - evicted
+            self._stats["expired"] += removed_expired
+            self._stats["evictions"] += evicted
+            self._stats["sweeps"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        # Da última varredura (sem percorrer o diretório a cada coleta de métricas)
+        with self._lock:
+            return {**self._stats, "entries": self._entries, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        """Para a thread de limpeza (um put() posterior a religa)."""
+        self._stop.set()
+        self._wake.set()
+        janitor = self._janitor
+        if janitor is not None and janitor is not threading.current_thread():
+            janitor.join(timeout=5)
+
+    def _start_janitor(self) -> None:
+        with self._lock:
+            if self._janitor is not None and self._janitor.is_alive():
+                return
+            self._stop.clear()
+            self._janitor = threading.Thread(target=self._run_janitor, name="artifact-janitor", daemon=True)
+            self._janitor.start()
+
+    def _run_janitor(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                pass  # a limpeza tenta de novo no próximo ciclo
+            self._wake.wait(self.sweep_interval_s)
+            self._wake.clear()
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_artifact_store: ArtifactStore | None = None
+_artifact_store_lock = threading.Lock()
+
+def get_artifact_store() -> ArtifactStore:
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore(ARTIFACTS_DIR, ARTIFACT_TTL_S)
+        return _artifact_store
+
+_preview_store: ArtifactStore | None = None
+
+def get_preview_store() -> ArtifactStore:
+    """Páginas do preview, em PREVIEW_DIR (publicado pelo Streamlit junto com os ativos linkados)."""
+    global _preview_store
+    with _artifact_store_lock:
+        if _preview_store is None:
+            _preview_store = ArtifactStore(PREVIEW_DIR, ARTIFACT_TTL_S)
+        return _preview_store
+
+def close_artifact_stores() -> None:
+    """Para a limpeza dos stores já criados (o que está em disco fica)."""
+    for store in (_artifact_store, _preview_store):
+        if store is not None:
+            store.close()
+
+
+# --- Ativos linkados do preview --------------------------------------------------------------
+
+_ASSET_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+\.[0-9a-f]{16}(\.[A-Za-z0-9]+)?$")
+# Atributos do HTML do Quarto/reveal.js que apontam para arquivos
+_ASSET_ATTR_RE = re.compile(
+    r"""(\s(?:src|href|data-src|data-background-image|data-background-video|poster)=)(["'])([^"']+)\2""",
+    re.IGNORECASE,
+)
+_CSS_URL_RE = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)|@import\s+(["'])([^"']+)\3""")
+_STYLE_BLOCK_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.IGNORECASE | re.DOTALL)
+_EXTERNAL_URL_RE = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|//|#|/)", re.IGNORECASE)
+# Tamanho do memo (arquivo, mtime, tamanho) -> nome; os workspaces de sessão repetem os mesmos arquivos
+_ASSET_MEMO_MAX = 4096
+
+
+class AssetStore:
+    """Ativos do preview linkado (reveal.js, tema, fontes, imagens), com o hash do conteúdo no nome.
+
+    O nome muda junto com o conteúdo, então a URL pode ir com cache imutável: o navegador baixa
+    cada versão de um ativo uma vez, em vez de recebê-lo embutido em cada preview.
+    """
+
+    def __init__(self, root_dir: str, ttl_s: float) -> None:
+        self.root_dir = root_dir
+        self.ttl_s = ttl_s
+        os.makedirs(root_dir, exist_ok=True)
+        # (caminho, mtime_ns, tamanho) -> nome: o reveal.js não é relido nem re-hasheado a cada preview
+        self._memo: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def put(self, data: bytes, filename: str) -> str:
+        stem, ext = os.path.splitext(os.path.basename(filename))
+        stem = re.sub(r"[^A-Za-z0-9_.-]", "_", stem)[:40] or "asset"
+        name = f"{stem}.{sha256(data).hexdigest()[:16]}{ext.lower()}"
+        path = os.path.join(self.root_dir, name)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            atomic_write(path, data)
+        return name
+
+    def add_file(self, path: str, root: str, depth: int = 0) -> str:
+        """Guarda um arquivo do workspace; CSS é reescrito para apontar para os próprios ativos."""
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        is_css = path.lower().endswith(".css")
+        if not is_css:
+            # CSS fica de fora do memo: o nome dele depende dos nomes dos arquivos que referencia
+            with self._lock:
+                name = self._memo.get(key)
+                if name is not None:
+                    self._memo.move_to_end(key)
+            if name is not None:
+                try:
+                    os.utime(os.path.join(self.root_dir, name))
+                    return name
+                except OSError:
+                    pass  # varrido pelo TTL: grava de novo
+        with open(path, "rb") as f:
+            data = f.read()
+        if is_css and depth < 4:
+            css = data.decode("utf-8", errors="surrogateescape")
+            data = self._rewrite_css(css, os.path.dirname(path), root, "", depth + 1).encode("utf-8", errors="surrogateescape")
+        name = self.put(data, path)
+        if not is_css:
+            with self._lock:
+                self._memo[key] = name
+                while len(self._memo) > _ASSET_MEMO_MAX:
+                    self._memo.popitem(last=False)
+        return name
+
+    def link(self, url: str, ref_dir: str, root: str, prefix: str, depth: int = 0) -> str:
+        """URL local (relativa a `ref_dir`, dentro de `root`) -> `prefix` + nome do ativo; outras ficam como estão."""
+        if _EXTERNAL_URL_RE.match(url):
+            return url
+        local = re.split(r"[?#]", url, maxsplit=1)[0]
+        path = os.path.normpath(os.path.join(ref_dir, unquote(local)))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return url
+        try:
+            return prefix + self.add_file(path, root, depth) + url[len(local):]
+        except OSError:
+            return url
+
+    def _rewrite_css(self, css: str, ref_dir: str, root: str, prefix: str, depth: int) -> str:
+        def replace(match: re.Match) -> str:
+            if match.group(2) is not None:
+                return f"url({match.group(1)}{self.link(match.group(2), ref_dir, root, prefix, depth)}{match.group(1)})"
+            quote = match.group(3)
+            return f"@import {quote}{self.link(match.group(4), ref_dir, root, prefix, depth)}{quote}"
+
+        return _CSS_URL_RE.sub(replace, css)
+
+    def path(self, name: str) -> str | None:
+        if not _ASSET_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.root_dir, name)
+        return path if os.path.exists(path) else None
+
+    def available(self, names: Iterable[str]) -> bool:
+        """Todos os ativos ainda existem? Renova o TTL dos que existem."""
+        for name in set(names):
+            try:
+                os.utime(os.path.join(self.root_dir, name))
+            except OSError:
+                return False
+        return True
+
+    def sweep(self) -> None:
+        # No máximo uma varredura por minuto: o preview linka dezenas de arquivos por chamada
+        now = time.time()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl_s:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+_asset_store: AssetStore | None = None
+
+def get_asset_store() -> AssetStore:
+    global _asset_store
+    with _artifact_store_lock:
+        if _asset_store is None:
+            _asset_store = AssetStore(ASSETS_DIR, ARTIFACT_TTL_S)
+        return _asset_store
+
+
+def link_assets(
+    html_bytes: bytes, base_dir: str, base_url: str = ASSETS_URL, store: AssetStore | None = None
+) -> tuple[bytes, dict[str, Any]]:
+    """Troca as referências locais de um HTML renderizado sem --embed-resources por URLs do AssetStore.
+
+    Arquivos fora de `base_dir` e URLs externas ficam como estão. `store` padrão: o do preview
+    (get_asset_store); o build do site passa o próprio. Retorna (HTML, resumo para o debug).
+    """
+    store = store or get_asset_store()
+    root = os.path.abspath(base_dir)
+    html = html_bytes.decode("utf-8", errors="surrogateescape")
+
+    def replace_attr(match: re.Match) -> str:
+        return match.group(1) + match.group(2) + store.link(match.group(3), root, root, base_url) + match.group(2)
+
+    def replace_style(match: re.Match) -> str:
+        return match.group(1) + store._rewrite_css(match.group(2), root, root, base_url, 1) + match.group(3)
+
+    html = _ASSET_ATTR_RE.sub(replace_attr, html)
+    html = _STYLE_BLOCK_RE.sub(replace_style, html)
+    store.sweep()
+    linked = _linked_asset_names(html, base_url)
+    return html.encode("utf-8", errors="surrogateescape"), {"linked": len(linked), "url": base_url}
+
+
+def _linked_asset_names(html: str, base_url: str = ASSETS_URL) -> set[str]:
+    pattern = re.escape(base_url) + r"([A-Za-z0-9_.-]+\.[0-9a-f]{16}(?:\.[A-Za-z0-9]+)?)"
+    return set(re.findall(pattern, html))
+
+
+def linked_assets_available(html: bytes | str, store: AssetStore | None = None, base_url: str = ASSETS_URL) -> bool:
+    """Um HTML linkado (do cache) ainda tem todos os ativos no AssetStore?"""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    return (store or get_asset_store()).available(_linked_asset_names(html, base_url))
@@ -0,0 +1,158 @@
+"""Renderização em lote: manifesto JSONL de decks renderizados num pool de processos."""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterable, Iterator
+
+from project_template import TEMPLATE_DIR
+from theme import build_theme_bundle
+from utils_fs import atomic_write
+
+
+BATCH_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+# Tentativas por deck quando a fila global está cheia (RenderBusyError)
+BATCH_BUSY_ATTEMPTS = 5
+
+
+def read_manifest(path: str) -> Iterator[dict[str, Any]]:
+    """Lê um manifesto JSONL: um deck por linha.
+
+    Campos: `id`, `titulo`, `subtitulo`, `instituto`, `conteudo` (arquivo .md) e `imagens`
+    (pasta), com caminhos relativos ao manifesto. Linhas vazias e iniciadas por `#` são ignoradas;
+    linhas inválidas viram decks com `erro` (o lote segue).
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                spec = json.loads(line)
+            except json.JSONDecodeError as exc:
+                spec = {"erro": f"JSON inválido: {exc}"}
+            if not isinstance(spec, dict):
+                spec = {"erro": "Cada linha do manifesto deve ser um objeto JSON."}
+            spec.setdefault("id", f"deck-{line_no:04d}")
+            spec["linha"] = line_no
+            spec["base_dir"] = base_dir
+            yield spec
+
+
+def unique_deck_id(raw_id: Any, used_ids: set[str], index: int) -> str:
+    """Id de deck seguro como nome de arquivo/pasta (sem `/`, `..` nem caminho absoluto) e único.
+
+    Repetidos ganham sufixo (-2, -3...); vazio vira `deck-<index>`. O id escolhido entra em used_ids.
+    """
+    base_id = re.sub(r"[^\w.-]+", "_", str(raw_id or "")).strip("._") or f"deck-{index:04d}"
+    deck_id, suffix = base_id, 1
+    while deck_id in used_ids:
+        suffix += 1
+        deck_id = f"{base_id}-{suffix}"
+    used_ids.add(deck_id)
+    return deck_id
+
+
+def load_deck(spec: dict[str, Any]) -> tuple[str, list[tuple[str, bytes]]]:
+    """(conteúdo Markdown, imagens) de um deck do manifesto. Levanta ValueError/OSError."""
+    if spec.get("erro"):
+        raise ValueError(spec["erro"])
+    base_dir = spec.get("base_dir") or os.getcwd()
+    if not spec.get("conteudo"):
+        raise ValueError("Campo 'conteudo' (arquivo .md) ausente.")
+    with open(os.path.join(base_dir, spec["conteudo"]), encoding="utf-8") as f:
+        conteudo = f.read()
+
+    uploads: list[tuple[str, bytes]] = []
+    if spec.get("imagens"):
+        image_dir = os.path.join(base_dir, spec["imagens"])
+        for name in sorted(os.listdir(image_dir)):
+            if name.lower().endswith(BATCH_IMAGE_EXTENSIONS):
+                with open(os.path.join(image_dir, name), "rb") as f:
+                    uploads.append((name, f.read()))
+    return conteudo, uploads
+
+
+def _render_batch_deck(spec: dict[str, Any], output_dir: str) -> dict[str, Any]:
+    # Roda num processo do pool: nunca levanta, sempre devolve a linha de resultado do deck
+    started = time.perf_counter()
+    from utils_render import render_quarto  # importado aqui: o motor importa este módulo
+
+    result: dict[str, Any] = {"id": spec.get("id"), "linha": spec.get("linha"), "status": "erro"}
+    try:
+        try:
+            conteudo, uploads = load_deck(spec)
+        except ValueError as exc:
+            result["erro"] = str(exc)
+            return result
+
+        for _attempt in range(BATCH_BUSY_ATTEMPTS):
+            html_bytes, err, debug = render_quarto(
+                titulo=str(spec.get("titulo", "")),
+                subtitulo=str(spec.get("subtitulo", "")),
+                instituto=str(spec.get("instituto", "")),
+                conteudo=conteudo,
+                uploaded_files=uploads,
+            )
+            if not debug.get("busy"):
+                break
+            time.sleep(debug.get("retry_after") or 1)
+
+        result["exit_code"] = debug.get("exit_code")
+        result["cache"] = debug.get("cache")
+        if err or html_bytes is None:
+            result["erro"] = err or "Arquivo HTML não foi gerado."
+            result["detalhes"] = (debug.get("stderr") or debug.get("stdout") or "")[-2000:]
+            return result
+
+        out_path = os.path.join(output_dir, f"{spec['id']}.html")
+        atomic_write(out_path, html_bytes)
+        result.update(status="ok", arquivo=out_path, bytes=len(html_bytes))
+        return result
+    except Exception as exc:
+        result["erro"] = str(exc)
+        return result
+    finally:
+        result["segundos"] = round(time.perf_counter() - started, 3)
+
+
+def render_many(
+    decks: Iterable[dict[str, Any]],
+    output_dir: str,
+    workers: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Renderiza vários decks num pool de processos e devolve o resultado de cada um assim que termina.
+
+    Cada deck vira `<output_dir>/<id>.html`. Falhas não interrompem o lote: saem como
+    resultados com `status: "erro"`.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    template_path = TEMPLATE_DIR
+    if os.path.isdir(template_path):
+        # Compila o tema antes: senão cada processo do pool dispararia a própria compilação
+        try:
+            build_theme_bundle(template_path)
+        except Exception:
+            pass
+
+    specs: list[dict[str, Any]] = []
+    used_ids: set[str] = set()
+    for spec in decks:
+        spec = dict(spec)
+        spec["id"] = unique_deck_id(spec.get("id"), used_ids, len(specs) + 1)
+        specs.append(spec)
+    if not specs:
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(specs))) as pool:
+        futures = {pool.submit(_render_batch_deck, spec, output_dir): spec for spec in specs}
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                yield future.result()
+            except Exception as exc:
+                # Processo do pool morreu (ex.: falta de memória): os outros decks continuam
+                yield {"id": spec["id"], "linha": spec.get("linha"), "status": "erro", "erro": f"Falha no processo: {exc!r}"}
@@ -1,51 +1,164 @@
+import artifacts
+import batch_render
 import utils_render
 import config
+import argparse
+import html
+import math
 import os
 import shutil
 
-def main():
+
+def _tamanho(path):
+    # Bytes de um arquivo ou de uma pasta inteira
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(raiz, nome))
+        for raiz, _pastas, arquivos in os.walk(path)
+        for nome in arquivos
+    )
+
+
+def _decks(manifesto):
+    # Sem manifesto: um deck só, com as configurações padrões, na raiz do site
+    if not manifesto:
+        yield {
+            "id": "",
+            "titulo": config.TITULO_PADRAO,
+            "subtitulo": config.SUBTITULO_PADRAO,
+            "instituto": config.INSTITUTO_PADRAO,
+            "conteudo": config.CONTEUDO_PADRAO,
+            "imagens": [],  # Para o build automático, assumimos sem upload dinâmico por enquanto
+        }
+        return
+    used_ids = set()
+    for n, spec in enumerate(batch_render.read_manifest(manifesto), start=1):
+        # O id vira pasta dentro de --saida: mesma limpeza do lote (sem ../, caminho absoluto nem repetidos)
+        deck_id = batch_render.unique_deck_id(spec.get("id"), used_ids, n)
+        if deck_id != spec["id"]:
+            print(f"⚠️ Linha {spec['linha']}: id {spec['id']!r} publicado como {deck_id!r}")
+        spec["id"] = deck_id
+        try:
+            conteudo, imagens = batch_render.load_deck(spec)
+        except (ValueError, OSError) as e:
+            yield {"id": spec["id"], "erro": str(e)}
+            continue
+        yield {
+            "id": spec["id"],
+            "titulo": str(spec.get("titulo", "")),
+            "subtitulo": str(spec.get("subtitulo", "")),
+            "instituto": str(spec.get("instituto", "")),
+            "conteudo": conteudo,
+            "imagens": imagens,
+        }
+
+
+def _escrever_indice(output_dir, publicados):
+    # Página inicial com um link por deck (só no modo com manifesto)
+    itens = "\n".join(
+        f'    <li><a href="{html.escape(deck_id)}/">{html.escape(titulo)}</a></li>'
+        for deck_id, titulo in publicados
+    )
+    with open(os.path.join(output_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(
+            '<!DOCTYPE html>\n<html lang="pt-BR">\n<head><meta charset="utf-8"><title>Apresentações</title></head>\n'
+            f"<body>\n  <h1>Apresentações</h1>\n  <ul>\n{itens}\n  </ul>\n</body>\n</html>\n"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Gera o site estático (GitHub Pages) com uma ou várias apresentações.")
+    parser.add_argument("--saida", default="docs", help="Diretório do site (padrão: docs)")
+    parser.add_argument("--manifesto", help="Manifesto JSONL com vários decks (mesmo formato do lote); cada um vai para <saida>/<id>/")
+    parser.add_argument(
+        "--ativos-compartilhados",
+        action="store_true",
+        help="Não embute reveal.js, tema, fontes e imagens: extrai para <saida>/assets/, com hash no nome, compartilhados entre os decks",
+    )
+    args = parser.parse_args()
+
     print("🚀 Iniciando construção do site para GitHub Pages...")
-    
-    output_dir = "docs"
-    
+
+    output_dir = args.saida
+
     # Limpa diretório anterior
     if os.path.exists(output_dir):
         shutil.rmtree(output_dir)
     os.makedirs(output_dir, exist_ok=True)
-    
+
     print(f"📂 Diretório de saída: {output_dir}")
-    
-    # Gera o HTML usando as configuarações padrões
+
+    # Ativos endereçados por conteúdo: o nome muda quando o arquivo muda, então a URL pode ficar
+    # em cache para sempre e cada arquivo existe uma vez no site, não uma vez por deck
+    assets = None
+    if args.ativos_compartilhados:
+        assets = artifacts.AssetStore(os.path.join(output_dir, "assets"), ttl_s=math.inf)
+        print(f"🧩 Ativos compartilhados em {assets.root_dir}")
+
+    # Gera o HTML de cada deck
     try:
-        _, _, debug = utils_render.render_quarto(
-            titulo=config.TITULO_PADRAO,
-            subtitulo=config.SUBTITULO_PADRAO,
-            instituto=config.INSTITUTO_PADRAO,
-            conteudo=config.CONTEUDO_PADRAO,
-            uploaded_files=None, # Para o build automático, assumimos sem upload dinâmico por enquanto
-            output_dir=output_dir
-        )
-        
-        # Verifica se deu erro
-        if debug.get('exit_code') != 0:
-            print("❌ Erro ao renderizar:")
-            print(debug.get('stderr'))
-            return
-
-        # Quarto gera 'apresentacao.html' ou 'index.html' dependendo da config.
-        # O script utils_render copia como index.html para output_dir.
-        
+        engine = utils_render.get_render_engine()
+        publicados = []
+        falhas = 0
+        for deck in _decks(args.manifesto):
+            deck_dir = os.path.join(output_dir, deck["id"])
+            if deck.get("erro"):
+                falhas += 1
+                print(f"❌ {deck['id']}: {deck['erro']}")
+                continue
+            _, erro, debug = engine.render(
+                titulo=deck["titulo"],
+                subtitulo=deck["subtitulo"],
+                instituto=deck["instituto"],
+                conteudo=deck["conteudo"],
+                uploaded_files=deck["imagens"],
+                output_dir=deck_dir,
+                embed=assets is None,
+                assets=assets,
+                # Relativo à página do deck: assets/ na raiz, ../assets/ nos decks do manifesto
+                assets_url="../assets/" if deck["id"] else "assets/",
+            )
+
+            # Verifica se deu erro
+            if erro or debug.get('exit_code') != 0:
+                falhas += 1
+                print(f"❌ Erro ao renderizar {deck['id'] or 'o deck padrão'}: {erro or ''}")
+                print(debug.get('stderr'))
+                continue
+
+            # O utils_render grava o HTML do Quarto como index.html no diretório do deck
+            pagina = _tamanho(os.path.join(deck_dir, "index.html"))
+            print(f"   📄 {deck['id'] or 'index'}: {pagina / 1024:.0f} KiB")
+            publicados.append((deck["id"], deck["titulo"]))
+
+        if not publicados:
+            print("❌ Nenhum deck foi gerado.")
+            return 1
+        if args.manifesto:
+            _escrever_indice(output_dir, publicados)
+
         # Cria arquivo .nojekyll para evitar que o GitHub Pages tente processar com Jekyll
         # (Isso previne erros com pastas que comecam com _ como _extensions ou _site)
         with open(os.path.join(output_dir, ".nojekyll"), "w") as f:
             f.write("")
-        
+
+        if assets is not None:
+            print(f"🧩 Ativos: {_tamanho(assets.root_dir) / 1024:.0f} KiB ({len(os.listdir(assets.root_dir))} arquivos)")
+        print(f"📦 Tamanho do site: {_tamanho(output_dir) / 1024:.0f} KiB")
+        if falhas:
+            # Site parcial: gerado, mas o código de saída acusa os decks que faltaram (CI não publica calado)
+            print(f"⚠️ {falhas} deck(s) com erro; site gerado só com os demais em {output_dir}/")
+            return 1
+
         print("✅ Site gerado com sucesso!")
         print(f"👉 Abra {output_dir}/index.html para testar.")
         print("🔧 Para publicar: git push e ative o GitHub Pages na pasta /docs")
-        
+        return 0
+
     except Exception as e:
         print(f"❌ Erro inesperado: {e}")
+        return 1
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
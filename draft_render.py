@@ -0,0 +1,869 @@
+"""Renderizador de rascunho: Markdown -> página reveal.js em Python puro, sem Quarto.
+
+Cobre o subconjunto de Markdown usado nas apresentações (títulos como slides, listas,
+tabelas, citações, imagens, fragmentos, colunas, callouts, abas, notas de rodapé) e
+serve para o preview ao vivo. O download final continua passando pelo Quarto.
+"""
+
+import base64
+import functools
+import html
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any
+
+from preview_render import split_slides
+from project_template import DECK_FOOTER, SLIDE_HEIGHT, SLIDE_WIDTH, TEMPLATE_DIR
+from theme import THEME_DIR, find_theme_bundle
+from uploads import get_blob_store, prepare_uploads
+
+# reveal.js servido por CDN (GERADOR_REVEAL_CDN aponta para um espelho local, se preciso)
+REVEAL_CDN = os.environ.get("GERADOR_REVEAL_CDN", "https://cdn.jsdelivr.net/npm/reveal.js@5.1.0").rstrip("/")
+MATHJAX_CDN = "https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js"
+MERMAID_CDN = "https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"
+OPEN_SANS_CSS = "https://fonts.googleapis.com/css2?family=Open+Sans:wght@300;400;600;700&display=swap"
+
+# Arquivos maiores que isso não são embutidos como data: URI no CSS
+_CSS_INLINE_MAX_BYTES = 2 * 1024 * 1024
+# Teto em bytes (não em quantidade: uma foto tem megabytes) das data: URIs de imagens enviadas em memória
+DRAFT_URI_CACHE_MAX_BYTES = int(float(os.environ.get("GERADOR_DRAFT_URI_CACHE_MB", "64")) * 1024 * 1024)
+
+_MESES = (
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+)
+
+# Títulos padrão dos callouts (os mesmos do Quarto em pt-BR)
+_CALLOUT_TITLES = {
+    "note": "Nota",
+    "tip": "Dica",
+    "important": "Importante",
+    "warning": "Aviso",
+    "caution": "Cuidado",
+}
+
+# Complementos para o que o Quarto gera via JS/SCSS próprios (callouts e abas)
+_DRAFT_CSS = """
+.reveal .callout { border-left: 5px solid #adb5bd; border-radius: 4px; margin: 0.6em 0; background: #f8f9fa; text-align: left; }
+.reveal .callout-note { border-left-color: #0d6efd; }
+.reveal .callout-tip { border-left-color: #198754; }
+.reveal .callout-important { border-left-color: #dc3545; }
+.reveal .callout-warning { border-left-color: #ffc107; }
+.reveal .callout-caution { border-left-color: #fd7e14; }
+.reveal .callout-header { font-weight: 600; font-size: 0.8em; padding: 0.3em 0.6em 0; }
+.reveal .callout-body { font-size: 0.8em; padding: 0.3em 0.6em; }
+.reveal .callout-body > :first-child { margin-top: 0; }
+.reveal .callout-body > :last-child { margin-bottom: 0; }
+.reveal .panel-tabset-tabby { display: flex; gap: 0.3em; list-style: none; margin: 0; padding: 0; border-bottom: 1px solid #dee2e6; }
+.reveal .panel-tabset-tabby li { margin: 0; }
+.reveal .panel-tabset-tabby a { display: block; padding: 0.2em 0.8em; font-size: 0.7em; border-radius: 4px 4px 0 0; }
+.reveal .panel-tabset-tabby a.active { background: #dee2e6; }
+.reveal .tab-pane { display: none; }
+.reveal .tab-pane.active { display: block; }
+.reveal .quarto-figure figcaption { font-size: 0.6em; text-align: center; }
+"""
+
+_DRAFT_TABS_JS = """
+function draftTab(link, index) {
+  var tabset = link.closest('.panel-tabset');
+  tabset.querySelectorAll(':scope > .panel-tabset-tabby a').forEach(function (a, i) { a.classList.toggle('active', i === index); });
+  tabset.querySelectorAll(':scope > .tab-content > .tab-pane').forEach(function (p, i) { p.classList.toggle('active', i === index); });
+}
+"""
+
+_CODE_FENCE_RE = re.compile(r"^(`{3,}|~{3,})\s*(.*)$")
+_DIV_FENCE_RE = re.compile(r"^(:{3,})\s*(.*)$")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)(?:\s+(\{[^}]*\}))?\s*#*\s*$")
+_LIST_ITEM_RE = re.compile(r"^(\s*)([-*+]|\d+[.)])(\s+|$)(.*)$")
+_HR_RE = re.compile(r"^(\*\s*){3,}$|^(-\s*){3,}$|^(_\s*){3,}$")
+_TABLE_SEP_RE = re.compile(r"^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+_FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]]+)\]:\s?(.*)$")
+_VIDEO_RE = re.compile(r"^\{\{<\s*video\s+(\S+)(.*?)>\}\}$")
+_RAW_HTML_BLOCK_RE = re.compile(r"^</?[A-Za-z][\w-]*(\s[^>]*)?/?>")
+_ATTR_TOKEN_RE = re.compile(r"([.#][\w:-]+)|([\w-]+)=(\"[^\"]*\"|'[^']*'|\S+)")
+
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+_CODE_SPAN_RE = re.compile(r"(`+)(.+?)\1")
+_INLINE_MATH_RE = re.compile(r"(?<![\\$])\$(?![\s$])([^$\n]+?)(?<![\s\\])\$(?!\d)")
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(\s*<?([^)\s>]*)>?(?:\s+\"([^\"]*)\")?\s*\)(\{[^}]*\})?")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\(\s*<?([^)\s>]*)>?(?:\s+\"([^\"]*)\")?\s*\)(\{[^}]*\})?")
+_SPAN_RE = re.compile(r"\[([^\]]+)\](\{[^}]*\})")
+_FOOTNOTE_REF_RE = re.compile(r"\[\^([^\]]+)\]")
+_AUTOLINK_RE = re.compile(r"<(https?://[^>\s]+)>")
+_RAW_TAG_RE = re.compile(r"</?[A-Za-z][\w-]*(\s[^<>]*)?/?>|<!--.*?-->")
+_ENTITY_RE = re.compile(r"&(#\d+|#x[0-9a-fA-F]+|\w+);")
+_STRONG_RE = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_EM_RE = re.compile(r"(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?!\*)|(?<![\w_])_(?=\S)(.+?)(?<=\S)_(?![\w_])")
+_STRIKE_RE = re.compile(r"~~(?=\S)(.+?)(?<=\S)~~")
+_SUPER_RE = re.compile(r"\^(?=\S)([^\s^]+)\^")
+_SUB_RE = re.compile(r"(?<!~)~(?=[^\s~])([^\s~]+)~(?!~)")
+_CSS_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+# Atributos que o Pandoc repassa como estão; os demais ganham o prefixo data-
+_HTML_ATTRS = frozenset({"target", "title", "rel", "lang", "dir", "alt", "download", "hreflang", "loading"})
+
+
+def _is_external(src: str) -> bool:
+    return bool(re.match(r"^([a-z][a-z0-9+.-]*:|//|#)", src, re.IGNORECASE))
+
+
+def _mime_type(name: str) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _data_uri(name: str, data: bytes) -> str:
+    return f"data:{_mime_type(name)};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+# (tipo MIME, digest) -> data: URI, do menos para o mais recente
+_blob_uris: "OrderedDict[tuple[str, str], str]" = OrderedDict()
+_blob_uris_bytes = 0
+_blob_uris_lock = threading.Lock()
+
+
+def _blob_data_uri(name: str, digest: str) -> str:
+    # Blobs são imutáveis (endereçados por conteúdo): o digest (com o tipo, que vem do nome) basta como chave
+    global _blob_uris_bytes
+    key = (_mime_type(name), digest)
+    with _blob_uris_lock:
+        uri = _blob_uris.get(key)
+        if uri is not None:
+            _blob_uris.move_to_end(key)
+            return uri
+    uri = _data_uri(name, get_blob_store().read(digest))
+    if len(uri) > DRAFT_URI_CACHE_MAX_BYTES:
+        return uri
+    with _blob_uris_lock:
+        if key not in _blob_uris:
+            _blob_uris[key] = uri
+            _blob_uris_bytes += len(uri)
+        while _blob_uris_bytes > DRAFT_URI_CACHE_MAX_BYTES:
+            _old_key, old_uri = _blob_uris.popitem(last=False)
+            _blob_uris_bytes -= len(old_uri)
+    return uri
+
+
+@functools.lru_cache(maxsize=64)
+def _file_data_uri(path: str, _mtime_ns: int, _size: int) -> str:
+    with open(path, "rb") as f:
+        return _data_uri(path, f.read())
+
+
+def _template_data_uri(path: str) -> str | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if st.st_size > _CSS_INLINE_MAX_BYTES:
+        return None
+    return _file_data_uri(path, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_css(path: str, _mtime_ns: int, base_dir: str) -> str:
+    """Lê um CSS trocando url(relativa a base_dir) por data: URIs (o preview roda em srcdoc)."""
+    with open(path, encoding="utf-8") as f:
+        css = f.read()
+
+    def inline(match: re.Match) -> str:
+        ref = match.group(2).strip()
+        if _is_external(ref):
+            return match.group(0)
+        uri = _template_data_uri(os.path.join(base_dir, ref))
+        return f"url('{uri}')" if uri else match.group(0)
+
+    return _CSS_URL_RE.sub(inline, css)
+
+
+def _theme_css(template_path: str) -> tuple[str, bool]:
+    """CSS do tema: o bundle pré-compilado, se existir; senão só o custom.css. Retorna (css, é_bundle)."""
+    bundle = find_theme_bundle(template_path)
+    assets_dir = os.path.join(template_path, "assets")
+    path = os.path.join(THEME_DIR, bundle) if bundle else os.path.join(assets_dir, "custom.css")
+    try:
+        # O bundle fica fora do template, mas as url() do custom.css são relativas a assets/
+        return _load_css(path, os.stat(path).st_mtime_ns, assets_dir), bool(bundle)
+    except OSError:
+        return "", False
+
+
+def _parse_attrs(spec: str | None) -> tuple[str, list[str], dict[str, str]]:
+    """`{#id .classe chave="valor"}` (ou `nome` solto, como em `::: notes`) -> (id, classes, atributos)."""
+    spec = (spec or "").strip()
+    if not spec:
+        return "", [], {}
+    if not spec.startswith("{"):
+        return "", [spec.split()[0].lstrip(".")], {}
+    ident = ""
+    classes: list[str] = []
+    attrs: dict[str, str] = {}
+    for match in _ATTR_TOKEN_RE.finditer(spec.strip("{}")):
+        token = match.group(1)
+        if token and token.startswith("#"):
+            ident = token[1:]
+        elif token:
+            classes.append(token[1:])
+        else:
+            attrs[match.group(2)] = match.group(3).strip("\"'")
+    return ident, classes, attrs
+
+
+def _attrs_html(ident: str, classes: list[str], attrs: dict[str, str], style: str = "") -> str:
+    # Mesmo mapeamento do Pandoc: width/height viram style, o resto vira data-*
+    parts: list[str] = []
+    if ident:
+        parts.append(f'id="{html.escape(ident)}"')
+    if classes:
+        parts.append(f'class="{html.escape(" ".join(classes))}"')
+    styles = [style] if style else []
+    for key, value in attrs.items():
+        if key in ("width", "height"):
+            styles.append(f"{key}:{value};")
+        elif key == "style":
+            styles.append(value)
+        elif key in _HTML_ATTRS or key.startswith("data-"):
+            parts.append(f'{html.escape(key)}="{html.escape(value)}"')
+        else:
+            parts.append(f'data-{html.escape(key)}="{html.escape(value)}"')
+    if styles:
+        parts.append(f'style="{html.escape("".join(styles))}"')
+    return (" " + " ".join(parts)) if parts else ""
+
+
+def _slugify(text: str) -> str:
+    text = re.sub(r"<[^>]+>", "", text).lower()
+    text = re.sub(r"[^\w\s-]", "", text)
+    return re.sub(r"\s+", "-", text.strip()) or "slide"
+
+
+def _format_date(day: date) -> str:
+    # date-format "D [de] MMMM [de] YYYY" do cabeçalho do Quarto
+    return f"{day.day} de {_MESES[day.month - 1]} de {day.year}"
+
+
+def _youtube_embed(url: str) -> str | None:
+    match = re.match(r"^https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([\w-]+)", url)
+    return f"https://www.youtube.com/embed/{match.group(1)}" if match else None
+
+
+class _DraftDeck:
+    """Estado de uma conversão: recursos (imagens) e notas de rodapé numeradas."""
+
+    def __init__(self, template_path: str, uploads: dict[str, str]) -> None:
+        self.template_path = template_path
+        self.uploads = uploads  # "Figuras/nome" -> digest no BlobStore
+        self.footnote_defs: dict[str, list[str]] = {}
+        self.footnote_numbers: dict[str, int] = {}
+        self.slide_footnotes: list[str] = []
+        self.slide_ids: set[str] = set()
+        self.has_math = False
+        self.has_mermaid = False
+
+    # --- recursos -------------------------------------------------------------------------
+
+    def resolve_src(self, src: str) -> str:
+        """Imagem local (upload ou arquivo do template) -> data: URI; URLs externas ficam como estão."""
+        if not src or _is_external(src):
+            return src
+        rel_path = os.path.normpath(src).replace(os.sep, "/").lstrip("./")
+        digest = self.uploads.get(rel_path)
+        if digest:
+            return _blob_data_uri(rel_path, digest)
+        path = os.path.join(self.template_path, rel_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return src
+        return _file_data_uri(path, st.st_mtime_ns, st.st_size)
+
+    # --- inline ---------------------------------------------------------------------------
+
+    def inline(self, text: str, tokens: list[str] | None = None) -> str:
+        # Trechos já convertidos viram marcadores; rótulos de links/spans compartilham a lista
+        tokens = [] if tokens is None else tokens
+
+        def keep(fragment: str) -> str:
+            tokens.append(fragment)
+            return f"\x00{len(tokens) - 1}\x00"
+
+        def code_span(m: re.Match) -> str:
+            return keep(f"<code>{html.escape(m.group(2).strip())}</code>")
+
+        def math(m: re.Match) -> str:
+            self.has_math = True
+            return keep(f'<span class="math inline">\\({html.escape(m.group(1))}\\)</span>')
+
+        def image(m: re.Match) -> str:
+            alt, src, title, spec = m.groups()
+            ident, classes, attrs = _parse_attrs(spec)
+            title_attr = f' title="{html.escape(title)}"' if title else ""
+            return keep(
+                f'<img src="{html.escape(self.resolve_src(src))}" alt="{html.escape(alt)}"{title_attr}'
+                f"{_attrs_html(ident, classes, attrs)}>"
+            )
+
+        def link(m: re.Match) -> str:
+            label, href, title, spec = m.groups()
+            ident, classes, attrs = _parse_attrs(spec)
+            title_attr = f' title="{html.escape(title)}"' if title else ""
+            return keep(
+                f'<a href="{html.escape(href)}"{title_attr}{_attrs_html(ident, classes, attrs)}>'
+                f"{self.inline(label, tokens)}</a>"
+            )
+
+        def span(m: re.Match) -> str:
+            ident, classes, attrs = _parse_attrs(m.group(2))
+            return keep(f"<span{_attrs_html(ident, classes, attrs)}>{self.inline(m.group(1), tokens)}</span>")
+
+        def footnote(m: re.Match) -> str:
+            note_id = m.group(1)
+            if note_id not in self.footnote_defs:
+                return m.group(0)
+            if note_id not in self.footnote_numbers:
+                self.footnote_numbers[note_id] = len(self.footnote_numbers) + 1
+            number = self.footnote_numbers[note_id]
+            if note_id not in self.slide_footnotes:
+                self.slide_footnotes.append(note_id)
+            return keep(f'<a href="#/fn{number}" class="footnote-ref" role="doc-noteref"><sup>{number}</sup></a>')
+
+        text = _CODE_SPAN_RE.sub(code_span, text)
+        text = _INLINE_MATH_RE.sub(math, text)
+        text = _IMAGE_RE.sub(image, text)
+        text = _FOOTNOTE_REF_RE.sub(footnote, text)
+        text = _LINK_RE.sub(link, text)
+        text = _SPAN_RE.sub(span, text)
+        text = _AUTOLINK_RE.sub(lambda m: keep(f'<a href="{html.escape(m.group(1))}">{html.escape(m.group(1))}</a>'), text)
+        text = _RAW_TAG_RE.sub(lambda m: keep(m.group(0)), text)
+        text = _ENTITY_RE.sub(lambda m: keep(m.group(0)), text)
+
+        text = html.escape(text, quote=False)
+        text = _STRONG_RE.sub(r"<strong>\2</strong>", text)
+        text = _EM_RE.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+        text = _STRIKE_RE.sub(r"<del>\1</del>", text)
+        text = _SUPER_RE.sub(r"<sup>\1</sup>", text)
+        text = _SUB_RE.sub(r"<sub>\1</sub>", text)
+        # Quebra de linha forçada: dois espaços ou barra invertida no fim da linha
+        text = re.sub(r"( {2,}|\\)\n", "<br>\n", text)
+
+        while "\x00" in text:
+            text = _PLACEHOLDER_RE.sub(lambda m: tokens[int(m.group(1))], text)
+        return text
+
+    # --- blocos ---------------------------------------------------------------------------
+
+    def blocks(self, lines: list[str], tight: bool = False, in_list: bool = False) -> str:
+        """Converte linhas em HTML de blocos. `tight`: parágrafos sem <p>; `in_list`: conteúdo de item de lista."""
+        out: list[str] = []
+        i = 0
+        n = len(lines)
+        while i < n:
+            line = lines[i]
+            stripped = line.strip()
+            if not stripped:
+                i += 1
+                continue
+
+            fence = _CODE_FENCE_RE.match(stripped)
+            if fence:
+                i = self._code_block(lines, i, fence, out)
+                continue
+
+            div = _DIV_FENCE_RE.match(stripped)
+            if div and div.group(2):
+                i = self._div_block(lines, i, div, out)
+                continue
+
+            heading = _HEADING_RE.match(stripped)
+            if heading:
+                level = len(heading.group(1))
+                ident, classes, attrs = _parse_attrs(heading.group(3))
+                out.append(f"<h{level}{_attrs_html(ident, classes, attrs)}>{self.inline(heading.group(2))}</h{level}>")
+                i += 1
+                continue
+
+            if stripped.startswith("$$"):
+                i = self._display_math(lines, i, out)
+                continue
+
+            video = _VIDEO_RE.match(stripped)
+            if video:
+                out.append(self._video(video.group(1), video.group(2)))
+                i += 1
+                continue
+
+            if stripped.startswith(">"):
+                quoted: list[str] = []
+                while i < n and lines[i].strip() and (lines[i].strip().startswith(">") or quoted):
+                    quoted.append(re.sub(r"^\s*> ?", "", lines[i]))
+                    i += 1
+                out.append(f"<blockquote>\n{self.blocks(quoted)}\n</blockquote>")
+                continue
+
+            if stripped.startswith("|") and i + 1 < n and _TABLE_SEP_RE.match(lines[i + 1].strip()):
+                i = self._table(lines, i, out)
+                continue
+
+            if _LIST_ITEM_RE.match(line) and not _HR_RE.match(stripped):
+                i = self._list(lines, i, out)
+                continue
+
+            if _HR_RE.match(stripped):
+                out.append("<hr>")
+                i += 1
+                continue
+
+            if _RAW_HTML_BLOCK_RE.match(stripped):
+                raw: list[str] = []
+                while i < n and lines[i].strip():
+                    raw.append(lines[i])
+                    i += 1
+                out.append("\n".join(raw))
+                continue
+
+            # Parágrafo: até a linha em branco ou o início de outro bloco
+            para: list[str] = []
+            while i < n and lines[i].strip():
+                current = lines[i].strip()
+                if para and (
+                    _CODE_FENCE_RE.match(current)
+                    or _DIV_FENCE_RE.match(current)
+                    or _HEADING_RE.match(current)
+                    or current.startswith("$$")
+                    # Dentro de um item, a sublista pode começar sem linha em branco (como no Pandoc)
+                    or (in_list and _LIST_ITEM_RE.match(lines[i]))
+                ):
+                    break
+                para.append(lines[i].strip() if not lines[i].endswith("  ") else lines[i].lstrip())
+                i += 1
+            out.append(self._paragraph("\n".join(para), tight))
+        return "\n".join(out)
+
+    def _paragraph(self, text: str, tight: bool) -> str:
+        image = _IMAGE_RE.fullmatch(text)
+        if image and image.group(1):
+            # Imagem sozinha com texto alternativo vira figura com legenda (como no Quarto)
+            return (
+                f'<div class="quarto-figure quarto-figure-center"><figure>{self.inline(text)}'
+                f"<figcaption>{self.inline(image.group(1))}</figcaption></figure></div>"
+            )
+        body = self.inline(text)
+        return body if tight else f"<p>{body}</p>"
+
+    def _code_block(self, lines: list[str], i: int, fence: re.Match, out: list[str]) -> int:
+        marker = fence.group(1)
+        info = fence.group(2).strip()
+        body: list[str] = []
+        i += 1
+        while i < len(lines):
+            current = lines[i].strip()
+            if current.startswith(marker) and not current[len(marker):].strip():
+                i += 1
+                break
+            body.append(lines[i])
+            i += 1
+        code = html.escape("\n".join(body))
+
+        # ```{mermaid}, ```{python}, ```python {code-line-numbers="2,4"}, ```{.python}
+        language = re.sub(r"[{}.]", " ", info).split()[0] if info.strip("{}. ") else ""
+        if language == "mermaid":
+            self.has_mermaid = True
+            out.append(f'<pre class="mermaid">{code}</pre>')
+        else:
+            cls = f' class="sourceCode {html.escape(language)}"' if language else ""
+            out.append(f'<div class="sourceCode"><pre class="sourceCode"><code{cls}>{code}</code></pre></div>')
+        return i
+
+    def _div_block(self, lines: list[str], i: int, fence: re.Match, out: list[str]) -> int:
+        ident, classes, attrs = _parse_attrs(fence.group(2))
+        depth = 1
+        inner: list[str] = []
+        i += 1
+        code_fence: str | None = None
+        while i < len(lines):
+            current = lines[i].strip()
+            if code_fence:
+                if current.startswith(code_fence) and not current[len(code_fence):].strip():
+                    code_fence = None
+            elif _CODE_FENCE_RE.match(current):
+                code_fence = _CODE_FENCE_RE.match(current).group(1)
+            else:
+                div = _DIV_FENCE_RE.match(current)
+                if div:
+                    depth += 1 if div.group(2) else -1
+                    if depth == 0:
+                        i += 1
+                        break
+            inner.append(lines[i])
+            i += 1
+
+        callout = next((c for c in classes if c.startswith("callout-")), None)
+        if callout:
+            out.append(self._callout(callout[len("callout-"):], classes, attrs, inner))
+        elif "notes" in classes:
+            out.append(f'<aside class="notes">\n{self.blocks(inner)}\n</aside>')
+        elif "panel-tabset" in classes:
+            out.append(self._tabset(ident, classes, attrs, inner))
+        else:
+            out.append(f"<div{_attrs_html(ident, classes, attrs)}>\n{self.blocks(inner)}\n</div>")
+        return i
+
+    def _callout(self, kind: str, classes: list[str], attrs: dict[str, str], inner: list[str]) -> str:
+        title = attrs.pop("title", "")
+        body = list(inner)
+        while body and not body[0].strip():
+            body.pop(0)
+        heading = _HEADING_RE.match(body[0].strip()) if body else None
+        if heading and not title:
+            # `## Título` na primeira linha vira o título do callout
+            title = heading.group(2)
+            body = body[1:]
+        title_html = self.inline(title) if title else _CALLOUT_TITLES.get(kind, kind.capitalize())
+        css_classes = ["callout", "callout-style-default", f"callout-{kind}", "callout-titled"]
+        css_classes += [c for c in classes if not c.startswith("callout-")]
+        return (
+            f'<div class="{" ".join(css_classes)}">\n'
+            f'<div class="callout-header"><div class="callout-title-container">{title_html}</div></div>\n'
+            f'<div class="callout-body-container callout-body">\n{self.blocks(body)}\n</div>\n</div>'
+        )
+
+    def _tabset(self, ident: str, classes: list[str], attrs: dict[str, str], inner: list[str]) -> str:
+        # Cada título do primeiro nível encontrado dentro do bloco abre uma aba
+        tabs: list[tuple[str, list[str]]] = []
+        tab_level: int | None = None
+        code_fence: str | None = None
+        preamble: list[str] = []
+        for line in inner:
+            current = line.strip()
+            if code_fence:
+                if current.startswith(code_fence) and not current[len(code_fence):].strip():
+                    code_fence = None
+            elif _CODE_FENCE_RE.match(current):
+                code_fence = _CODE_FENCE_RE.match(current).group(1)
+            else:
+                heading = _HEADING_RE.match(current)
+                if heading and (tab_level is None or len(heading.group(1)) == tab_level):
+                    tab_level = len(heading.group(1))
+                    tabs.append((heading.group(2), []))
+                    continue
+            (tabs[-1][1] if tabs else preamble).append(line)
+
+        active = ' class="active"'
+        links = "".join(
+            f'<li><a href="#"{active if index == 0 else ""} onclick="draftTab(this, {index}); return false;">'
+            f"{self.inline(title)}</a></li>"
+            for index, (title, _body) in enumerate(tabs)
+        )
+        panes = "\n".join(
+            f'<div class="tab-pane{" active" if index == 0 else ""}">\n{self.blocks(body)}\n</div>'
+            for index, (_title, body) in enumerate(tabs)
+        )
+        return (
+            f"<div{_attrs_html(ident, classes, attrs)}>\n{self.blocks(preamble)}\n"
+            f'<ul class="panel-tabset-tabby">{links}</ul>\n<div class="tab-content">\n{panes}\n</div>\n</div>'
+        )
+
+    def _display_math(self, lines: list[str], i: int, out: list[str]) -> int:
+        self.has_math = True
+        first = lines[i].strip()[2:]
+        body: list[str] = []
+        if first.rstrip().endswith("$$"):
+            body.append(first.rstrip()[:-2])
+            i += 1
+        else:
+            body.append(first)
+            i += 1
+            while i < len(lines):
+                current = lines[i].rstrip()
+                if current.endswith("$$"):
+                    body.append(current[:-2])
+                    i += 1
+                    break
+                body.append(current)
+                i += 1
+        tex = html.escape("\n".join(part for part in body if part.strip()))
+        out.append(f'<p><span class="math display">\\[{tex}\\]</span></p>')
+        return i
+
+    def _video(self, url: str, spec: str) -> str:
+        _ident, _classes, attrs = _parse_attrs("{" + spec + "}")
+        width = html.escape(attrs.get("width", "100%"))
+        height = html.escape(attrs.get("height", "400"))
+        embed = _youtube_embed(url)
+        if embed:
+            return (
+                f'<div class="quarto-video"><iframe src="{html.escape(embed)}" width="{width}" height="{height}" '
+                f'frameborder="0" allowfullscreen></iframe></div>'
+            )
+        src = html.escape(self.resolve_src(url))
+        return f'<div class="quarto-video"><video src="{src}" width="{width}" height="{height}" controls></video></div>'
+
+    def _table(self, lines: list[str], i: int, out: list[str]) -> int:
+        def cells(row: str) -> list[str]:
+            row = row.strip()
+            if row.startswith("|"):
+                row = row[1:]
+            if row.endswith("|") and not row.endswith("\\|"):
+                row = row[:-1]
+            return [cell.strip() for cell in re.split(r"(?<!\\)\|", row)]
+
+        header = cells(lines[i])
+        aligns: list[str] = []
+        for spec in cells(lines[i + 1]):
+            if spec.startswith(":") and spec.endswith(":"):
+                aligns.append("center")
+            elif spec.endswith(":"):
+                aligns.append("right")
+            elif spec.startswith(":"):
+                aligns.append("left")
+            else:
+                aligns.append("")
+        i += 2
+        rows: list[list[str]] = []
+        while i < len(lines) and lines[i].strip().startswith("|"):
+            rows.append(cells(lines[i]))
+            i += 1
+
+        def row_html(row: list[str], tag: str) -> str:
+            parts = []
+            for index, cell in enumerate(row):
+                align = aligns[index] if index < len(aligns) else ""
+                style = f' style="text-align: {align};"' if align else ""
+                parts.append(f"<{tag}{style}>{self.inline(cell)}</{tag}>")
+            return "<tr>" + "".join(parts) + "</tr>"
+
+        body = "\n".join(row_html(row, "td") for row in rows)
+        out.append(f"<table>\n<thead>\n{row_html(header, 'th')}\n</thead>\n<tbody>\n{body}\n</tbody>\n</table>")
+        return i
+
+    def _list(self, lines: list[str], i: int, out: list[str]) -> int:
+        first = _LIST_ITEM_RE.match(lines[i])
+        assert first is not None
+        base_indent = len(first.group(1).expandtabs(4))
+        ordered = first.group(2)[0].isdigit()
+        start = int(re.sub(r"\D", "", first.group(2))) if ordered else 1
+
+        items: list[list[str]] = []
+        loose = False
+        blank_pending = False
+        content_indent = base_indent + 2
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip():
+                blank_pending = True
+                i += 1
+                continue
+            indent = len(line) - len(line.lstrip())
+            item = _LIST_ITEM_RE.match(line)
+            if item and indent == base_indent and item.group(2)[0].isdigit() == ordered:
+                if blank_pending and items:
+                    loose = True
+                content_indent = base_indent + len(item.group(2)) + max(len(item.group(3)), 1)
+                items.append([item.group(4)])
+            elif indent >= content_indent or (indent > base_indent and not blank_pending):
+                # Continuação ou sublista do item atual
+                if blank_pending:
+                    items[-1].append("")
+                items[-1].append(line[min(indent, content_indent):])
+            elif not blank_pending and not item and not _DIV_FENCE_RE.match(line.strip()):
+                items[-1].append(line.strip())  # continuação "preguiçosa" do parágrafo
+            else:
+                break
+            blank_pending = False
+            i += 1
+
+        tag = "ol" if ordered else "ul"
+        start_attr = f' start="{start}"' if ordered and start != 1 else ""
+        rendered = "\n".join(f"<li>{self.blocks(item, tight=not loose, in_list=True)}</li>" for item in items)
+        out.append(f"<{tag}{start_attr}>\n{rendered}\n</{tag}>")
+        return i
+
+    # --- slides ---------------------------------------------------------------------------
+
+    def extract_footnotes(self, conteudo: str) -> str:
+        """Remove as definições `[^id]: ...` do texto (o Quarto as mostra no slide que as cita)."""
+        kept: list[str] = []
+        current: list[str] | None = None
+        for line in conteudo.splitlines():
+            match = _FOOTNOTE_DEF_RE.match(line)
+            if match:
+                current = [match.group(2)]
+                self.footnote_defs[match.group(1)] = current
+                continue
+            if current is not None and line.startswith(("    ", "\t")):
+                current.append(line.strip())
+                continue
+            current = None
+            kept.append(line)
+        return "\n".join(kept)
+
+    def _take_footnotes(self) -> str:
+        if not self.slide_footnotes:
+            return ""
+        items = []
+        for note_id in self.slide_footnotes:
+            number = self.footnote_numbers[note_id]
+            items.append(f'<li id="fn{number}">{self.blocks(self.footnote_defs[note_id], tight=True)}</li>')
+        self.slide_footnotes = []
+        return f'\n<aside class="footnotes footnotes-end-of-section"><ol>{"".join(items)}</ol></aside>'
+
+    def slide(self, chunk: str) -> str:
+        lines = chunk.splitlines()
+        # O `---` já cumpriu seu papel de quebra no split_slides
+        while lines and (not lines[0].strip() or lines[0].strip() == "---"):
+            lines.pop(0)
+
+        heading = _HEADING_RE.match(lines[0].strip()) if lines else None
+        level = len(heading.group(1)) if heading else 2
+        ident, classes, attrs = _parse_attrs(heading.group(3) if heading else None)
+        header = ""
+        if heading and level <= 2:
+            lines = lines[1:]
+            header = f"<h{level}>{self.inline(heading.group(2))}</h{level}>"
+            ident = ident or _slugify(heading.group(2))
+        if level == 1:
+            # Título de seção (`#`): o Quarto o trata como slide centralizado
+            classes = ["title-slide", "slide", "level1", "center", *classes]
+        else:
+            classes = ["slide", f"level{level}", *classes]
+
+        if ident:
+            base, suffix = ident, 1
+            while ident in self.slide_ids:
+                suffix += 1
+                ident = f"{base}-{suffix}"
+            self.slide_ids.add(ident)
+        if "background-image" in attrs:
+            attrs["background-image"] = self.resolve_src(attrs["background-image"])
+
+        body = self.blocks(lines)
+        footnotes = self._take_footnotes()
+        return f"<section{_attrs_html(ident, classes, attrs)}>\n{header}\n{body}{footnotes}\n</section>"
+
+    def title_slide(self, titulo: str, subtitulo: str, instituto: str) -> str:
+        parts = [f'<h1 class="title">{self.inline(titulo)}</h1>']
+        if subtitulo:
+            parts.append(f'<p class="subtitle">{self.inline(subtitulo)}</p>')
+        if instituto:
+            parts.append(f'<p class="institute">{self.inline(instituto)}</p>')
+        parts.append(f'<p class="date">{_format_date(date.today())}</p>')
+        return '<section id="title-slide" class="quarto-title-block center title-slide">\n' + "\n".join(parts) + "\n</section>"
+
+
+def build_draft_html(
+    *,
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    template_path: str,
+    uploads: dict[str, str] | None = None,
+) -> str:
+    """Monta a página reveal.js completa do rascunho. `uploads`: "Figuras/nome" -> digest no BlobStore."""
+    deck = _DraftDeck(template_path, uploads or {})
+    body = deck.extract_footnotes(conteudo)
+    sections = [deck.title_slide(titulo, subtitulo, instituto)]
+    sections.extend(deck.slide(chunk) for chunk in split_slides(body))
+
+    theme_css, is_bundle = _theme_css(template_path)
+    # O bundle só traz o que o ufs.scss muda no simple (+ custom.css): o simple vem sempre do reveal.js
+    head = [
+        f'<link rel="stylesheet" href="{REVEAL_CDN}/dist/reveal.css">',
+        f'<link rel="stylesheet" href="{REVEAL_CDN}/dist/theme/simple.css">',
+    ]
+    if not is_bundle:
+        # Sem o bundle compilado: custom.css sozinho (ufs.scss fica de fora, e com ele a fonte)
+        head.append(f'<link rel="stylesheet" href="{OPEN_SANS_CSS}">')
+    head.append(f"<style>\n{theme_css}\n</style>")
+    head.append(f"<style>{_DRAFT_CSS}</style>")
+
+    scripts = [f'<script src="{REVEAL_CDN}/dist/reveal.js"></script>', f"<script>{_DRAFT_TABS_JS}</script>"]
+    if deck.has_math:
+        scripts.append("<script>window.MathJax = { tex: { inlineMath: [['\\\\(', '\\\\)']] } };</script>")
+        scripts.append(f'<script src="{MATHJAX_CDN}" async></script>')
+    if deck.has_mermaid:
+        scripts.append(f'<script src="{MERMAID_CDN}"></script>')
+        scripts.append("<script>mermaid.initialize({ startOnLoad: true });</script>")
+    scripts.append(
+        "<script>Reveal.initialize({"
+        f"width: {SLIDE_WIDTH}, height: {SLIDE_HEIGHT}, controls: true, slideNumber: true, "
+        "transition: 'slide', backgroundTransition: 'fade', hash: false});</script>"
+    )
+
+    page_title = html.escape(re.sub(r"<[^>]+>", " ", titulo).strip())
+    slides_html = "\n".join(sections)
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
+<title>{page_title}</title>
+{chr(10).join(head)}
+</head>
+<body class="quarto-light">
+<div class="reveal">
+<div class="slides">
+{slides_html}
+</div>
+<div class="footer footer-default"><p>{html.escape(DECK_FOOTER)}</p></div>
+</div>
+{chr(10).join(scripts)}
+</body>
+</html>
+"""
+
+
+def render_draft(
+    *,
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    uploaded_files: list[Any] | None,
+    output_dir: str | None = None,
+    use_cache: bool = True,
+    session_id: str | None = None,
+) -> tuple[bytes | None, str | None, dict[str, Any]]:
+    # Mesma assinatura/retorno de render_quarto. use_cache e session_id são aceitos por
+    # compatibilidade: o rascunho é barato demais para valer cache ou workspace.
+    started = time.perf_counter()
+    template_path = TEMPLATE_DIR
+    if not os.path.isdir(template_path):
+        return None, "Pasta 'template' não encontrada dentro do projeto.", {}
+
+    uploads = {"Figuras/" + upload.name: upload.digest for upload in prepare_uploads(uploaded_files)}
+    try:
+        page = build_draft_html(
+            titulo=titulo,
+            subtitulo=subtitulo,
+            instituto=instituto,
+            conteudo=conteudo,
+            template_path=template_path,
+            uploads=uploads,
+        )
+    except Exception as exc:
+        return None, f"Erro ao gerar o rascunho: {exc}", {
+            "stdout": "", "stderr": repr(exc), "exit_code": 1, "backend": "draft",
+        }
+
+    html_bytes = page.encode("utf-8")
+    elapsed = time.perf_counter() - started
+    debug: dict[str, Any] = {
+        "stdout": "",
+        "stderr": "",
+        "exit_code": 0,
+        "backend": "draft",
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "timings": {"total": round(elapsed, 4)},
+        "output_bytes": len(html_bytes),
+    }
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "index.html"), "wb") as f:
+            f.write(html_bytes)
+        return None, None, debug
+    return html_bytes, None, debug
@@ -0,0 +1,335 @@
+"""Métricas do pipeline de renderização no formato texto do Prometheus (sem dependências extras).
+
+Os valores são por processo. O Flask expõe tudo em /metrics; no Streamlit, que não tem rotas
+próprias, um servidor HTTP auxiliar sobe na porta GERADOR_METRICS_PORT (com /metrics e /ready, e
+/assets/<nome> para os ativos do preview linkado, com cache imutável).
+"""
+
+import json
+import math
+import mimetypes
+import os
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Porta do exportador auxiliar (Streamlit); 0 desliga
+METRICS_PORT = int(os.environ.get("GERADOR_METRICS_PORT", "0"))
+# Ativos do preview têm o hash do conteúdo no nome: a resposta de um nome nunca muda
+ASSET_MAX_AGE_S = 365 * 24 * 3600
+
+# Segundos: do rascunho (ms) à renderização completa do Quarto com fila (minutos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# Bytes do HTML gerado: 64 KiB a 256 MiB
+SIZE_BUCKETS = tuple(float(64 * 1024 * 4 ** i) for i in range(7))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: rótulos esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo; com set_function, é lido na hora da coleta."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function: Callable[[], Any] | None = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], Any]) -> None:
+        """`function` devolve um número (sem rótulos) ou {tupla de rótulos: número}."""
+        self._function = function
+
+    def samples(self) -> list[str]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return []  # coleta não pode derrubar o /metrics inteiro
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(v))}" for key, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # rótulos -> (contagem por faixa, soma, total)
+        self._series: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines: list[str] = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> Any:
+        # Idempotente: registrar de novo o mesmo nome devolve a métrica existente
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, buckets, labelnames))
+
+
+# --- Pipeline de renderização -------------------------------------------------------------------
+
+RENDERS = counter("gerador_renders_total", "Renderizações concluídas, por backend e resultado", ("backend", "result"))
+RENDER_SECONDS = histogram(
+    "gerador_render_duration_seconds", "Duração total da renderização", LATENCY_BUCKETS, ("backend", "cache")
+)
+PHASE_SECONDS = histogram(
+    "gerador_render_phase_seconds", "Duração de cada fase do render_quarto", LATENCY_BUCKETS, ("phase",)
+)
+QUEUE_WAIT_SECONDS = histogram(
+    "gerador_render_queue_wait_seconds", "Espera por uma vaga no semáforo global de renderização", LATENCY_BUCKETS
+)
+IN_FLIGHT = gauge("gerador_renders_in_flight", "Renderizações em andamento neste processo")
+CACHE_LOOKUPS = counter("gerador_render_cache_total", "Consultas ao cache de HTMLs renderizados", ("result",))
+OUTPUT_BYTES = histogram("gerador_render_output_bytes", "Tamanho do HTML gerado", SIZE_BUCKETS, ("backend",))
+QUARTO_EXITS = counter("gerador_quarto_exit_total", "Códigos de saída do Quarto", ("code",))
+
+
+def observe_render(backend: str, error: str | None, debug: dict[str, Any], elapsed_s: float) -> None:
+    """Registra uma renderização a partir do `debug` devolvido por render_quarto."""
+    if debug.get("busy"):
+        result = "busy"
+    elif debug.get("cancelled"):
+        result = "cancelled"
+    elif debug.get("limit"):
+        result = f"limit_{debug['limit']}"  # tempo, CPU ou memória: o governador derrubou o Quarto
+    elif error:
+        result = "error"
+    else:
+        result = "ok"
+    RENDERS.inc(backend=backend, result=result)
+    if result in ("busy", "cancelled"):
+        return
+
+    cache = debug.get("cache") or "off"
+    RENDER_SECONDS.observe(elapsed_s, backend=backend, cache=cache)
+    if cache in ("hit", "miss"):
+        CACHE_LOOKUPS.inc(result=cache)
+    for phase, seconds in (debug.get("timings") or {}).items():
+        if phase != "total":
+            PHASE_SECONDS.observe(seconds, phase=phase)
+    if "queue_wait_s" in debug:
+        QUEUE_WAIT_SECONDS.observe(debug["queue_wait_s"])
+    if debug.get("output_bytes"):
+        OUTPUT_BYTES.observe(debug["output_bytes"], backend=backend)
+    if backend == "quarto" and cache != "hit" and "exit_code" in debug:
+        # exit_code None: o binário do Quarto não foi encontrado
+        code = debug["exit_code"]
+        QUARTO_EXITS.inc(code="not_found" if code is None else str(code))
+
+
+# --- Exportador auxiliar (Streamlit) ------------------------------------------------------------
+
+# Checagem do /ready do exportador: devolve um dict JSON com a chave "ready"
+_readiness_check: Callable[[], dict[str, Any]] | None = None
+
+def set_readiness_check(check: Callable[[], dict[str, Any]]) -> None:
+    global _readiness_check
+    _readiness_check = check
+
+# Nome de ativo -> caminho no disco (ou None), para o /assets/ do exportador
+_asset_resolver: Callable[[str], str | None] | None = None
+
+def set_asset_resolver(resolve: Callable[[str], str | None]) -> None:
+    global _asset_resolver
+    _asset_resolver = resolve
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802 (nome exigido pelo http.server)
+        path = self.path.split("?", 1)[0]
+        if path in ("/metrics", "/"):
+            self._reply(200, CONTENT_TYPE, REGISTRY.render())
+        elif path == "/ready" and _readiness_check is not None:
+            details = _readiness_check()
+            status = 200 if details.get("ready") else 503
+            self._reply(status, "application/json", json.dumps(details, ensure_ascii=False))
+        elif path.startswith("/assets/") and _asset_resolver is not None:
+            self._send_asset(path[len("/assets/"):])
+        else:
+            self.send_error(404)
+
+    def _send_asset(self, name: str) -> None:
+        # O componente do Streamlit só manda "Cache-Control: public"; daqui sai o cache imutável
+        # (GERADOR_ASSETS_URL apontando para este servidor)
+        file_path = _asset_resolver(name) if "/" not in name else None
+        if file_path is None:
+            self.send_error(404)
+            return
+        etag = f'"{name}"'
+        not_modified = etag in self.headers.get("If-None-Match", "")
+        try:
+            f = None if not_modified else open(file_path, "rb")
+        except OSError:
+            self.send_error(404)
+            return
+        self.send_response(304 if not_modified else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"public, max-age={ASSET_MAX_AGE_S}, immutable")
+        # Servido noutra porta (outra origem): fontes e módulos só carregam com CORS
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if f is None:
+            self.end_headers()
+            return
+        with f:
+            self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def _reply(self, status: int, content_type: str, text: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # uma linha por coleta do Prometheus só polui o log
+
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> int | None:
+    """Sobe (uma vez por processo) o servidor de /metrics numa thread. Retorna a porta, ou None se desligado."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                return None  # porta ocupada (ex.: outro processo do mesmo deploy já exporta)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server.server_address[1]
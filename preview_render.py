@@ -0,0 +1,481 @@
+"""Preview do deck: renderização incremental por slide e renderizador em segundo plano (debounce, cancelamento)."""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any, Callable
+
+from artifacts import ASSETS_URL, get_preview_store, linked_assets_available
+from project_template import TEMPLATE_DIR, build_qmd_content
+from quarto_runner import CancelToken
+from render_cache import get_slide_cache, render_cache_key
+from theme import ensure_theme_bundle
+from uploads import Upload, prepare_uploads
+from workspaces import WORKSPACE_IDLE_TTL_S
+
+
+# Teto global (soma entre sessões do Streamlit) do estado de preview retido em memória no processo
+SESSION_MEMORY_MAX_BYTES = int(float(os.environ.get("GERADOR_SESSION_MEMORY_MB", "256")) * 1024 * 1024)
+
+# Preview automático em segundo plano: espera o usuário parar de digitar por este tempo
+PREVIEW_DEBOUNCE_S = float(os.environ.get("GERADOR_PREVIEW_DEBOUNCE_S", "1.5"))
+
+
+# --- Preview incremental por slide ----------------------------------------------------------
+
+_CODE_FENCE_RE = re.compile(r"^(`{3,}|~{3,})")
+_DIV_FENCE_RE = re.compile(r"^(:{3,})\s*(.*)$")
+_SLIDE_HEADING_RE = re.compile(r"^#{1,2}\s")
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*?)\s*$")
+_HEADING_ID_ATTR_RE = re.compile(r"\{[^}]*#([^\s}]+)[^}]*\}$")
+_FOOTNOTE_RE = re.compile(r"\[\^[^\]]+\]|\^\[")
+_HTML_ID_RE = re.compile(r"\bid=\"([^\"]*)\"")
+_SLIDES_DIV_RE = re.compile(r"<div\s+class=\"slides\"[^>]*>", re.IGNORECASE)
+_SECTION_TAG_RE = re.compile(r"<(/?)section\b[^>]*>", re.IGNORECASE)
+
+# Recursos que fazem o Quarto incluir bibliotecas extras no HTML (o "casco" precisa tê-las)
+_DECK_FEATURES = {
+    "mermaid": re.compile(r"\{mermaid"),
+    "math": re.compile(r"\$"),
+    "code": re.compile(r"^\s*(```|~~~)", re.MULTILINE),
+    "tabset": re.compile(r"panel-tabset"),
+    "video": re.compile(r"\{\{<\s*video"),
+}
+
+
+def split_slides(conteudo: str) -> list[str]:
+    """Divide o Markdown nos mesmos pontos em que o Quarto quebra slides (`#`/`##` e `---` no nível raiz)."""
+    chunks: list[list[str]] = [[]]
+    fence: str | None = None
+    div_depth = 0
+    previous_blank = True
+    for line in conteudo.splitlines():
+        stripped = line.strip()
+        if fence:
+            if stripped.startswith(fence) and not stripped[len(fence):].strip():
+                fence = None
+        elif _CODE_FENCE_RE.match(stripped):
+            fence = _CODE_FENCE_RE.match(stripped).group(1)
+        elif _DIV_FENCE_RE.match(stripped):
+            div_depth += 1 if _DIV_FENCE_RE.match(stripped).group(2) else -1
+            div_depth = max(div_depth, 0)
+        elif div_depth == 0 and (_SLIDE_HEADING_RE.match(line) or (stripped == "---" and previous_blank)):
+            chunks.append([])
+        chunks[-1].append(line)
+        previous_blank = not stripped
+
+    slides: list[str] = []
+    pending_rule = ""
+    for chunk_lines in chunks:
+        text = "\n".join(chunk_lines).strip("\n")
+        if not text.strip():
+            continue
+        if text.strip() == "---":
+            # `---` seguido de um título não gera slide próprio: junta com o próximo
+            pending_rule = text + "\n\n"
+            continue
+        slides.append(pending_rule + text)
+        pending_rule = ""
+    return slides
+
+
+def _heading_key(heading: str) -> str:
+    # Aproximação grosseira do id que o Pandoc dá ao título: o que ele trata como igual colide aqui também
+    explicit = _HEADING_ID_ATTR_RE.search(heading)
+    text = explicit.group(1) if explicit else heading
+    key = "".join(char for char in text.lower() if char.isalnum())
+    return key.lstrip("0123456789")
+
+
+def stitchable(conteudo: str, slides: list[str]) -> bool:
+    """Diz se os slides podem ser renderizados em separado e costurados sem mudar ids nem numeração.
+
+    O Quarto numera as notas de rodapé e desambigua os ids (`section`, `section-1`, `intro-1`)
+    pela posição no deck inteiro; num mini-deck, o mesmo slide sairia com outro id. Só dá para
+    costurar quando não há notas de rodapé, todo slide tem título e nenhum título se repete.
+    """
+    if _FOOTNOTE_RE.search(conteudo):
+        return False
+    for slide in slides:
+        first_line = slide.removeprefix("---").lstrip("\n").split("\n", 1)[0]
+        if not _SLIDE_HEADING_RE.match(first_line):
+            return False  # slide sem título: id `section-N` depende de quantos vieram antes
+
+    seen = {"titleslide"}
+    fence: str | None = None
+    for line in conteudo.splitlines():
+        stripped = line.strip()
+        if fence:
+            if stripped.startswith(fence) and not stripped[len(fence):].strip():
+                fence = None
+            continue
+        if _CODE_FENCE_RE.match(stripped):
+            fence = _CODE_FENCE_RE.match(stripped).group(1)
+            continue
+        heading = _HEADING_RE.match(line)
+        if heading:
+            key = _heading_key(heading.group(1))
+            if not key or key in seen:
+                return False
+            seen.add(key)
+    return True
+
+
+def split_deck_html(html: str) -> tuple[str, list[str], str] | None:
+    """Separa o HTML do reveal.js em (início, <section>s de primeiro nível, fim)."""
+    body_start = html.lower().find("<body")
+    match = _SLIDES_DIV_RE.search(html, max(body_start, 0))
+    if not match:
+        return None
+
+    sections: list[str] = []
+    depth = 0
+    section_start = 0
+    prefix_end: int | None = None
+    suffix_start: int | None = None
+    position = match.end()
+    while True:
+        tag = _SECTION_TAG_RE.search(html, position)
+        if not tag:
+            break
+        if depth == 0 and html[position:tag.start()].strip():
+            # Acabaram os slides (o resto da página é script/rodapé)
+            break
+        position = tag.end()
+        if tag.group(1):
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                sections.append(html[section_start:tag.end()])
+                suffix_start = tag.end()
+        else:
+            if depth == 0:
+                section_start = tag.start()
+                if prefix_end is None:
+                    prefix_end = tag.start()
+            depth += 1
+
+    if depth or prefix_end is None or suffix_start is None:
+        return None
+    return html[:prefix_end], sections, html[suffix_start:]
+
+
+def _preview_base_key(header_qmd: str, conteudo: str, uploads: list[Upload], template_path: str) -> str:
+    # Tudo o que afeta o HTML de qualquer slide, exceto o texto do próprio slide
+    features = sorted(name for name, pattern in _DECK_FEATURES.items() if pattern.search(conteudo))
+    return render_cache_key(header_qmd + "features:" + ",".join(features), uploads, template_path)
+
+
+def render_preview(
+    *,
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    uploaded_files: list[Any] | None,
+    session_id: str | None = None,
+    embed: bool = True,
+) -> tuple[bytes | None, str | None, dict[str, Any]]:
+    """Preview incremental: só os slides alterados passam pelo Quarto; o resto vem do cache.
+
+    O HTML de cada slide fica em cache e é costurado no "casco" (cabeçalho, capa, scripts)
+    da última renderização completa. Se a divisão em slides não bater com a saída do Quarto,
+    se o deck não for costurável (veja stitchable) ou se a costura repetir algum id, cai para
+    a renderização completa. Com embed=False, o HTML aponta para o AssetStore
+    (veja link_assets) em vez de carregar reveal.js, fontes e imagens embutidos.
+    """
+    # O motor (utils_render) importa este módulo: render_quarto só pode vir na hora da chamada
+    from utils_render import render_quarto
+
+    template_path = TEMPLATE_DIR
+    if not os.path.isdir(template_path):
+        return None, "Pasta 'template' não encontrada dentro do projeto.", {}
+
+    uploads = prepare_uploads(uploaded_files)
+    slides = split_slides(conteudo)
+    header_qmd = build_qmd_content(
+        titulo, subtitulo, instituto, "", theme_css=ensure_theme_bundle(template_path)
+    )
+    linked = "" if embed else f"\nlinked:{ASSETS_URL}"
+    base_key = _preview_base_key(header_qmd + linked, conteudo, uploads, template_path)
+    slide_keys = [sha256((base_key + "\0" + slide).encode("utf-8")).hexdigest() for slide in slides]
+    cache = get_slide_cache()
+    # Fora disso, os ids e as notas de um slide dependem dos outros: nem costura nem guarda fragmentos
+    can_stitch = stitchable(conteudo, slides)
+
+    def full_render() -> tuple[bytes | None, str | None, dict[str, Any]]:
+        html_bytes, err, debug = render_quarto(
+            titulo=titulo,
+            subtitulo=subtitulo,
+            instituto=instituto,
+            conteudo=conteudo,
+            uploaded_files=uploads,
+            session_id=session_id,
+            embed=embed,
+        )
+        debug["slides"] = {"total": len(slides), "rendered": len(slides), "mode": "full"}
+        if html_bytes is None or debug.get("exit_code") != 0:
+            return html_bytes, err, debug
+        parts = split_deck_html(html_bytes.decode("utf-8", errors="replace")) if can_stitch else None
+        if parts and len(parts[1]) == len(slides) + 1:
+            try:
+                cache.put("shell-" + base_key, html_bytes)
+                for key, section in zip(slide_keys, parts[1][1:]):
+                    cache.put(key, section.encode("utf-8"))
+            except OSError:
+                pass
+        return html_bytes, err, debug
+
+    shell_bytes = cache.get("shell-" + base_key) if slides and can_stitch else None
+    shell = split_deck_html(shell_bytes.decode("utf-8", errors="replace")) if shell_bytes else None
+    if shell is None:
+        return full_render()
+
+    fragments: dict[int, str] = {}
+    for index, key in enumerate(slide_keys):
+        cached_fragment = cache.get(key)
+        if cached_fragment is not None:
+            fragments[index] = cached_fragment.decode("utf-8")
+    missing = [index for index in range(len(slides)) if index not in fragments]
+
+    debug: dict[str, Any] = {"stdout": "", "stderr": "", "exit_code": 0, "cache": "hit"}
+    if missing:
+        # Mini-deck só com os slides alterados
+        partial_body = "\n\n".join(slides[index] for index in missing)
+        html_bytes, err, debug = render_quarto(
+            titulo=titulo,
+            subtitulo=subtitulo,
+            instituto=instituto,
+            conteudo=partial_body,
+            uploaded_files=uploads,
+            use_cache=False,
+            session_id=session_id,
+            embed=embed,
+        )
+        if html_bytes is None or debug.get("exit_code") != 0:
+            return html_bytes, err, debug
+        parts = split_deck_html(html_bytes.decode("utf-8", errors="replace"))
+        if not parts or len(parts[1]) != len(missing) + 1:
+            return full_render()
+        for index, section in zip(missing, parts[1][1:]):
+            fragments[index] = section
+            try:
+                cache.put(slide_keys[index], section.encode("utf-8"))
+            except OSError:
+                pass
+
+    prefix, shell_sections, suffix = shell
+    sections = [shell_sections[0]] + [fragments[i] for i in range(len(slides))]
+    ids = [element_id for section in sections for element_id in _HTML_ID_RE.findall(section)]
+    if len(ids) != len(set(ids)):
+        return full_render()  # ids gerados pelo Quarto (ex.: blocos de código `cb1`) repetidos entre os slides
+    stitched = prefix + "\n".join(sections) + suffix
+    if not embed and not linked_assets_available(stitched):
+        return full_render()  # casco ou slides em cache apontam para ativos já varridos
+    debug["slides"] = {"total": len(slides), "rendered": len(missing), "mode": "partial" if missing else "stitched"}
+    return stitched.encode("utf-8"), None, debug
+
+
+# --- Preview em segundo plano ------------------------------------------------------------------
+
+# Quanto do stdout/stderr do Quarto um debug guardado em memória mantém (o final, onde estão os erros)
+DEBUG_TAIL_CHARS = 8000
+
+
+def slim_debug(debug: dict[str, Any], max_chars: int = DEBUG_TAIL_CHARS) -> dict[str, Any]:
+    """Cópia do debug para guardar entre reruns: stdout/stderr cortados no final."""
+    slim = {key: value for key, value in debug.items() if key not in ("stdout", "stderr")}
+    for name in ("stdout", "stderr"):
+        text = debug.get(name) or ""
+        slim[name] = text if len(text) <= max_chars else "…" + text[-max_chars:]
+    return slim
+
+
+def approx_size(value: Any) -> int:
+    """Bytes aproximados de um valor retido (strings, bytes e containers; o resto conta como 64)."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(approx_size(item) for item in value)
+    return 64
+
+
+class BackgroundRenderer:
+    """Renderização com debounce e cancelamento, uma por vez, sempre do conteúdo mais recente.
+
+    request() só agenda: a renderização começa depois de `debounce_s` sem novos pedidos. Um pedido
+    com conteúdo diferente cancela a renderização em andamento (CancelToken derruba o Quarto), então
+    quem digita rápido não enfileira versões velhas. O último resultado bom fica no ArtifactStore
+    (status()["artifact"]) até ser substituído; um erro não apaga o preview anterior.
+    """
+
+    def __init__(self, render_fn: Callable[..., tuple[bytes | None, str | None, dict[str, Any]]], debounce_s: float, idle_exit_s: float = 60.0) -> None:
+        self.render_fn = render_fn
+        self.debounce_s = debounce_s
+        self.idle_exit_s = idle_exit_s
+        self._cond = threading.Condition()
+        self._pending: tuple[str, dict[str, Any]] | None = None
+        self._requested_at = 0.0
+        self._running_key: str | None = None
+        self._cancel: CancelToken | None = None
+        self._result: dict[str, Any] = {"key": "", "artifact": "", "debug": {}}
+        self._error: dict[str, Any] = {"key": "", "error": "", "debug": {}}
+        self._thread: threading.Thread | None = None
+        self.cancelled = 0
+
+    def request(self, key: str, **kwargs: Any) -> None:
+        """Agenda a renderização de `key` (hash do conteúdo) com os argumentos de render_fn."""
+        with self._cond:
+            if self._pending is not None and self._pending[0] == key:
+                return  # já agendado: não reinicia o debounce
+            if self._pending is None and key in (self._running_key, self._result["key"]):
+                return  # já rodando ou pronto
+            self._pending = (key, kwargs)
+            self._requested_at = time.monotonic()
+            if self._cancel is not None and self._running_key != key:
+                self._cancel.cancel()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="background-render", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def status(self) -> dict[str, Any]:
+        """Último resultado bom (`key`, `artifact`, `debug`), erro mais recente e se há trabalho pendente."""
+        with self._cond:
+            return {
+                **self._result,
+                "error_key": self._error["key"],
+                "error": self._error["error"],
+                "error_debug": self._error["debug"],
+                "busy": self._pending is not None or self._running_key is not None,
+                "running": self._running_key,
+                "cancelled": self.cancelled,
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._pending = None
+            if self._cancel is not None:
+                self._cancel.cancel()
+            self._cond.notify_all()
+
+    def retained_bytes(self) -> int:
+        """Memória aproximada retida: pedido pendente (com os uploads) e debug dos resultados."""
+        with self._cond:
+            return approx_size(self._pending) + approx_size(self._result) + approx_size(self._error)
+
+    def spill(self) -> None:
+        """Libera a memória: descarta o pedido pendente e o debug (o preview continua no ArtifactStore)."""
+        self.close()
+        with self._cond:
+            self._result = {**self._result, "debug": {}}
+            self._error = {"key": "", "error": "", "debug": {}}
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                # Espera um pedido; ocioso por muito tempo, a thread termina (request() cria outra)
+                while self._pending is None:
+                    if not self._cond.wait(timeout=self.idle_exit_s) and self._pending is None:
+                        self._thread = None
+                        return
+                # Debounce: cada request() novo empurra o início
+                while self._pending is not None:
+                    remaining = self._requested_at + self.debounce_s - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+                if self._pending is None:
+                    continue  # close() no meio do debounce
+                key, kwargs = self._pending
+                self._pending = None
+                self._running_key = key
+                self._cancel = cancel = CancelToken()
+
+            try:
+                with cancel:
+                    html_bytes, err, debug = self.render_fn(**kwargs)
+            except Exception as exc:
+                html_bytes, err, debug = None, f"Erro inesperado: {exc}", {}
+
+            with self._cond:
+                self._running_key = None
+                self._cancel = None
+                if debug.get("cancelled"):
+                    self.cancelled += 1
+                elif html_bytes is not None and not err:
+                    artifact_id = get_preview_store().put(html_bytes, compress=False)
+                    self._result = {"key": key, "artifact": artifact_id, "debug": slim_debug(debug)}
+                    self._error = {"key": "", "error": "", "debug": {}}
+                else:
+                    self._error = {"key": key, "error": err or "Arquivo HTML não foi gerado.", "debug": slim_debug(debug)}
+            # Não segura o HTML nem os uploads enquanto a thread espera o próximo pedido
+            del kwargs, html_bytes, debug
+
+
+class SessionMemoryBudget:
+    """Teto global para o estado que as sessões (Streamlit) retêm em memória no processo.
+
+    A cada rerun a sessão informa quanto retém e como liberar (`spill`). Acima de `max_bytes`,
+    as sessões usadas há mais tempo liberam o que têm e saem da contagem, assim como as paradas
+    há mais de `idle_s` (em geral, abas já fechadas). Os resultados continuam no ArtifactStore.
+    """
+
+    def __init__(self, max_bytes: int, idle_s: float) -> None:
+        self.max_bytes = max_bytes
+        self.idle_s = idle_s
+        # sessão -> (bytes, último uso, spill), da menos para a mais recente
+        self._sessions: OrderedDict[str, tuple[int, float, Callable[[], None]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._spills = 0
+
+    def track(self, key: str, size: int, spill: Callable[[], None]) -> None:
+        now = time.monotonic()
+        victims: list[Callable[[], None]] = []
+        with self._lock:
+            self._sessions[key] = (size, now, spill)
+            self._sessions.move_to_end(key)
+            total = sum(entry[0] for entry in self._sessions.values())
+            for other, (other_size, last_seen, other_spill) in list(self._sessions.items()):
+                if other == key or (total <= self.max_bytes and now - last_seen <= self.idle_s):
+                    break  # daqui em diante, só sessões mais recentes
+                del self._sessions[other]
+                total -= other_size
+                victims.append(other_spill)
+            self._spills += len(victims)
+        for victim in victims:
+            # Fora do lock: spill() mexe no estado de outra sessão
+            try:
+                victim()
+            except Exception:
+                pass
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(entry[0] for entry in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "spills": self._spills,
+            }
+
+
+_session_budget: SessionMemoryBudget | None = None
+_session_budget_lock = threading.Lock()
+
+def get_session_budget() -> SessionMemoryBudget:
+    global _session_budget
+    with _session_budget_lock:
+        if _session_budget is None:
+            _session_budget = SessionMemoryBudget(SESSION_MEMORY_MAX_BYTES, WORKSPACE_IDLE_TTL_S)
+        return _session_budget
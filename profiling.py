@@ -0,0 +1,158 @@
+"""Perfil de renderização: fases cronometradas, rastro do Quarto e cProfile, gravados para diagnóstico offline."""
+
+import contextvars
+import cProfile
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from quarto_runner import get_quarto_version
+
+
+# Perfil de renderização (opt-in): por requisição (profile=True) ou por amostragem
+PROFILE_SAMPLE_RATE = float(os.environ.get("GERADOR_PROFILE_RATE", "0"))
+PROFILE_DIR = os.environ.get("GERADOR_PROFILE_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_profiles"
+)
+PROFILE_CPROFILE = os.environ.get("GERADOR_PROFILE_CPROFILE", "0").strip().lower() in ("1", "true", "yes", "sim")
+
+
+# Perfil da renderização em andamento nesta thread (lido por phase e current_profile)
+_active_profile: contextvars.ContextVar["RenderProfile | None"] = contextvars.ContextVar(
+    "active_render_profile", default=None
+)
+# A partir do Python 3.12 o cProfile usa sys.monitoring, que é do processo todo: um segundo
+# enable() simultâneo levanta ValueError. Só uma renderização por vez leva cProfile
+_cprofile_lock = threading.Lock()
+
+
+class RenderProfile:
+    """Rastro de uma renderização para diagnóstico offline.
+
+    Grava em PROFILE_DIR, com o mesmo prefixo <id>:
+      - <id>.jsonl: um cabeçalho (tipo "render") e um span por fase, com início relativo e duração;
+      - <id>.quarto.log: saída do Quarto em --log-level debug, cada linha com o instante relativo;
+      - <id>.prof: cProfile do lado Python (se cprofile=True), para `python -m pstats` ou snakeviz.
+
+    Se outra renderização já estiver com o cProfile (ou o enable() falhar), esta segue sem ele e o
+    cabeçalho registra "cprofile": "skipped".
+    """
+
+    def __init__(self, profile_dir: str, cprofile: bool = False) -> None:
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.profile_dir = profile_dir
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: list[dict[str, Any]] = []
+        self.quarto_log: list[tuple[float, str, str]] = []
+        self.peak_rss_kb: int | None = None
+        self._lock = threading.Lock()
+        self._profiler = cProfile.Profile() if cprofile else None
+        self.cprofile: str | None = "on" if cprofile else None
+        self._token: contextvars.Token | None = None
+
+    def __enter__(self) -> "RenderProfile":
+        self._token = _active_profile.set(self)
+        if self._profiler is not None:
+            if not _cprofile_lock.acquire(blocking=False):
+                self._skip_cprofile()
+            else:
+                try:
+                    self._profiler.enable()
+                except Exception:
+                    # Outro profiler ativo (fora do nosso lock) ou interpretador sem suporte
+                    _cprofile_lock.release()
+                    self._skip_cprofile()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._profiler is not None:
+            try:
+                self._profiler.disable()
+            except Exception:
+                self._skip_cprofile()
+            finally:
+                _cprofile_lock.release()
+        if self._token is not None:
+            _active_profile.reset(self._token)
+
+    def _skip_cprofile(self) -> None:
+        self._profiler = None
+        self.cprofile = "skipped"
+
+    def span(self, name: str, started: float, ended: float) -> None:
+        self.spans.append({
+            "type": "span",
+            "name": name,
+            "start_s": round(started - self._t0, 4),
+            "duration_s": round(ended - started, 4),
+        })
+
+    def log(self, stream: str, line: str) -> None:
+        # Chamado pelas threads que leem stdout/stderr do Quarto
+        with self._lock:
+            self.quarto_log.append((time.perf_counter() - self._t0, stream, line))
+
+    def write(self, backend: str, error: str | None, debug: dict[str, Any], elapsed_s: float) -> dict[str, Any]:
+        """Grava os arquivos do perfil e retorna o resumo que vai em debug["profile"]."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, self.id)
+        header = {
+            "type": "render",
+            "id": self.id,
+            "started_at": self.started_at,
+            "backend": backend,
+            "total_s": round(elapsed_s, 4),
+            "error": error,
+            "exit_code": debug.get("exit_code"),
+            "cache": debug.get("cache"),
+            "output_bytes": debug.get("output_bytes"),
+            "peak_rss_kb": self.peak_rss_kb,
+            "cprofile": self.cprofile,
+            "quarto_version": get_quarto_version() if backend == "quarto" else None,
+        }
+        files = [base + ".jsonl"]
+        with open(base + ".jsonl", "w", encoding="utf-8") as f:
+            for record in [header, *self.spans]:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if self.quarto_log:
+            files.append(base + ".quarto.log")
+            with open(base + ".quarto.log", "w", encoding="utf-8") as f:
+                for offset, stream, line in self.quarto_log:
+                    f.write(f"[+{offset:9.3f}s] {stream}: {line}\n")
+        if self._profiler is not None:
+            files.append(base + ".prof")
+            self._profiler.dump_stats(base + ".prof")
+        return {"id": self.id, "files": files, "peak_rss_kb": self.peak_rss_kb, "cprofile": self.cprofile}
+
+
+def current_profile() -> RenderProfile | None:
+    """Perfil da renderização em andamento nesta thread (o motor o repassa ao run_quarto)."""
+    return _active_profile.get()
+
+
+@contextmanager
+def phase(timings: dict[str, float], name: str) -> Iterator[None]:
+    """Acumula em timings[name] os segundos gastos no bloco (e vira um span se houver perfil ativo)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        timings[name] = round(timings.get(name, 0.0) + ended - started, 4)
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.span(name, started, ended)
+
+
+def should_profile(profile: bool | None) -> bool:
+    # None = decide pela taxa de amostragem (GERADOR_PROFILE_RATE)
+    if profile is not None:
+        return profile
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
@@ -0,0 +1,190 @@
+"""Template Quarto do projeto: materialização nos workspaces, fingerprint e o QMD gerado."""
+
+import fnmatch
+import os
+import re
+import shutil
+import threading
+from hashlib import sha256
+
+from utils_fs import atomic_write, clone_file
+
+
+# Resolução dos slides (reveal.js); imagens enviadas são reduzidas para caber nela
+SLIDE_WIDTH = 1280
+SLIDE_HEIGHT = 720
+
+# Template Quarto do projeto (copiado/linkado para cada workspace)
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template")
+
+# Rodapé dos slides (o rascunho do draft_render usa o mesmo texto)
+DECK_FOOTER = "IFS | Apresentação do TCC"
+
+# Padrões ignorados ao copiar/fingerprintar o template (artefatos de renderizações anteriores)
+TEMPLATE_IGNORE_PATTERNS = (".quarto", "_site", "*.html", "*.pdf", "*.log")
+
+# Como o template é materializado nos workspaces: "link" (hardlink/reflink, sem copiar bytes) ou "copy"
+TEMPLATE_MATERIALIZE_MODE = os.environ.get("GERADOR_TEMPLATE_MODE", "link")
+# Arquivos do template que a renderização regrava: recebem sempre uma cópia própria
+RENDER_WRITTEN_FILES = frozenset({"apresentacao.qmd"})
+
+
+def _is_template_ignored(name: str) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) for pattern in TEMPLATE_IGNORE_PATTERNS)
+
+
+def copy_template(src: str, dst: str, mode: str = "copy") -> dict[str, int]:
+    """Copia o template para dst. Em mode="link" os arquivos somente-leitura viram hardlinks/reflinks.
+
+    Com links, quem grava no workspace deve substituir o arquivo (os.replace), nunca abri-lo
+    para escrita, senão o original do template seria alterado junto.
+    """
+    counts: dict[str, int] = {"hardlink": 0, "reflink": 0, "copy": 0}
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [d for d in dirs if not _is_template_ignored(d)]
+        rel_root = os.path.relpath(root, src)
+        target_root = dst if rel_root == "." else os.path.join(dst, rel_root)
+        os.makedirs(target_root, exist_ok=True)
+        for filename in files:
+            if _is_template_ignored(filename):
+                continue
+            source = os.path.join(root, filename)
+            target = os.path.join(target_root, filename)
+            if os.path.lexists(target):
+                os.remove(target)
+            rel_path = os.path.relpath(source, src).replace(os.sep, "/")
+            if mode != "link" or rel_path in RENDER_WRITTEN_FILES:
+                shutil.copy2(source, target)
+                counts["copy"] += 1
+            else:
+                counts[clone_file(source, target)] += 1
+    return counts
+
+_template_fingerprints: dict[tuple, str] = {}
+_template_fingerprints_lock = threading.Lock()
+
+def template_fingerprint(template_path: str) -> str:
+    """Hash do conteúdo do template; só relê os arquivos quando tamanho/mtime mudam."""
+    entries: list[tuple[str, int, int]] = []
+    for root, dirs, files in os.walk(template_path):
+        dirs[:] = sorted(d for d in dirs if not _is_template_ignored(d))
+        for filename in sorted(files):
+            if _is_template_ignored(filename):
+                continue
+            full_path = os.path.join(root, filename)
+            st = os.stat(full_path)
+            rel = os.path.relpath(full_path, template_path).replace(os.sep, "/")
+            entries.append((rel, st.st_size, st.st_mtime_ns))
+
+    signature = (os.path.abspath(template_path), tuple(entries))
+    with _template_fingerprints_lock:
+        cached = _template_fingerprints.get(signature)
+    if cached:
+        return cached
+
+    h = sha256()
+    for rel, _size, _mtime in entries:
+        h.update(rel.encode("utf-8") + b"\0")
+        with open(os.path.join(template_path, rel), "rb") as f:
+            h.update(sha256(f.read()).digest())
+    digest = h.hexdigest()
+    with _template_fingerprints_lock:
+        _template_fingerprints.clear()
+        _template_fingerprints[signature] = digest
+    return digest
+
+
+def find_rendered_html(work_dir: str) -> str | None:
+    candidates = [
+        os.path.join(work_dir, "apresentacao.html"),
+        os.path.join(work_dir, "_site", "apresentacao.html"),
+        os.path.join(work_dir, "_site", "index.html"),
+    ]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+
+    found_html: list[str] = []
+    found_apresentacao: list[str] = []
+    for root, dirs, files in os.walk(work_dir):
+        dirs[:] = [d for d in dirs if d not in {".quarto", "node_modules"}]
+        for filename in files:
+            if filename.lower().endswith(".html"):
+                full_path = os.path.join(root, filename)
+                found_html.append(full_path)
+                if filename.lower() == "apresentacao.html":
+                    found_apresentacao.append(full_path)
+
+    if found_apresentacao:
+        found_apresentacao.sort(key=lambda p: p.count(os.sep))
+        return found_apresentacao[0]
+
+    if len(found_html) == 1:
+        return found_html[0]
+
+    for p in found_html:
+        if p.lower().endswith(os.sep + "_site" + os.sep + "index.html"):
+            return p
+
+    return None
+
+
+# theme/css do _quarto.yml, com os itens de lista nas linhas seguintes, se houver
+_PROJECT_THEME_RE = re.compile(r"^([ \t]+)(?:theme|css):[^\n]*\n(?:\1[ \t]+-[^\n]*\n)*", re.MULTILINE)
+
+def write_project_config(template_path: str, work_dir: str) -> None:
+    """Grava no workspace o _quarto.yml do template sem theme/css.
+
+    O Quarto concatena as listas do projeto e do documento: nos decks gerados, quem escolhe o
+    tema é o cabeçalho do QMD (build_qmd_content). O template continua renderizável sozinho.
+    """
+    source = os.path.join(template_path, "_quarto.yml")
+    if not os.path.exists(source):
+        return
+    with open(source, encoding="utf-8") as f:
+        config = f.read()
+    # Substitui (não reescreve) o arquivo: no modo link ele é o mesmo inode do template
+    atomic_write(os.path.join(work_dir, "_quarto.yml"), _PROJECT_THEME_RE.sub("", config).encode("utf-8"))
+
+
+def build_qmd_content(
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    theme_css: str | None = None,
+) -> str:
+    # O tema sai só daqui (o _quarto.yml do workspace vem sem theme/css, veja write_project_config).
+    # Com theme_css (nome do bundle pré-compilado em assets/), o Quarto compila apenas o "simple",
+    # que fica no cache de Sass dele, e o bundle traz o resto
+    if theme_css:
+        theme_lines = f"""    theme: simple
+    css: assets/{theme_css}"""
+    else:
+        theme_lines = """    theme: [simple, assets/ufs.scss]
+    css: assets/custom.css"""
+    return f"""---
+title: "{titulo}"
+subtitle: "{subtitulo}"
+institute: "{instituto}"
+date: today
+date-format: "D [de] MMMM [de] YYYY"
+lang: pt-BR
+title-slide-attributes:
+  class: title-slide
+format:
+  revealjs:
+{theme_lines}
+    logo: assets/logo_IFS.png
+    footer: "{DECK_FOOTER}"
+    slide-number: true
+    controls: true
+    width: {SLIDE_WIDTH}
+    height: {SLIDE_HEIGHT}
+    transition: slide
+    background-transition: fade
+    preview-links: auto
+---
+
+{conteudo}
+"""
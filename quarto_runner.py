@@ -0,0 +1,702 @@
+"""Execução do Quarto: instalação e versão do CLI, governador de recursos, cancelamento e daemons de preview."""
+
+import atexit
+import contextvars
+import functools
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import requests
+
+try:
+    import resource  # posix: limites de CPU/memória do `quarto render`
+except ImportError:
+    resource = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from profiling import RenderProfile
+
+
+# Daemon do Quarto (opt-in): um `quarto preview` vivo por workspace de sessão
+QUARTO_DAEMON_ENABLED = os.environ.get("GERADOR_QUARTO_DAEMON", "0").strip().lower() in ("1", "true", "yes", "sim")
+QUARTO_DAEMON_MAX = int(os.environ.get("GERADOR_QUARTO_DAEMONS", "4"))
+QUARTO_DAEMON_MAX_RENDERS = int(os.environ.get("GERADOR_QUARTO_DAEMON_RENDERS", "50"))
+
+# Governador de cada `quarto render`: prazo de parede e limites de CPU/memória (0 desliga)
+RENDER_TIMEOUT_S = float(os.environ.get("GERADOR_RENDER_TIMEOUT_S", "300"))
+RENDER_CPU_LIMIT_S = float(os.environ.get("GERADOR_RENDER_CPU_S", "300"))
+RENDER_MEMORY_LIMIT_MB = float(os.environ.get("GERADOR_RENDER_MEMORY_MB", "2048"))
+
+
+def get_quarto_binary() -> str:
+    """Retorna o caminho do executável do Quarto, priorizando instalação local no Linux."""
+    # 1. Verifica instalação local (Streamlit Cloud / Linux)
+    if os.name == 'posix':
+        QUARTO_VERSION = "1.8.27"
+        INSTALL_DIR = Path.home() / ".quarto_local"
+        EXTRACTED_FOLDER_NAME = f"quarto-{QUARTO_VERSION}-linux-amd64"
+        QUARTO_EXEC = INSTALL_DIR / EXTRACTED_FOLDER_NAME / "bin" / "quarto"
+        if QUARTO_EXEC.exists():
+            return str(QUARTO_EXEC)
+
+    # 2. Verifica se está no PATH global
+    if shutil.which('quarto'):
+        return 'quarto'
+    
+    # 3. Retorna 'quarto' como fallback (vai falhar se não existir)
+    return 'quarto'
+
+def setup_quarto_linux():
+    """Baixa e configura o Quarto CLI no Linux se não estiver presente."""
+    if os.name != 'posix':
+        return "Windows/Mac detectado (não é Linux)." # Apenas para Linux (Streamlit Cloud)
+
+    # Configuração local
+    QUARTO_VERSION = "1.8.27"
+    INSTALL_DIR = Path.home() / ".quarto_local"
+    EXTRACTED_FOLDER_NAME = f"quarto-{QUARTO_VERSION}-linux-amd64"
+    QUARTO_BIN_DIR = INSTALL_DIR / EXTRACTED_FOLDER_NAME / "bin"
+    QUARTO_EXEC = QUARTO_BIN_DIR / "quarto"
+    
+    # Tenta adicionar o PATH imediatamente, caso já exista
+    if QUARTO_BIN_DIR.exists():
+         os.environ["PATH"] = str(QUARTO_BIN_DIR) + os.pathsep + os.environ["PATH"]
+
+    if QUARTO_EXEC.exists():
+        # Tenta garantir execução
+        try:
+            QUARTO_EXEC.chmod(0o755)
+            # Testa execução rápida
+            subprocess.run([str(QUARTO_EXEC), "--version"], check=True, capture_output=True)
+            return "Quarto já instalado e verificado."
+        except Exception as e:
+            # Se falhar, removemos para tentar instalar novamente na próxima execução (ou agora se continuasse)
+            # Mas como estamos no return, vamos apenas avisar e limpar.
+            shutil.rmtree(INSTALL_DIR, ignore_errors=True)
+            return f"Quarto corrompido detectado e removido. Recarregue a página para tentar reinstalar. Erro: {e}"
+
+    # Se system quarto existir
+    if shutil.which('quarto'):
+        return "Quarto encontrado no PATH do sistema."
+
+    print(f"Instalando Quarto CLI v{QUARTO_VERSION} no Linux...")
+    url = f"https://github.com/quarto-dev/quarto-cli/releases/download/v{QUARTO_VERSION}/quarto-{QUARTO_VERSION}-linux-amd64.tar.gz"
+    
+    try:
+        # Aumentando timeout para 120s para evitar falhas em conexões lentas
+        response = requests.get(url, stream=True, timeout=120)
+        if response.status_code == 200:
+            # Limpa dir anterior se existir (reinstalação limpa)
+            if INSTALL_DIR.exists():
+                shutil.rmtree(INSTALL_DIR)
+                
+            INSTALL_DIR.mkdir(parents=True, exist_ok=True)
+            tar_path = INSTALL_DIR / "quarto.tar.gz"
+            
+            with open(tar_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+            
+            with tarfile.open(tar_path, "r:gz") as tar:
+                tar.extractall(path=INSTALL_DIR)
+            
+            # Limpeza do arquivo tar.gz após extração
+            if tar_path.exists():
+                os.remove(tar_path)
+
+            if QUARTO_EXEC.exists():
+                os.environ["PATH"] = str(QUARTO_BIN_DIR) + os.pathsep + os.environ["PATH"]
+                QUARTO_EXEC.chmod(0o755) 
+                return f"Instalação do Quarto v{QUARTO_VERSION} realizada com sucesso."
+            else:
+                # Debug: listar pastas criadas
+                found = list(INSTALL_DIR.glob("**/*"))
+                return f"Falha: executável não encontrado após extração. Conteúdo de {INSTALL_DIR}: {found}"
+        else:
+            return f"Erro HTTP {response.status_code} ao baixar Quarto."
+    except Exception as e:
+        return f"Exceção na instalação do Quarto: {e}"
+
+@functools.lru_cache(maxsize=8)
+def _quarto_version_for(quarto_cmd: str) -> str:
+    try:
+        result = subprocess.run(
+            [quarto_cmd, "--version"],
+            capture_output=True,
+            text=True,
+            check=False,
+            timeout=60,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return "desconhecida"
+    return result.stdout.strip() or "desconhecida"
+
+def get_quarto_version() -> str:
+    """Retorna a versão do Quarto em uso (consultada uma única vez por binário)."""
+    return _quarto_version_for(get_quarto_binary())
+
+
+# --- Cancelamento ---------------------------------------------------------------------------
+
+class RenderCancelledError(Exception):
+    """A renderização foi cancelada por um CancelToken (conteúdo mais novo a substituiu)."""
+
+
+# Token de cancelamento da renderização em andamento nesta thread (lido por run_quarto)
+_active_cancel: contextvars.ContextVar["CancelToken | None"] = contextvars.ContextVar(
+    "active_render_cancel", default=None
+)
+
+
+class CancelToken:
+    """Permite abortar uma renderização de outra thread: `with token: engine.render(...)`.
+
+    cancel() derruba o `quarto render` em andamento (a árvore toda) ou impede que ele comece;
+    a renderização retorna com debug["cancelled"].
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._token: contextvars.Token | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def __enter__(self) -> "CancelToken":
+        self._token = _active_cancel.set(self)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._token is not None:
+            _active_cancel.reset(self._token)
+
+
+def check_cancelled() -> None:
+    cancel = _active_cancel.get()
+    if cancel is not None and cancel.cancelled:
+        raise RenderCancelledError("Renderização cancelada.")
+
+
+# --- Governança de recursos por renderização -------------------------------------------------
+
+class RenderLimitError(Exception):
+    """O `quarto render` estourou um limite (tempo, CPU ou memória) e a árvore foi derrubada."""
+
+    def __init__(self, reason: str, message: str, stdout: str = "", stderr: str = "") -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+_LIMIT_MESSAGES = {
+    "timeout": "A renderização passou de {timeout:.0f} s e foi interrompida.",
+    "cpu": "A renderização passou do limite de {cpu:.0f} s de CPU e foi interrompida.",
+    "memory": "A renderização passou do limite de {memory:.0f} MB de memória e foi interrompida.",
+}
+
+
+def _limit_error(reason: str, stdout: str, stderr: str) -> RenderLimitError:
+    message = _LIMIT_MESSAGES[reason].format(
+        timeout=RENDER_TIMEOUT_S, cpu=RENDER_CPU_LIMIT_S, memory=RENDER_MEMORY_LIMIT_MB
+    )
+    return RenderLimitError(reason, message + " Simplifique o conteúdo (tabelas, diagramas, imagens remotas).", stdout, stderr)
+
+
+def _apply_rlimits(pid: int, cpu: bool = True) -> None:
+    # prlimit no filho já criado (e não preexec_fn, que não é seguro com threads no processo pai).
+    # Os descendentes (Deno, Pandoc, Dart Sass) herdam os limites; cada um vale por processo.
+    # Memória via RLIMIT_DATA, não RLIMIT_AS: o V8 do Deno reserva dezenas de GB de espaço de
+    # endereçamento sem usá-los e não sobe com RLIMIT_AS baixo.
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    limits = []
+    if cpu and RENDER_CPU_LIMIT_S > 0:
+        cpu_s = int(RENDER_CPU_LIMIT_S)
+        limits.append((resource.RLIMIT_CPU, (cpu_s, cpu_s + 5)))  # SIGXCPU, depois SIGKILL
+    if RENDER_MEMORY_LIMIT_MB > 0:
+        memory = int(RENDER_MEMORY_LIMIT_MB * 1024 * 1024)
+        limits.append((resource.RLIMIT_DATA, (memory, memory)))
+    for kind, value in limits:
+        try:
+            resource.prlimit(pid, kind, value)
+        except (OSError, ValueError):
+            pass  # o processo já terminou, ou o limite atual é menor que o pedido
+
+
+def _session_cpu_s(sid: int) -> float | None:
+    """CPU (s) gasta pela sessão `sid`: processos vivos + filhos já coletados pelo líder (só Linux)."""
+    if not os.path.isdir("/proc"):
+        return None
+    total = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "stat"), "rb") as f:
+                stat = f.read()
+            # Depois do "(comando)": estado, ppid, pgrp, sid, ..., utime, stime, cutime, cstime
+            fields = stat[stat.rfind(b")") + 2:].split()
+            if int(fields[3]) != sid:
+                continue
+            total += int(fields[11]) + int(fields[12])
+            if int(entry.name) == sid:
+                total += int(fields[13]) + int(fields[14])
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+_MEMORY_ERROR_RE = re.compile(r"out of memory|cannot allocate|heap limit", re.IGNORECASE)
+
+
+def run_governed(
+    cmd: list[str],
+    work_dir: str,
+    env: dict[str, str],
+    resources: dict[str, Any] | None = None,
+    cancel: "CancelToken | None" = None,
+    profile: "RenderProfile | None" = None,
+) -> subprocess.CompletedProcess:
+    """Roda o Quarto sob o governador: grupo de processos próprio, prazo, rlimits e cancelamento.
+
+    Estourou o prazo, a CPU ou a memória: derruba a árvore inteira e levanta RenderLimitError
+    com o motivo. Cancelado: RenderCancelledError. Com `profile`, roda em --log-level debug e
+    carimba cada linha. `resources` recebe o tempo, a CPU e o pico de RSS do processo.
+    """
+    if profile is not None:
+        cmd = [*cmd, "--log-level", "debug"]
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        cmd,
+        cwd=work_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        env=env,
+        start_new_session=os.name == "posix",
+    )
+    _apply_rlimits(proc.pid)
+    captured: dict[str, list[str]] = {"stdout": [], "stderr": []}
+
+    def pump(stream: Any, name: str) -> None:
+        for line in stream:
+            captured[name].append(line)
+            if profile is not None:
+                profile.log(name, line.rstrip("\n"))
+
+    readers = [
+        threading.Thread(target=pump, args=(proc.stdout, "stdout"), daemon=True),
+        threading.Thread(target=pump, args=(proc.stderr, "stderr"), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    usage = None
+    stop_reason: str | None = None
+    while True:
+        if hasattr(os, "wait4"):
+            # wait4 devolve o rusage do filho: ru_maxrss é o maior RSS dele ou dos descendentes já
+            # coletados (Deno, Pandoc, Dart Sass). Em KiB no Linux, em bytes no macOS.
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                break
+        elif proc.poll() is not None:
+            break
+        if cancel is not None and cancel.cancelled:
+            stop_reason = "cancelled"
+        elif RENDER_TIMEOUT_S > 0 and time.monotonic() - started > RENDER_TIMEOUT_S:
+            stop_reason = "timeout"
+        if stop_reason:
+            _kill_process_tree(proc)
+            break
+        time.sleep(0.05)
+    for reader in readers:
+        # Um neto que escapou do grupo pode segurar o pipe aberto: não espera para sempre
+        reader.join(timeout=5)
+    stdout, stderr = "".join(captured["stdout"]), "".join(captured["stderr"])
+
+    info: dict[str, Any] = {"wall_s": round(time.monotonic() - started, 3)}
+    if usage is not None:
+        info["cpu_s"] = round(usage.ru_utime + usage.ru_stime, 3)
+        info["peak_rss_kb"] = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    if resources is not None:
+        resources.update(info)
+    if profile is not None:
+        profile.peak_rss_kb = info.get("peak_rss_kb")
+
+    if stop_reason == "cancelled":
+        raise RenderCancelledError("Renderização cancelada.")
+    if stop_reason:
+        raise _limit_error(stop_reason, stdout, stderr)
+    if proc.returncode != 0:
+        # Limites do kernel: SIGXCPU/SIGKILL pela CPU; falha de alocação pela memória
+        killed_by = -proc.returncode if proc.returncode < 0 else proc.returncode - 128
+        if RENDER_CPU_LIMIT_S > 0 and (
+            killed_by == getattr(signal, "SIGXCPU", -1) or info.get("cpu_s", 0) >= RENDER_CPU_LIMIT_S
+        ):
+            raise _limit_error("cpu", stdout, stderr)
+        if RENDER_MEMORY_LIMIT_MB > 0 and _MEMORY_ERROR_RE.search(stderr):
+            raise _limit_error("memory", stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+# --- Daemon do Quarto -----------------------------------------------------------------------
+
+# Sem novas mensagens do Quarto por esse tempo após um "Output created", a renderização acabou
+QUARTO_DAEMON_SETTLE_S = 0.3
+# Falhas seguidas ao iniciar que desligam o daemon (ex.: Quarto sem suporte a `preview --no-serve`)
+QUARTO_DAEMON_MAX_START_FAILURES = 3
+
+
+def _kill_process_tree(process: subprocess.Popen) -> None:
+    """Encerra o processo e seus descendentes (Deno, Pandoc, Dart Sass).
+
+    No posix o processo precisa ter sido iniciado com start_new_session=True (grupo próprio).
+    """
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            # quarto.cmd -> deno: só o taskkill /T derruba a árvore inteira
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True, check=False)
+        process.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except OSError:
+            pass
+
+
+class QuartoDaemonError(Exception):
+    """O daemon não conseguiu renderizar (morreu, não embute os recursos...): use o `quarto render` avulso."""
+
+
+class QuartoDaemon:
+    """Um `quarto preview --no-serve` vivo num workspace.
+
+    O preview observa o diretório e re-renderiza a cada gravação do QMD, sem pagar de novo a
+    partida do Deno, dos filtros Lua e do Pandoc. Cada renderização concluída imprime
+    "Output created"; erros saem em linhas "ERROR".
+
+    Vale o mesmo governador do `quarto render` avulso: RLIMIT_DATA herdado pela árvore, e por
+    renderização o prazo, a CPU do grupo de processos e o CancelToken. Estourou ou foi cancelado:
+    levanta RenderLimitError/RenderCancelledError e quem chamou derruba o daemon.
+    """
+
+    def __init__(self, work_dir: str, env: dict[str, str]) -> None:
+        self.work_dir = work_dir
+        self.renders = 0
+        self.last_used = time.time()
+        self._cond = threading.Condition()
+        self._log: deque[str] = deque(maxlen=4000)
+        self._line_count = 0
+        self._outputs = 0
+        self._errors = 0
+        self._last_event = ""
+        self._last_line_at = time.monotonic()
+        cmd = [
+            get_quarto_binary(),
+            "preview",
+            "apresentacao.qmd",
+            "--to",
+            "revealjs",
+            "--embed-resources",
+            "--no-serve",
+            "--no-browser",
+        ]
+        self.process = subprocess.Popen(
+            cmd,
+            cwd=work_dir,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+            # Grupo próprio: ao parar, derruba também o Deno/Pandoc filhos
+            start_new_session=os.name == "posix",
+        )
+        # Memória por processo, herdada pelos filhos; a CPU é contada por renderização em render()
+        _apply_rlimits(self.process.pid, cpu=False)
+        threading.Thread(target=self._read_output, name="quarto-daemon", daemon=True).start()
+
+    def _read_output(self) -> None:
+        assert self.process.stdout is not None
+        for line in self.process.stdout:
+            with self._cond:
+                self._log.append(line)
+                self._line_count += 1
+                self._last_line_at = time.monotonic()
+                if "Output created" in line:
+                    self._outputs += 1
+                    self._last_event = "output"
+                elif line.lstrip().startswith("ERROR"):
+                    self._errors += 1
+                    self._last_event = "error"
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def render(
+        self,
+        write_input: Callable[[], bool],
+        cancel: "CancelToken | None" = None,
+        resources: dict[str, Any] | None = None,
+    ) -> subprocess.CompletedProcess:
+        """Grava o QMD (uma vez) e espera o HTML. A primeira renderização é a que o preview faz ao iniciar."""
+        with self._cond:
+            outputs, errors, marker = self._outputs, self._errors, self._line_count
+        if self.renders and not write_input():
+            # QMD igual ao anterior (mudaram só as imagens, ou o cache não tinha o HTML): regrava os
+            # mesmos bytes no lugar, só para gerar o evento de modificação que o preview observa
+            qmd_path = os.path.join(self.work_dir, "apresentacao.qmd")
+            with open(qmd_path, "r+b") as f:
+                data = f.read()
+                f.seek(0)
+                f.write(data)
+                f.truncate()
+        elif not self.renders and marker:
+            outputs = errors = marker = 0
+
+        started = time.monotonic()
+        cpu_before = _session_cpu_s(self.process.pid) if RENDER_CPU_LIMIT_S > 0 else None
+        cpu_used = 0.0
+        stop_reason: str | None = None
+        with self._cond:
+            while True:
+                settled = time.monotonic() - self._last_line_at >= QUARTO_DAEMON_SETTLE_S
+                if (self._outputs > outputs or self._errors > errors) and settled:
+                    break
+                if not self.alive():
+                    break
+                if cancel is not None and cancel.cancelled:
+                    stop_reason = "cancelled"
+                elif RENDER_TIMEOUT_S > 0 and time.monotonic() - started > RENDER_TIMEOUT_S:
+                    stop_reason = "timeout"
+                elif cpu_before is not None:
+                    cpu_used = (_session_cpu_s(self.process.pid) or cpu_before) - cpu_before
+                    if cpu_used > RENDER_CPU_LIMIT_S:
+                        stop_reason = "cpu"
+                if stop_reason:
+                    break
+                self._cond.wait(QUARTO_DAEMON_SETTLE_S)
+            new_lines = min(self._line_count - marker, len(self._log))
+            log = "".join(list(self._log)[len(self._log) - new_lines:]) if new_lines else ""
+            ok = self._last_event == "output"
+
+        if resources is not None:
+            resources["wall_s"] = round(time.monotonic() - started, 3)
+            if cpu_before is not None:
+                resources["cpu_s"] = round(cpu_used, 3)
+        if stop_reason == "cancelled":
+            raise RenderCancelledError("Renderização cancelada.")
+        if stop_reason:
+            raise _limit_error(stop_reason, log, log)
+        if RENDER_MEMORY_LIMIT_MB > 0 and not ok and _MEMORY_ERROR_RE.search(log):
+            raise _limit_error("memory", log, log)
+        if not self.alive():
+            raise QuartoDaemonError(f"daemon do Quarto terminou (exit={self.process.returncode})")
+
+        self.renders += 1
+        self.last_used = time.time()
+        ok = ok and os.path.exists(os.path.join(self.work_dir, "apresentacao.html"))
+        return subprocess.CompletedProcess(self.process.args, 0 if ok else 1, stdout=log, stderr="" if ok else log)
+
+    def stop(self) -> None:
+        _kill_process_tree(self.process)
+
+
+class QuartoDaemonPool:
+    """Daemons do Quarto por workspace: no máximo `max_daemons` vivos (LRU), reciclados a cada `max_renders`."""
+
+    def __init__(self, max_daemons: int, max_renders: int) -> None:
+        self.max_daemons = max(1, max_daemons)
+        self.max_renders = max(1, max_renders)
+        self.disabled_reason: str | None = None
+        self._daemons: OrderedDict[str, QuartoDaemon] = OrderedDict()
+        self._lock = threading.Lock()
+        self._start_failures = 0
+        self._counters = {"started": 0, "renders": 0, "recycled": 0, "failures": 0}
+
+    def render(
+        self,
+        work_dir: str,
+        env: dict[str, str],
+        write_input: Callable[[], bool],
+        cancel: "CancelToken | None" = None,
+        resources: dict[str, Any] | None = None,
+    ) -> subprocess.CompletedProcess:
+        """Renderiza o workspace com seu daemon (criado sob demanda). QuartoDaemonError: use o CLI avulso.
+
+        Prazo, limites e cancelamento (RenderLimitError/RenderCancelledError) são definitivos: o
+        daemon é derrubado e não há nova tentativa pelo CLI.
+        """
+        if self.disabled_reason:
+            raise QuartoDaemonError(self.disabled_reason)
+
+        stale: list[QuartoDaemon] = []
+        with self._lock:
+            daemon = self._daemons.pop(work_dir, None)
+            if daemon is not None and not daemon.alive():
+                stale.append(daemon)
+                daemon = None
+            if daemon is None:
+                while len(self._daemons) >= self.max_daemons:
+                    stale.append(self._daemons.popitem(last=False)[1])
+        for old in stale:
+            old.stop()
+
+        if daemon is None:
+            # O preview renderiza ao iniciar: o QMD precisa estar gravado antes
+            write_input()
+            try:
+                daemon = QuartoDaemon(work_dir, env)
+            except OSError as exc:
+                raise QuartoDaemonError(str(exc)) from exc
+            with self._lock:
+                self._counters["started"] += 1
+        with self._lock:
+            self._daemons[work_dir] = daemon
+
+        first_render = daemon.renders == 0
+        try:
+            result = daemon.render(write_input, cancel, resources)
+        except (RenderLimitError, RenderCancelledError):
+            # Parou no meio de uma renderização: o processo não serve mais
+            self.stop(work_dir)
+            with self._lock:
+                self._counters["failures"] += 1
+            raise
+        except QuartoDaemonError as exc:
+            self.stop(work_dir)
+            with self._lock:
+                self._counters["failures"] += 1
+                if first_render:
+                    self._start_failures += 1
+                    if self._start_failures >= QUARTO_DAEMON_MAX_START_FAILURES:
+                        self.disabled_reason = f"daemon do Quarto desligado após falhas ao iniciar: {exc}"
+            raise
+
+        if result.returncode == 0 and first_render:
+            # O preview precisa respeitar --embed-resources; se não, o daemon não serve para nós
+            with open(os.path.join(work_dir, "apresentacao.html"), "rb") as f:
+                self_contained = b"apresentacao_files/" not in f.read()
+            if not self_contained:
+                self.stop(work_dir)
+                with self._lock:
+                    self.disabled_reason = "quarto preview não embutiu os recursos (--embed-resources)"
+                raise QuartoDaemonError(self.disabled_reason)
+
+        with self._lock:
+            self._start_failures = 0
+            self._counters["renders"] += 1
+        if daemon.renders >= self.max_renders:
+            # Reciclagem: evita acúmulo de memória/estado num processo de vida longa
+            self.stop(work_dir)
+            with self._lock:
+                self._counters["recycled"] += 1
+        return result
+
+    def stop(self, work_dir: str) -> None:
+        with self._lock:
+            daemon = self._daemons.pop(work_dir, None)
+        if daemon is not None:
+            daemon.stop()
+
+    def stop_all(self) -> None:
+        with self._lock:
+            daemons = list(self._daemons.values())
+            self._daemons.clear()
+        for daemon in daemons:
+            daemon.stop()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            alive = sum(1 for daemon in self._daemons.values() if daemon.alive())
+            return {
+                "enabled": QUARTO_DAEMON_ENABLED and not self.disabled_reason,
+                "disabled_reason": self.disabled_reason,
+                "daemons": len(self._daemons),
+                "alive": alive,
+                "max_daemons": self.max_daemons,
+                "max_renders": self.max_renders,
+                **self._counters,
+            }
+
+
+_quarto_daemon_pool: QuartoDaemonPool | None = None
+_quarto_daemon_pool_lock = threading.Lock()
+
+def get_quarto_daemon_pool() -> QuartoDaemonPool:
+    global _quarto_daemon_pool
+    with _quarto_daemon_pool_lock:
+        if _quarto_daemon_pool is None:
+            _quarto_daemon_pool = QuartoDaemonPool(QUARTO_DAEMON_MAX, QUARTO_DAEMON_MAX_RENDERS)
+            # Os daemons rodam em grupo próprio: não morrem sozinhos com este processo
+            atexit.register(_quarto_daemon_pool.stop_all)
+        return _quarto_daemon_pool
+
+def stop_quarto_daemon(work_dir: str) -> None:
+    if _quarto_daemon_pool is not None:
+        _quarto_daemon_pool.stop(work_dir)
+
+def stop_all_quarto_daemons() -> None:
+    if _quarto_daemon_pool is not None:
+        _quarto_daemon_pool.stop_all()
+
+def quarto_daemon_stats() -> dict[str, Any]:
+    if _quarto_daemon_pool is None:
+        return {"enabled": QUARTO_DAEMON_ENABLED, "daemons": 0}
+    return _quarto_daemon_pool.stats()
+
+def run_quarto(
+    cmd: list[str],
+    work_dir: str,
+    env: dict[str, str],
+    persistent: bool,
+    write_input: Callable[[], bool],
+    resources: dict[str, Any] | None = None,
+    profile: "RenderProfile | None" = None,
+) -> tuple[subprocess.CompletedProcess, bool]:
+    """Roda a renderização pelo daemon do workspace (se habilitado) ou pelo CLI avulso. Retorna (resultado, usou_daemon).
+
+    `write_input` grava o QMD (e diz se mudou): chamado uma vez, já com a vaga, para o daemon
+    não re-renderizar por uma gravação feita antes.
+    """
+    cancel = _active_cancel.get()
+    # Com perfil, sempre o CLI avulso: o daemon esconde a partida e o RSS do processo
+    if profile is None and persistent and QUARTO_DAEMON_ENABLED:
+        try:
+            return get_quarto_daemon_pool().render(work_dir, env, write_input, cancel, resources), True
+        except QuartoDaemonError:
+            pass  # daemon indisponível (não é prazo nem limite): cai para o `quarto render` avulso
+    write_input()
+    result = run_governed(cmd, work_dir, env, resources, cancel=cancel, profile=profile)
+    return result, False
@@ -0,0 +1,186 @@
+"""Caches persistentes em disco do motor: decks renderizados, slides do preview e imagens otimizadas."""
+
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date
+from hashlib import sha256
+from typing import TYPE_CHECKING, Any
+
+from project_template import template_fingerprint
+from quarto_runner import get_quarto_version
+from utils_fs import atomic_write
+
+if TYPE_CHECKING:
+    from uploads import Upload
+
+
+# Cache de renderização (pode ser ajustado por variáveis de ambiente no deploy)
+RENDER_CACHE_DIR = os.environ.get("GERADOR_CACHE_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_cache"
+)
+RENDER_CACHE_MAX_BYTES = int(float(os.environ.get("GERADOR_CACHE_MAX_MB", "512")) * 1024 * 1024)
+RENDER_CACHE_MAX_AGE_S = float(os.environ.get("GERADOR_CACHE_MAX_AGE_H", "72")) * 3600
+
+
+_DATE_TODAY_RE = re.compile(r"^date:\s*today\s*$", re.MULTILINE)
+
+def _normalize_qmd_for_key(qmd_content: str) -> str:
+    # `date: today` é resolvido para a data corrente: o HTML muda de um dia para o outro,
+    # mas dentro do mesmo dia a chave continua estável.
+    return _DATE_TODAY_RE.sub(f"date: {date.today().isoformat()}", qmd_content)
+
+
+def render_cache_key(qmd_content: str, uploads: list["Upload"], template_path: str) -> str:
+    h = sha256()
+    h.update(b"qmd\0" + _normalize_qmd_for_key(qmd_content).encode("utf-8"))
+    for upload in sorted(uploads):
+        h.update(b"upload\0" + upload.name.encode("utf-8") + b"\0" + upload.digest.encode("ascii"))
+    h.update(b"template\0" + template_fingerprint(template_path).encode("ascii"))
+    h.update(b"quarto\0" + get_quarto_version().encode("utf-8"))
+    return h.hexdigest()
+
+
+class RenderCache:
+    """Cache persistente em disco de HTMLs renderizados, endereçado pelo hash da entrada.
+
+    As entradas sobrevivem a reinícios do processo. O mtime de cada arquivo funciona como
+    "último acesso": entradas paradas há mais de `max_age_s` expiram e, acima de `max_bytes`,
+    as menos usadas recentemente são removidas primeiro.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_age_s: float, suffix: str = ".html") -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def _count(self, stat_name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[stat_name] += amount
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_s:
+                os.remove(path)
+                self._count("evictions")
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, data)
+        self._count("stores")
+        self.evict()
+
+    def evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []
+        now = time.time()
+        removed = 0
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                expired = now - st.st_mtime > self.max_age_s
+                # .tmp antigos são sobras de escritas interrompidas
+                if expired or (filename.endswith(".tmp") and now - st.st_mtime > 3600):
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except OSError:
+                        pass
+                    continue
+                if filename.endswith(self.suffix):
+                    entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        if removed:
+            self._count("evictions", removed)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        entries = 0
+        total = 0
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(self.suffix):
+                    try:
+                        total += os.path.getsize(os.path.join(root, filename))
+                        entries += 1
+                    except OSError:
+                        pass
+        stats["entries"] = entries
+        stats["bytes"] = total
+        return stats
+
+
+_render_cache: RenderCache | None = None
+_render_cache_lock = threading.Lock()
+
+def get_render_cache() -> RenderCache:
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache(
+                os.path.join(RENDER_CACHE_DIR, "decks"), RENDER_CACHE_MAX_BYTES, RENDER_CACHE_MAX_AGE_S
+            )
+        return _render_cache
+
+
+# Imagens otimizadas (uploads.prepare_uploads): chave da imagem enviada -> digest do blob
+_image_cache: RenderCache | None = None
+
+def get_image_cache() -> RenderCache:
+    global _image_cache
+    with _render_cache_lock:
+        if _image_cache is None:
+            _image_cache = RenderCache(
+                os.path.join(RENDER_CACHE_DIR, "images"), RENDER_CACHE_MAX_BYTES // 4, RENDER_CACHE_MAX_AGE_S,
+                suffix=".img",
+            )
+        return _image_cache
+
+
+# <section> de cada slide do preview incremental (preview_render.render_preview) e o casco do deck
+_slide_cache: RenderCache | None = None
+
+def get_slide_cache() -> RenderCache:
+    global _slide_cache
+    with _render_cache_lock:
+        if _slide_cache is None:
+            _slide_cache = RenderCache(
+                os.path.join(RENDER_CACHE_DIR, "slides"), RENDER_CACHE_MAX_BYTES // 4, RENDER_CACHE_MAX_AGE_S
+            )
+        return _slide_cache
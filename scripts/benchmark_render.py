@@ -0,0 +1,213 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.abspath(os.path.join(base_path, ".."))
+sys.path.insert(0, repo_root)
+
+import utils_render  # noqa: E402
+
+
+# Corpus sintético: decks de tamanho crescente (slides, imagens e densidade de mermaid/math/código)
+CORPUS = {
+    "pequeno": {"slides": 5, "imagens": 0, "imagem_px": 0, "mermaid": 0, "math": 0, "codigo": 0},
+    "medio": {"slides": 20, "imagens": 4, "imagem_px": 800, "mermaid": 1, "math": 2, "codigo": 2},
+    "grande": {"slides": 60, "imagens": 12, "imagem_px": 1600, "mermaid": 4, "math": 8, "codigo": 8},
+    "imagens": {"slides": 10, "imagens": 20, "imagem_px": 2400, "mermaid": 0, "math": 0, "codigo": 0},
+}
+
+# Ordem em que as fases de render_quarto aparecem no relatório
+PHASES = (
+    "uploads",
+    "qmd_build",
+    "cache_lookup",
+    "template_copy",
+    "qmd_write",
+    "upload_write",
+    "workspace",
+    "queue_wait",
+    "quarto",
+    "find_html",
+    "read_back",
+    "total",
+)
+
+
+def synthetic_png(width: int, height: int, seed: int, block: int = 8) -> bytes:
+    """PNG RGB de blocos de ruído (comprime pouco, como uma figura real), sem depender do Pillow."""
+    rng = random.Random(seed)
+    rows: list[bytes] = []
+    for _ in range(0, height, block):
+        pixels = [rng.randbytes(3) * block for _ in range(0, width, block)]
+        row = b"\x00" + b"".join(pixels)[: width * 3]
+        rows.extend([row] * min(block, height - len(rows)))
+    raw = b"".join(rows)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def synthetic_deck(name: str, spec: dict[str, int]) -> tuple[str, list[tuple[str, bytes]]]:
+    """Gera (conteúdo Markdown, imagens) para um deck do corpus."""
+    images = [
+        (f"bench_{name}_{i}.png", synthetic_png(spec["imagem_px"], spec["imagem_px"] * 9 // 16, seed=i))
+        for i in range(spec["imagens"])
+    ]
+    slides: list[str] = []
+    for i in range(spec["slides"]):
+        body = [f"## Slide {i + 1}", "", f"- Item **{i}.1** com texto de exemplo", f"- Item *{i}.2*", ""]
+        if i < len(images):
+            body += [f"![](Figuras/{images[i][0]})", ""]
+        if i < spec["mermaid"]:
+            body += ["```{mermaid}", "flowchart LR", f"  A{i} --> B{i}", f"  B{i} --> C{i}", "```", ""]
+        if i < spec["math"]:
+            body += [f"$$\\sum_{{k=0}}^{{{i + 2}}} k^2 = \\frac{{n(n+1)(2n+1)}}{{6}}$$", ""]
+        if i < spec["codigo"]:
+            body += ["```python", f"def f{i}(x):", f"    return x * {i}", "```", ""]
+        slides.append("\n".join(body))
+    return "\n".join(slides), images
+
+
+def percentile(values: list[float], p: float) -> float:
+    # Nearest-rank: com poucas repetições é mais honesto que interpolar
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_deck(name: str, repetitions: int, backend: str, session: bool, profile: bool = False) -> dict:
+    conteudo, images = synthetic_deck(name, CORPUS[name])
+    session_id = utils_render.new_session_id() if session else None
+    samples: dict[str, list[float]] = {}
+    output_bytes = 0
+    errors = 0
+    for i in range(repetitions):
+        html_bytes, err, debug = utils_render.render_quarto(
+            titulo=f"Benchmark {name}",
+            subtitulo=f"Repetição {i + 1}",
+            instituto="IFS",
+            conteudo=conteudo,
+            uploaded_files=images,
+            use_cache=False,
+            session_id=session_id,
+            backend=backend,
+            profile=profile or None,
+        )
+        if err or html_bytes is None:
+            errors += 1
+            print(f"  ❌ {name} #{i + 1}: {err}", file=sys.stderr)
+            continue
+        output_bytes = len(html_bytes)
+        if "profile" in debug:
+            print(f"  🔬 {name} #{i + 1}: perfil {debug['profile']['id']}", file=sys.stderr)
+        for phase, seconds in (debug.get("timings") or {}).items():
+            samples.setdefault(phase, []).append(seconds)
+    if session_id:
+        utils_render.get_workspace_manager().release(session_id)
+
+    return {
+        "config": CORPUS[name],
+        "repeticoes": repetitions,
+        "erros": errors,
+        "bytes": output_bytes,
+        "fases": {
+            phase: {"p50": round(percentile(values, 50), 4), "p95": round(percentile(values, 95), 4)}
+            for phase, values in samples.items()
+        },
+    }
+
+
+def print_report(results: dict) -> None:
+    for name, deck in results["decks"].items():
+        print(f"\n📊 {name}  ({deck['bytes'] / 1024:.0f} KiB, {deck['repeticoes']} repetições, {deck['erros']} erros)")
+        phases = [p for p in PHASES if p in deck["fases"]] + sorted(set(deck["fases"]) - set(PHASES))
+        for phase in phases:
+            stats = deck["fases"][phase]
+            print(f"   {phase:<14} p50 {stats['p50'] * 1000:9.1f} ms   p95 {stats['p95'] * 1000:9.1f} ms")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressões (p50 do total ou do tamanho) acima da tolerância em relação ao baseline."""
+    regressions: list[str] = []
+    for name, deck in results["decks"].items():
+        old = baseline.get("decks", {}).get(name)
+        if not old:
+            continue
+        new_total = deck["fases"].get("total", {}).get("p50")
+        old_total = old.get("fases", {}).get("total", {}).get("p50")
+        if new_total and old_total:
+            delta = new_total / old_total - 1
+            print(f"   {name:<10} total p50 {old_total * 1000:8.1f} -> {new_total * 1000:8.1f} ms ({delta:+.0%})")
+            if delta > tolerance:
+                regressions.append(f"{name}: tempo total +{delta:.0%}")
+        if deck["bytes"] and old.get("bytes"):
+            delta = deck["bytes"] / old["bytes"] - 1
+            if delta > tolerance:
+                regressions.append(f"{name}: tamanho do HTML +{delta:.0%}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark por fase do render_quarto com um corpus sintético.")
+    parser.add_argument("--decks", default="pequeno,medio,grande", help=f"Decks do corpus ({', '.join(CORPUS)})")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--backend", choices=utils_render.RENDER_BACKENDS, default="quarto")
+    parser.add_argument("--sessao", action="store_true", help="Reaproveita um workspace de sessão entre as repetições")
+    parser.add_argument("--perfil", action="store_true", help="Grava um perfil de cada repetição em GERADOR_PROFILE_DIR")
+    parser.add_argument("--salvar", help="Grava o resultado como baseline JSON")
+    parser.add_argument("--comparar", help="Baseline JSON para comparar (sai com código 1 se houver regressão)")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Regressão aceita antes de falhar (padrão: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.decks.split(",") if n.strip()]
+    unknown = [n for n in names if n not in CORPUS]
+    if unknown:
+        raise SystemExit(f"Deck(s) desconhecido(s): {', '.join(unknown)}")
+
+    results = {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "backend": args.backend,
+        "sessao": args.sessao,
+        "quarto": utils_render.get_quarto_version() if args.backend == "quarto" else None,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "decks": {},
+    }
+    started = time.perf_counter()
+    for name in names:
+        print(f"⏱️  {name}...", file=sys.stderr)
+        results["decks"][name] = run_deck(name, args.repeticoes, args.backend, args.sessao, args.perfil)
+    print_report(results)
+    print(f"\nTempo total do benchmark: {time.perf_counter() - started:.1f} s")
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Baseline salvo em {args.salvar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n🔍 Comparação com {args.comparar}:")
+        regressions = compare(results, baseline, args.tolerancia)
+        if regressions:
+            print("❌ Regressões: " + "; ".join(regressions))
+            return 1
+        print("✅ Sem regressões acima da tolerância")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+import os
+import sys
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.abspath(os.path.join(base_path, ".."))
+sys.path.insert(0, repo_root)
+
+import theme  # noqa: E402
+
+
+def main() -> int:
+    template_path = os.path.join(repo_root, "template")
+    if not os.path.isdir(template_path):
+        raise SystemExit(f"Template não encontrado: {template_path}")
+
+    bundle, err = theme.build_theme_bundle(template_path)
+    if err:
+        print(f"❌ {err}")
+        return 2
+
+    print(f"✅ Tema pré-compilado: {os.path.join(theme.THEME_DIR, bundle)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
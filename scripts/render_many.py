@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.abspath(os.path.join(base_path, ".."))
+sys.path.insert(0, repo_root)
+
+import batch_render  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Renderiza em paralelo os decks listados num manifesto JSONL (um deck por linha)."
+    )
+    parser.add_argument("manifesto", help="Arquivo .jsonl com id, titulo, subtitulo, instituto, conteudo e imagens")
+    parser.add_argument("--saida", default="saida", help="Pasta onde os HTMLs são gravados (padrão: saida)")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: nº de núcleos)")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.manifesto):
+        raise SystemExit(f"Manifesto não encontrado: {args.manifesto}")
+
+    started = time.perf_counter()
+    ok = erros = 0
+    # Uma linha JSON por deck, assim que ele termina (stdout pode ir direto para um .jsonl)
+    for result in batch_render.render_many(batch_render.read_manifest(args.manifesto), args.saida, args.workers):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+        if result.get("status") == "ok":
+            ok += 1
+        else:
+            erros += 1
+
+    elapsed = time.perf_counter() - started
+    print(f"{'✅' if not erros else '⚠️'} {ok} deck(s) gerado(s), {erros} com erro, em {elapsed:.1f} s", file=sys.stderr)
+    return 0 if not erros else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
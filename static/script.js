@@ -1,3 +1,16 @@
+async function aguardarJob(jobId) {
+    while (true) {
+        const response = await fetch(`/status/${jobId}?wait=20`);
+        const data = await response.json().catch(() => ({ erro: 'Erro no servidor' }));
+        if (!response.ok) {
+            throw { message: data.erro || 'Erro na requisição', detalhes: data.detalhes };
+        }
+        if (data.status === 'done' || data.status === 'error') {
+            return data;
+        }
+    }
+}
+
 document.getElementById('formApresentacao').addEventListener('submit', async function(e) {
     e.preventDefault();
     
@@ -19,11 +32,14 @@ document.getElementById('formApresentacao').addEventListener('submit', async fun
         });
         
         if (!response.ok) {
+            // 429: servidor ocupado; a mensagem já traz o tempo sugerido para tentar de novo
             const errorData = await response.json().catch(() => ({ erro: 'Erro no servidor' }));
             throw { message: errorData.erro || 'Erro na requisição', detalhes: errorData.detalhes };
         }
         
-        const data = await response.json();
+        // O servidor só enfileira a renderização; acompanhamos o job por long-poll
+        const job = await response.json();
+        const data = await aguardarJob(job.job);
         
         loading.style.display = 'none';
         resultado.style.display = 'block';
@@ -1,8 +1,5 @@
 import os
-import shutil
-import subprocess
 import sys
-import tempfile
 import time
 from datetime import datetime
 from hashlib import sha256
@@ -12,16 +9,40 @@ from pathlib import Path
 import streamlit as st
 import streamlit.components.v1 as components
 
+# O Streamlit reexecuta o script inteiro a cada interação: o que é fixo por processo fica em
+# st.cache_resource/st.cache_data, e cada rerun mede o próprio tempo contra este orçamento.
+_rerun_started = time.perf_counter()
+RERUN_BUDGET_MS = float(os.environ.get("GERADOR_RERUN_BUDGET_MS", "150"))
+RERUN_HISTORY = 20
+
+
+@st.cache_resource(show_spinner=False)
+def _boot() -> str:
+    """Preparação do processo (uma vez, não a cada rerun). Retorna o status da instalação do Quarto."""
+    from metrics import set_asset_resolver, set_readiness_check, start_metrics_server
+
+    # Tenta configurar o Quarto no ambiente Linux (Streamlit Cloud)
+    status = setup_quarto_linux()
+    # Aquecimento em segundo plano
+    get_render_engine().start_warmup()
+    # O Streamlit não tem rotas próprias: /metrics, /ready e /assets/ (cache imutável) saem por um
+    # servidor auxiliar (GERADOR_METRICS_PORT)
+    set_readiness_check(get_render_engine().readiness)
+    set_asset_resolver(get_render_engine().assets.path)
+    start_metrics_server()
+    return status
+
+
 # Importar utils
 quarto_status = "Não iniciado"
 try:
-    from utils_render import setup_quarto_linux, get_quarto_binary
-    # Tenta configurar o Quarto no ambiente Linux (Streamlit Cloud)
-    quarto_status = setup_quarto_linux()
+    from admission import admission_stats
+    from artifacts import get_artifact_store, get_preview_store
+    from preview_render import approx_size, get_session_budget, slim_debug
+    from quarto_runner import get_quarto_binary, quarto_daemon_stats, setup_quarto_linux
+    from utils_render import get_render_engine, render_cache_stats
 except ImportError:
-    quarto_status = "Erro de importação no utils_render"
-except Exception as e:
-    quarto_status = f"Erro geral: {e}"
+    quarto_status = "Erro de importação do motor de renderização"
 
 # Configuração da página (deve ser a primeira chamada Streamlit)
 st.set_page_config(
@@ -30,6 +51,15 @@ st.set_page_config(
     layout="wide"
 )
 
+if quarto_status == "Não iniciado":
+    try:
+        quarto_status = _boot()
+    except Exception as e:
+        quarto_status = f"Erro geral: {e}"
+    if any(marca in quarto_status for marca in ("Falha", "Erro", "Exceção", "corrompido")):
+        # Falha não fica em cache: o próximo rerun tenta instalar de novo
+        _boot.clear()
+
 # Barra Superior IFS
 st.markdown("""
 <div style="background-color:#32A041; padding:15px; border-bottom: 5px solid #C8102E; color:white; text-align:center; margin-bottom: 25px; border-radius: 0 0 10px 10px;">
@@ -42,25 +72,58 @@ st.markdown("""
 if "Falha" in str(quarto_status) or "Erro" in str(quarto_status):
     st.error(f"⚠️ Alerta de Configuração: {quarto_status}")
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def _fingerprint_digest(file_path: str, mtime_ns: int, size: int) -> str:
+    # mtime/tamanho entram na chave do cache: o arquivo só é relido quando muda
+    return sha256(Path(file_path).read_bytes()).hexdigest()[:12]
+
+
+def _file_fingerprint(file_path: str) -> dict[str, str]:
+    p = Path(file_path)
+    try:
+        stat = p.stat()
+        return {
+            "path": str(p),
+            "exists": "true",
+            "mtime": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            "sha256_12": _fingerprint_digest(str(p), stat.st_mtime_ns, stat.st_size),
+            "bytes": str(stat.st_size),
+        }
+    except Exception as exc:
+        return {
+            "path": str(p),
+            "exists": "false",
+            "error": repr(exc),
+        }
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _server_stats() -> dict[str, Any]:
+    # render_cache_stats percorre os diretórios dos caches: caro demais para cada tecla
+    return {
+        "admission": admission_stats(),
+        "caches": render_cache_stats(),
+        "daemons": quarto_daemon_stats(),
+        "sessions": get_session_budget().stats(),
+    }
+
+
 with st.sidebar.expander("🔧 Diagnóstico do Servidor", expanded=False):
-    def _file_fingerprint(file_path: str) -> dict[str, str]:
-        p = Path(file_path)
-        try:
-            data = p.read_bytes()
-            st_mtime = datetime.fromtimestamp(p.stat().st_mtime).isoformat(timespec="seconds")
-            return {
-                "path": str(p),
-                "exists": "true",
-                "mtime": st_mtime,
-                "sha256_12": sha256(data).hexdigest()[:12],
-                "bytes": str(len(data)),
-            }
-        except Exception as exc:
-            return {
-                "path": str(p),
-                "exists": "false",
-                "error": repr(exc),
-            }
+    rerun_ms: list[float] = st.session_state.get("rerun_ms", [])
+    st.write(f"**Tempo por rerun** (orçamento: {RERUN_BUDGET_MS:.0f} ms)")
+    if rerun_ms:
+        ordered = sorted(rerun_ms)
+        st.json({
+            "ultimo_ms": round(rerun_ms[-1], 1),
+            "p50_ms": round(ordered[len(ordered) // 2], 1),
+            "max_ms": round(ordered[-1], 1),
+            "acima_do_orcamento": sum(1 for ms in rerun_ms if ms > RERUN_BUDGET_MS),
+            "amostras": len(rerun_ms),
+        })
+        if rerun_ms[-1] > RERUN_BUDGET_MS:
+            st.warning(f"O último rerun levou {rerun_ms[-1]:.0f} ms (acima do orçamento).")
+    else:
+        st.caption("Sem medições ainda nesta sessão.")
 
     st.write("**Build (fingerprint)**")
     st.json(
@@ -79,101 +142,65 @@ with st.sidebar.expander("🔧 Diagnóstico do Servidor", expanded=False):
         st.write(f"PATH: {os.environ.get('PATH')}")
     except Exception as e:
         st.error(f"Erro leitura: {e}")
+    try:
+        server_stats = _server_stats()
+        st.caption("Atualizado a cada 10 s.")
+        st.write("**Fila de renderização**")
+        st.json(server_stats["admission"])
+        st.write("**Cache de renderização**")
+        st.json(server_stats["caches"])
+        st.write("**Daemons do Quarto**")
+        st.json(server_stats["daemons"])
+        st.write("**Memória das sessões** (teto global)")
+        st.json(server_stats["sessions"])
+    except Exception as e:
+        st.error(f"Erro ao ler cache: {e}")
 
-def _copy_template(src: str, dst: str) -> None:
-    ignore = shutil.ignore_patterns(
-        ".quarto",
-        "_site",
-        "*.html",
-        "*.pdf",
-        "*.log",
+def _render_quarto(
+    *,
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    uploaded_files: list[Any] | None,
+) -> tuple[bytes | None, str | None, dict[str, Any]]:
+    # Delegamos ao motor do utils_render (o mesmo do Flask/build): cache, fila e workspaces compartilhados.
+    # Cada sessão do navegador tem seu workspace persistente (reaproveita o estado do Quarto).
+    if "workspace_id" not in st.session_state:
+        st.session_state["workspace_id"] = get_render_engine().new_session()
+    return get_render_engine().render(
+        titulo=titulo,
+        subtitulo=subtitulo,
+        instituto=instituto,
+        conteudo=conteudo,
+        uploaded_files=uploaded_files,
+        session_id=st.session_state["workspace_id"],
     )
-    shutil.copytree(src, dst, dirs_exist_ok=True, ignore=ignore)
 
 
-def _safe_rmtree(path: str, attempts: int = 6, delay_s: float = 0.25) -> None:
-    if not os.path.exists(path):
-        return
-    last_exc: Exception | None = None
-    for _ in range(attempts):
-        try:
-            shutil.rmtree(path)
-            return
-        except Exception as exc:
-            last_exc = exc
-            time.sleep(delay_s)
-    try:
-        shutil.rmtree(path, ignore_errors=True)
-    except Exception:
-        if last_exc:
-            raise last_exc
-
-
-def _find_rendered_html(work_dir: str) -> str | None:
-    candidates = [
-        os.path.join(work_dir, "apresentacao.html"),
-        os.path.join(work_dir, "_site", "apresentacao.html"),
-        os.path.join(work_dir, "_site", "index.html"),
-    ]
-    for candidate in candidates:
-        if os.path.exists(candidate):
-            return candidate
-
-    found_html: list[str] = []
-    found_apresentacao: list[str] = []
-    for root, dirs, files in os.walk(work_dir):
-        dirs[:] = [d for d in dirs if d not in {".quarto", "node_modules"}]
-        for filename in files:
-            if filename.lower().endswith(".html"):
-                full_path = os.path.join(root, filename)
-                found_html.append(full_path)
-                if filename.lower() == "apresentacao.html":
-                    found_apresentacao.append(full_path)
-
-    if found_apresentacao:
-        found_apresentacao.sort(key=lambda p: p.count(os.sep))
-        return found_apresentacao[0]
-
-    if len(found_html) == 1:
-        return found_html[0]
-
-    for p in found_html:
-        if p.lower().endswith(os.sep + "_site" + os.sep + "index.html"):
-            return p
-
-    return None
-
-
-def _build_qmd_content(titulo: str, subtitulo: str, instituto: str, conteudo: str) -> str:
-    return f"""---
-title: "{titulo}"
-subtitle: "{subtitulo}"
-institute: "{instituto}"
-date: today
-date-format: "D [de] MMMM [de] YYYY"
-lang: pt-BR
-title-slide-attributes:
-  class: title-slide
-format:
-  revealjs:
-    theme: [simple, assets/ufs.scss]
-    css: assets/custom.css
-    logo: assets/logo_IFS.png
-    footer: "IFS | Apresentação do TCC"
-    slide-number: true
-    controls: true
-    width: 1280
-    height: 720
-    transition: slide
-    background-transition: fade
-    preview-links: auto
----
-
-{conteudo}
-"""
+def _render_preview(
+    *,
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    uploaded_files: list[Any] | None,
+) -> tuple[bytes | None, str | None, dict[str, Any]]:
+    # Preview incremental: só os slides editados passam pelo Quarto
+    if "workspace_id" not in st.session_state:
+        st.session_state["workspace_id"] = get_render_engine().new_session()
+    return get_render_engine().preview(
+        titulo=titulo,
+        subtitulo=subtitulo,
+        instituto=instituto,
+        conteudo=conteudo,
+        uploaded_files=uploaded_files,
+        session_id=st.session_state["workspace_id"],
+        embed=_preview_embed(),
+    )
 
 
-def _render_quarto(
+def _render_draft(
     *,
     titulo: str,
     subtitulo: str,
@@ -181,78 +208,50 @@ def _render_quarto(
     conteudo: str,
     uploaded_files: list[Any] | None,
 ) -> tuple[bytes | None, str | None, dict[str, Any]]:
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    template_path = os.path.join(base_path, "template")
+    # Rascunho em Python puro (sem Quarto): rápido o bastante para atualizar a cada edição
+    return get_render_engine().render(
+        titulo=titulo,
+        subtitulo=subtitulo,
+        instituto=instituto,
+        conteudo=conteudo,
+        uploaded_files=uploaded_files,
+        backend="draft",
+    )
 
-    if not os.path.isdir(template_path):
-        return None, "Pasta 'template' não encontrada dentro do projeto.", {}
 
-    tmpdirname = tempfile.mkdtemp(prefix="gerador_apresentacao_")
+@st.cache_resource(show_spinner=False)
+def _preview_route() -> str | None:
+    """Caminho (a partir da raiz do servidor) de onde o Streamlit serve os HTMLs de preview.
+
+    declare_component(path=...) faz o servidor do Streamlit publicar os arquivos de um diretório
+    em /component/<nome>/. Apontado para o diretório do preview (páginas + assets/, sem os
+    downloads), o iframe carrega o preview pela URL (nome = hash do conteúdo) e o rerun manda só
+    essa URL, não os megabytes do HTML.
+    Retorna None se não der para registrar; aí o preview vai embutido com components.html.
+    """
     try:
-        work_dir = os.path.join(tmpdirname, "projeto")
-        _copy_template(template_path, work_dir)
-
-        figuras_dir = os.path.join(work_dir, "Figuras")
-        os.makedirs(figuras_dir, exist_ok=True)
-
-        if uploaded_files:
-            for uploaded_file in uploaded_files:
-                out_path = os.path.join(figuras_dir, uploaded_file.name)
-                with open(out_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-
-        qmd_content = _build_qmd_content(titulo, subtitulo, instituto, conteudo)
-        qmd_path = os.path.join(work_dir, "apresentacao.qmd")
-        with open(qmd_path, "w", encoding="utf-8") as f:
-            f.write(qmd_content)
-
-        cmd = [
-            "quarto",
-            "render",
-            "apresentacao.qmd",
-            "--to",
-            "revealjs",
-            "--embed-resources",
-            "--output-dir",
-            ".",
-        ]
-
-        env = os.environ.copy()
-        env["QUARTO_PYTHON"] = sys.executable
-
-        try:
-            result = subprocess.run(
-                cmd,
-                cwd=work_dir,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                check=False,
-                env=env,
-            )
-        except FileNotFoundError:
-            return (
-                None,
-                "Comando 'quarto' não encontrado. Instale o Quarto CLI no servidor.",
-                {"stdout": "", "stderr": "", "exit_code": None},
-            )
+        component = components.declare_component("preview", path=get_preview_store().root_dir)
+    except Exception:
+        return None
+    base = (st.get_option("server.baseUrlPath") or "").strip("/")
+    return "/" + "/".join(part for part in (base, "component", component.name) if part)
 
-        output_file = _find_rendered_html(work_dir)
-        debug: dict[str, Any] = {
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "exit_code": result.returncode,
-        }
 
-        if not output_file:
-            return None, "Arquivo HTML não foi gerado.", debug
+def _preview_embed() -> bool | None:
+    # Ativos linkados só funcionam com o preview servido por URL (o HTML aponta para assets/ ao lado
+    # dele); embutido via components.html, precisa de tudo dentro do próprio HTML
+    return None if _preview_route() else True
 
-        with open(output_file, "rb") as f:
-            html_bytes = f.read()
 
-        return html_bytes, None, debug
-    finally:
-        _safe_rmtree(tmpdirname)
+def _background_renderer() -> Any:
+    # Um BackgroundRenderer por sessão, no mesmo workspace do preview incremental
+    if "background_preview" not in st.session_state:
+        if "workspace_id" not in st.session_state:
+            st.session_state["workspace_id"] = get_render_engine().new_session()
+        st.session_state["background_preview"] = get_render_engine().background(
+            st.session_state["workspace_id"], embed=_preview_embed()
+        )
+    return st.session_state["background_preview"]
 
 
 def _inject_file_uploader_pt_br_styles() -> None:
@@ -562,7 +561,8 @@ st.caption("Veja como está ficando sua apresentação antes de baixar.")
 auto = st.checkbox(
     "Atualizar automaticamente ao digitar",
     value=False,
-    help="Atualiza o preview sempre que o conteúdo mudar (pode ser lento).",
+    help="Mostra um rascunho rápido (sem Quarto) sempre que o conteúdo mudar e, quando você "
+    "para de digitar, gera a versão fiel ao HTML final em segundo plano.",
 )
 
 chave = sha256(
@@ -570,7 +570,7 @@ chave = sha256(
 ).hexdigest()
 
 if "preview_quarto" not in st.session_state:
-    st.session_state["preview_quarto"] = {"hash": "", "html": "", "error": "", "debug": {}}
+    st.session_state["preview_quarto"] = {"hash": "", "artifact": "", "error": "", "debug": {}}
 
 preview_state: dict[str, Any] = st.session_state["preview_quarto"]
 
@@ -583,8 +583,10 @@ with col_btn_preview:
 should_render = clicked_preview or (auto and preview_state.get("hash") != chave)
 
 if should_render:
+    # Botão: preview fiel (Quarto, incremental). Modo automático: rascunho instantâneo.
+    render_fn = _render_preview if clicked_preview else _render_draft
     with st.spinner("Gerando preview..."):
-        html_bytes, err, preview_debug = _render_quarto(
+        html_bytes, err, preview_debug = render_fn(
             titulo=titulo,
             subtitulo=subtitulo,
             instituto=instituto,
@@ -593,11 +595,30 @@ if should_render:
         )
 
     preview_state["hash"] = chave
-    preview_state["debug"] = preview_debug
+    # Debug com stdout/stderr cortados: a sessão não guarda o log inteiro do Quarto
+    preview_state["debug"] = slim_debug(preview_debug)
     preview_state["error"] = err or ""
-    preview_state["html"] = html_bytes.decode("utf-8", errors="replace") if html_bytes else ""
+    # Só o id vai para a sessão; o HTML fica em disco e o navegador o busca pela URL
+    preview_state["artifact"] = get_preview_store().put(html_bytes, compress=False) if html_bytes else ""
+
+if auto:
+    # Versão fiel em segundo plano: começa quando a digitação para (debounce) e é cancelada
+    # (o Quarto é derrubado) se o conteúdo mudar de novo antes de terminar.
+    background = _background_renderer()
+    background.request(
+        chave,
+        titulo=titulo,
+        subtitulo=subtitulo,
+        instituto=instituto,
+        conteudo=conteudo,
+        # Bytes já lidos: o UploadedFile não deve ser usado fora do rerun que o criou
+        uploaded_files=[(f.name, f.getvalue()) for f in uploaded_files or []],
+    )
 
-if preview_state.get("error"):
+if preview_state.get("error") and (preview_state.get("debug") or {}).get("busy"):
+    # Fila cheia: não é erro da apresentação, só pedir para tentar de novo
+    st.warning(preview_state.get("error", ""))
+elif preview_state.get("error"):
     st.error(preview_state.get("error", ""))
     with st.expander("Ver detalhes técnicos"):
         debug: dict[str, Any] = preview_state.get("debug") or {}
@@ -605,13 +626,53 @@ if preview_state.get("error"):
             f"STDOUT:\n{debug.get('stdout','')}\n\nSTDERR:\n{debug.get('stderr','')}\n\nExitCode: {debug.get('exit_code')}"
         )
 
-# Mostra o preview se existir HTML
-if preview_state.get("html"):
+preview_path = get_preview_store().path(preview_state["artifact"]) if preview_state.get("artifact") else None
+if preview_state.get("artifact") and not preview_path:
+    # Expirou (GERADOR_ARTIFACT_TTL_MIN): o modo automático gera de novo
+    preview_state["hash"] = ""
+
+
+def _show_preview() -> None:
+    # No modo automático, a versão fiel do conteúdo atual (se já pronta) substitui o rascunho
+    artifact = preview_state.get("artifact") if preview_path else ""
+    is_draft = (preview_state.get("debug") or {}).get("backend") == "draft"
+    if auto:
+        status = _background_renderer().status()
+        if not status["busy"] and st.session_state.get("background_polling"):
+            # Terminou: um rerun completo desliga a atualização periódica do fragmento
+            st.session_state["background_polling"] = False
+            st.rerun()
+        if status["key"] == chave and get_preview_store().path(status["artifact"]):
+            artifact, is_draft = status["artifact"], False
+        elif status["error_key"] == chave and not (status["error_debug"] or {}).get("busy"):
+            st.warning(f"A versão fiel falhou; mostrando o rascunho. {status['error']}")
+        elif status["busy"]:
+            st.caption("⏳ Gerando a versão fiel em segundo plano...")
+
+    if not artifact:
+        st.info("Clique em 'Atualizar Preview' para ver os slides.")
+        return
     st.markdown("---")
-    components.html(str(preview_state.get("html", "")), height=720, scrolling=False)
+    preview_route = _preview_route()
+    if preview_route:
+        components.iframe(f"{preview_route}/{artifact}.html", height=720, scrolling=False)
+    else:
+        html_path = get_preview_store().path(artifact)
+        components.html(Path(html_path).read_text(encoding="utf-8", errors="replace"), height=720, scrolling=False)
+    if is_draft:
+        st.caption("Rascunho rápido (sem Quarto): o HTML final pode ter pequenas diferenças de layout.")
     st.caption("Dica: Clique no slide e use as setas ← → ou Espaço para navegar.")
+
+
+# Enquanto há renderização em segundo plano, só o fragmento do preview reexecuta (a cada 1 s)
+# para buscar o resultado; o resto da página não roda de novo.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+polling = auto and _fragment is not None and _background_renderer().status()["busy"]
+st.session_state["background_polling"] = polling
+if polling:
+    _fragment(run_every=1.0)(_show_preview)()
 else:
-    st.info("Clique em 'Atualizar Preview' para ver os slides.")
+    _show_preview()
 
 
 st.divider()
@@ -629,7 +690,9 @@ if st.button("💾 Gerar HTML Final para Download", type="primary"):
             uploaded_files=uploaded_files,
         )
 
-    if err:
+    if err and render_debug.get("busy"):
+        st.warning(err)
+    elif err:
         st.error(err)
         with st.expander("Ver detalhes técnicos"):
             st.code(
@@ -637,11 +700,48 @@ if st.button("💾 Gerar HTML Final para Download", type="primary"):
             )
     else:
         assert html_bytes is not None
-        nome = f"apresentacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        # Só o id vai para a sessão; o HTML fica no ArtifactStore até o download
+        st.session_state["download"] = {
+            "hash": chave,
+            "artifact": get_artifact_store().put(html_bytes),
+            "nome": f"apresentacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+        }
+        del html_bytes
         st.success("Apresentação gerada com sucesso!")
-        st.download_button(
-            "⬇️ Baixar HTML",
-            data=html_bytes,
-            file_name=nome,
-            mime="text/html",
-        )
+
+# st.download_button aceita uma função (chamada só no clique) a partir do Streamlit 1.52
+_DEFERRED_DOWNLOADS = tuple(int(part) for part in st.__version__.split(".")[:2] if part.isdigit()) >= (1, 52)
+
+download_state: dict[str, Any] | None = st.session_state.get("download")
+download_path = get_artifact_store().path(download_state["artifact"]) if download_state else None
+if download_state and download_state["hash"] == chave and download_path:
+    # O download não sai pela rota do preview (ela publica só PREVIEW_DIR). Com dados adiados,
+    # o arquivo só é lido do disco no clique, não a cada rerun.
+    st.download_button(
+        "⬇️ Baixar HTML",
+        data=Path(download_path).read_bytes if _DEFERRED_DOWNLOADS else Path(download_path).read_bytes(),
+        file_name=download_state["nome"],
+        mime="text/html",
+    )
+
+# Teto global de memória: a sessão informa quanto retém; acima do teto, as menos recentes liberam
+# o debug e o pedido pendente do preview em segundo plano (os HTMLs já estão em disco)
+_background = st.session_state.get("background_preview")
+
+
+def _spill_session(preview_state: dict[str, Any] = preview_state, background: Any = _background) -> None:
+    preview_state["debug"] = {}
+    if background is not None:
+        background.spill()
+
+
+get_session_budget().track(
+    st.session_state.setdefault("session_key", os.urandom(8).hex()),
+    approx_size(preview_state) + (_background.retained_bytes() if _background is not None else 0),
+    _spill_session,
+)
+
+# Fim do rerun: guarda a duração para o painel de diagnóstico (mostrada no próximo rerun)
+rerun_history: list[float] = st.session_state.setdefault("rerun_ms", [])
+rerun_history.append((time.perf_counter() - _rerun_started) * 1000)
+del rerun_history[:-RERUN_HISTORY]
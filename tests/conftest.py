@@ -0,0 +1,82 @@
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+
+import pytest
+
+# Diretórios de trabalho isolados antes de importar o motor (os módulos leem o ambiente na importação)
+_TMP = tempfile.mkdtemp(prefix="gerador_testes_")
+for _var, _name in (
+    ("GERADOR_CACHE_DIR", "cache"),
+    ("GERADOR_BLOBS_DIR", "blobs"),
+    ("GERADOR_WORKSPACES_DIR", "workspaces"),
+    ("GERADOR_SLOTS_DIR", "slots"),
+    ("GERADOR_ARTIFACTS_DIR", "artifacts"),
+    ("GERADOR_THEME_DIR", "theme"),
+    ("GERADOR_PROFILE_DIR", "profiles"),
+):
+    os.environ.setdefault(_var, os.path.join(_TMP, _name))
+os.environ.setdefault("GERADOR_WARMUP", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Quarto falso: grava apresentacao.html com o QMD dentro, como um `quarto render` bem-sucedido.
+# Com STUB_QUARTO_FAIL no ambiente, falha como o Quarto faria (saída != 0 e mensagem no stderr).
+# Sem --embed-resources (ou com STUB_QUARTO_LINKED) linka um reveal.js em apresentacao_files/.
+# `quarto preview` re-renderiza a cada gravação do QMD.
+_STUB_QUARTO = textwrap.dedent(
+    """\
+    import html, os, sys, time
+    if sys.argv[1:2] == ["--version"]:
+        print("1.8.27-stub")
+        sys.exit(0)
+    if os.environ.get("STUB_QUARTO_FAIL"):
+        sys.stderr.write("ERROR: falha simulada\\n")
+        sys.exit(1)
+
+    def render():
+        with open("apresentacao.qmd", encoding="utf-8") as f:
+            qmd = f.read()
+        libs = ""
+        if os.environ.get("STUB_QUARTO_LINKED") or "--embed-resources" not in sys.argv:
+            os.makedirs("apresentacao_files/libs", exist_ok=True)
+            with open("apresentacao_files/libs/reveal.js", "w", encoding="utf-8") as f:
+                f.write("Reveal.initialize();")
+            libs = '<script src="apresentacao_files/libs/reveal.js"></script>'
+        with open("apresentacao.html", "w", encoding="utf-8") as f:
+            f.write("<html><body>" + libs + "<pre>" + html.escape(qmd) + "</pre></body></html>")
+        print("Output created: apresentacao.html", flush=True)
+
+    if sys.argv[1:2] != ["preview"]:
+        render()
+        sys.exit(0)
+    last = None
+    while True:
+        st = os.stat("apresentacao.qmd")
+        if (st.st_ino, st.st_mtime_ns, st.st_size) != last:
+            last = (st.st_ino, st.st_mtime_ns, st.st_size)
+            render()
+        time.sleep(0.02)
+    """
+)
+
+
+@pytest.fixture
+def stub_quarto(tmp_path, monkeypatch):
+    """Põe um `quarto` falso no PATH; retorna o diretório dele."""
+    import quarto_runner
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "quarto_stub.py"
+    script.write_text(_STUB_QUARTO, encoding="utf-8")
+    launcher = bin_dir / "quarto"
+    launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n', encoding="utf-8")
+    launcher.chmod(launcher.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    quarto_runner._quarto_version_for.cache_clear()
+    yield bin_dir
+    quarto_runner._quarto_version_for.cache_clear()
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+import admission
+
+
+def test_slot_counts_admitted_and_frees_on_exit(tmp_path):
+    gate = admission.RenderAdmission(str(tmp_path), max_concurrency=2, max_queue=1, timeout_s=1)
+
+    with gate.slot() as waited:
+        assert waited < 1
+        stats = gate.stats()
+        assert (stats["in_flight"], stats["global_in_flight"], stats["free_slots"]) == (1, 1, 1)
+
+    stats = gate.stats()
+    assert (stats["admitted"], stats["in_flight"], stats["global_in_flight"]) == (1, 0, 0)
+
+
+def test_full_queue_is_rejected_with_retry_after(tmp_path):
+    gate = admission.RenderAdmission(str(tmp_path), max_concurrency=1, max_queue=0, timeout_s=1)
+
+    with gate.slot():
+        assert gate.is_saturated()
+        with pytest.raises(admission.RenderBusyError) as busy:
+            with gate.slot():
+                pass
+
+    assert busy.value.retry_after_s >= 1
+    assert gate.stats()["rejected"] == 1
+    assert not gate.is_saturated()
+
+
+def test_queued_render_waits_for_the_slot(tmp_path):
+    gate = admission.RenderAdmission(str(tmp_path), max_concurrency=1, max_queue=1, timeout_s=5)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold() -> None:
+        with gate.slot():
+            holding.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait(5)
+    threading.Timer(0.2, release.set).start()
+
+    with gate.slot() as waited:
+        assert waited >= 0.1
+    holder.join(5)
+
+    assert gate.stats()["admitted"] == 2
+
+
+def test_queue_wait_times_out(tmp_path):
+    gate = admission.RenderAdmission(str(tmp_path), max_concurrency=1, max_queue=1, timeout_s=0.2)
+
+    with gate.slot():
+        with pytest.raises(admission.RenderBusyError):
+            with gate.slot():
+                pass
+
+    assert gate.stats()["timeouts"] == 1
+
+
+def test_stats_do_not_take_slots(tmp_path):
+    # Contar a ocupação só lê as marcas: não pode fazer uma renderização concorrente ser recusada
+    gate = admission.RenderAdmission(str(tmp_path), max_concurrency=1, max_queue=0, timeout_s=1)
+    stop = threading.Event()
+
+    def poll() -> None:
+        while not stop.is_set():
+            gate.stats()
+            gate.is_saturated()
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    try:
+        for _ in range(50):
+            with gate.slot():
+                pass
+    finally:
+        stop.set()
+        poller.join(5)
+
+    assert gate.stats()["rejected"] == 0
@@ -0,0 +1,132 @@
+import gzip
+
+import pytest
+
+pytest.importorskip("flask")
+
+import app as flask_app  # noqa: E402
+
+
+@pytest.fixture
+def client(stub_quarto):
+    flask_app.app.config["TESTING"] = True
+    with flask_app.app.test_client() as client:
+        yield client
+
+
+def _gerar(client, conteudo: str) -> dict:
+    response = client.post("/gerar", data={"titulo": "Meu TCC", "subtitulo": "Autora", "conteudo": conteudo})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["status"] == "queued"
+    assert body["status_url"] == f"/status/{body['job']}"
+    return body
+
+
+def _aguardar(client, job: dict) -> dict:
+    response = client.get(job["status_url"] + "?wait=20")
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status["job"] == job["job"]
+    assert status["status"] == "done"
+    return status
+
+
+def test_gerar_status_download(client):
+    job = _aguardar(client, _gerar(client, "## Introdução\n\nTexto do fluxo completo"))
+
+    assert job["sucesso"] is True
+    download = client.get(f"/download/{job['arquivo']}")
+    assert download.status_code == 200
+    assert download.mimetype == "text/html"
+    assert "attachment" in download.headers["Content-Disposition"]
+    html = download.get_data(as_text=True)
+    assert "Texto do fluxo completo" in html
+    assert "Meu TCC" in html
+
+
+def test_resultado_serves_the_finished_deck(client):
+    job = _aguardar(client, _gerar(client, "## Resultado\n\nPela rota /resultado"))
+
+    response = client.get(f"/resultado/{job['job']}")
+
+    assert response.status_code == 200
+    assert "Pela rota /resultado" in response.get_data(as_text=True)
+
+
+def test_quarto_failure_is_reported_in_the_job(client, monkeypatch):
+    monkeypatch.setenv("STUB_QUARTO_FAIL", "1")
+
+    job = _aguardar(client, _gerar(client, "## Falha\n\nO Quarto vai falhar"))
+
+    assert "sucesso" not in job
+    assert "falha simulada" in job["detalhes"]
+    assert client.get(f"/resultado/{job['job']}").status_code == 500
+
+
+def test_unknown_job_and_file(client):
+    assert client.get("/status/nao-existe").status_code == 404
+    assert client.get("/resultado/nao-existe").status_code == 404
+    assert client.get("/download/nao-existe.html").status_code == 404
+
+
+def test_download_serves_the_precompressed_variant(client):
+    html = b"<html>" + b"slide " * 2000 + b"</html>"
+    artifact_id = flask_app.engine.artifacts.put(html)
+
+    comprimido = client.get(f"/download/{artifact_id}.html", headers={"Accept-Encoding": "gzip"})
+    identidade = client.get(f"/download/{artifact_id}.html", headers={"Accept-Encoding": "identity"})
+
+    assert comprimido.headers["Content-Encoding"] == "gzip"
+    assert comprimido.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(comprimido.get_data()) == html
+    assert "Content-Encoding" not in identidade.headers
+    assert identidade.get_data() == html
+
+
+def test_download_honours_etag_and_range(client):
+    html = b"<html>deck para retomar</html>"
+    artifact_id = flask_app.engine.artifacts.put(html)
+    url = f"/download/{artifact_id}.html"
+
+    etag = client.get(url).headers["ETag"]
+    revalidado = client.get(url, headers={"If-None-Match": etag})
+    parcial = client.get(url, headers={"Range": "bytes=6-9"})
+
+    assert revalidado.status_code == 304
+    assert parcial.status_code == 206
+    assert parcial.get_data() == html[6:10]
+
+
+
+def test_assets_are_served_immutable_by_content_name(client):
+    name = flask_app.engine.assets.put(b"Reveal.initialize();", "reveal.js")
+
+    response = client.get(f"/assets/{name}")
+
+    assert response.status_code == 200
+    assert response.get_data() == b"Reveal.initialize();"
+    assert response.headers["Cache-Control"].endswith("immutable")
+    assert client.get("/assets/reveal.js").status_code == 404
+
+def test_metrics_endpoint_exposes_the_pipeline(client):
+    _aguardar(client, _gerar(client, "## Métricas\n\nUma renderização para contar"))
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == flask_app.metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'gerador_renders_total{backend="quarto",result="ok"}' in text
+    assert "# TYPE gerador_jobs gauge" in text
+
+
+def test_ready_is_503_until_the_warmup_finishes(client, monkeypatch):
+    monkeypatch.setattr(flask_app.engine, "_warmup", {"state": "running"})
+    pendente = client.get("/ready")
+    monkeypatch.setattr(flask_app.engine, "_warmup", {"state": "ready"})
+    pronto = client.get("/ready")
+
+    assert pendente.status_code == 503 and pendente.get_json()["ready"] is False
+    assert pronto.status_code == 200 and pronto.get_json()["ready"] is True
+    assert pronto.headers["Cache-Control"] == "no-store"
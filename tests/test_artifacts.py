@@ -0,0 +1,151 @@
+import gzip
+import os
+import re
+import time
+
+import pytest
+
+import artifacts
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Sem a espera da thread de limpeza: os testes chamam sweep() direto
+    store = artifacts.ArtifactStore(str(tmp_path / "artefatos"), ttl_s=60, sweep_interval_s=3600)
+    yield store
+    store.close()
+
+
+def _age(store: artifacts.ArtifactStore, artifact_id: str, seconds: float) -> None:
+    # Último acesso há `seconds`, sem mexer na validade (mtime)
+    path = store.path(artifact_id)
+    os.utime(path, (time.time() - seconds, os.stat(path).st_mtime))
+
+
+def test_put_is_content_addressed_with_a_gzip_variant(store):
+    html = b"<html>" + b"slide " * 200 + b"</html>"
+
+    artifact_id = store.put(html)
+
+    assert re.fullmatch(r"[0-9a-f]{32}", artifact_id)
+    assert store.put(html) == artifact_id
+    with open(store.path(artifact_id, "gzip"), "rb") as f:
+        assert gzip.decompress(f.read()) == html
+    assert store.path(store.put(b"<html>preview</html>", compress=False), "gzip") is None
+    assert store.path("../" + artifact_id) is None
+
+
+def test_rewriting_the_same_content_only_extends_its_ttl(store):
+    artifact_id = store.put(b"<html>longo</html>", ttl_s=3600)
+    expires_at = os.stat(store.path(artifact_id)).st_mtime
+
+    store.put(b"<html>longo</html>", ttl_s=10)
+
+    assert os.stat(store.path(artifact_id)).st_mtime == expires_at
+
+
+def test_sweep_removes_expired_artifacts_and_stale_temp_files(store):
+    kept = store.put(b"<html>vale</html>")
+    expired = store.put(b"<html>venceu</html>", ttl_s=-1)
+    tmp = os.path.join(store.root_dir, "abandonado.html.tmp")
+    with open(tmp, "wb") as f:
+        f.write(b"meio arquivo")
+    os.utime(tmp, (time.time() - 7200, time.time() - 7200))
+
+    store.sweep()
+
+    assert store.path(kept) and store.path(expired, "gzip") is None
+    assert store.path(expired) is None and not os.path.exists(tmp)
+    assert store.stats()["entries"] == 1
+
+
+def test_sweep_evicts_the_least_recently_accessed_over_budget(store):
+    ids = [store.put(bytes([n]) * 1000, compress=False) for n in range(3)]
+    for artifact_id, seconds in zip(ids, (300, 200, 100)):
+        _age(store, artifact_id, seconds)
+    store.touch(ids[0])
+    store.max_bytes = 2500
+
+    store.sweep()
+
+    assert [store.path(artifact_id) is not None for artifact_id in ids] == [True, False, True]
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"]) == (2, 2000)
+    assert stats["evictions"] >= 1
+
+
+def _project(tmp_path) -> str:
+    # Saída de um `quarto render` sem --embed-resources
+    root = tmp_path / "projeto"
+    libs = root / "apresentacao_files" / "libs"
+    libs.mkdir(parents=True)
+    (libs / "reveal.js").write_text("Reveal.initialize();", encoding="utf-8")
+    (libs / "fonte.woff2").write_bytes(b"woff2")
+    (libs / "tema.css").write_text("@font-face { src: url('fonte.woff2'); }", encoding="utf-8")
+    (root / "foto.png").write_bytes(b"png")
+    return str(root)
+
+
+def test_link_assets_rewrites_local_refs_to_hashed_names(tmp_path):
+    store = artifacts.AssetStore(str(tmp_path / "ativos"), ttl_s=60)
+    html = (
+        '<script src="apresentacao_files/libs/reveal.js"></script>'
+        '<link href="apresentacao_files/libs/tema.css" rel="stylesheet">'
+        '<img src="foto.png?v=1"><img src="https://exemplo.org/x.png"><a href="#/slide-2">'
+        "<style>.capa { background: url(foto.png); }</style>"
+    )
+
+    linked, info = artifacts.link_assets(html.encode("utf-8"), _project(tmp_path), "/assets/", store)
+    linked = linked.decode("utf-8")
+
+    assert re.search(r'src="/assets/reveal\.[0-9a-f]{16}\.js"', linked)
+    assert re.search(r'src="/assets/foto\.[0-9a-f]{16}\.png\?v=1"', linked)
+    assert re.search(r"url\(/assets/foto\.[0-9a-f]{16}\.png\)", linked)
+    assert 'src="https://exemplo.org/x.png"' in linked and 'href="#/slide-2"' in linked
+    assert info == {"linked": 3, "url": "/assets/"}  # a foto aparece duas vezes, com um nome só
+
+    css_name = re.search(r"/assets/(tema\.[0-9a-f]{16}\.css)", linked).group(1)
+    with open(store.path(css_name), encoding="utf-8") as f:
+        assert re.fullmatch(r"@font-face \{ src: url\('fonte\.[0-9a-f]{16}\.woff2'\); \}", f.read())
+
+
+def test_link_assets_leaves_files_outside_the_project_alone(tmp_path):
+    store = artifacts.AssetStore(str(tmp_path / "ativos"), ttl_s=60)
+    (tmp_path / "segredo.txt").write_text("fora", encoding="utf-8")
+    html = b'<img src="../segredo.txt"><img src="nao_existe.png">'
+
+    linked, info = artifacts.link_assets(html, _project(tmp_path), "/assets/", store)
+
+    assert linked == html
+    assert info["linked"] == 0
+
+
+def test_same_content_gets_the_same_name(tmp_path):
+    store = artifacts.AssetStore(str(tmp_path / "ativos"), ttl_s=60)
+
+    first = store.put(b"conteudo", "dir/arquivo com espaço.js")
+
+    assert first == store.put(b"conteudo", "outro/arquivo com espaço.js")
+    assert first != store.put(b"mudou", "dir/arquivo com espaço.js")
+    assert re.fullmatch(r"arquivo_com_espa_o\.[0-9a-f]{16}\.js", first)
+
+
+def test_linked_html_is_unavailable_once_an_asset_is_gone(tmp_path):
+    store = artifacts.AssetStore(str(tmp_path / "ativos"), ttl_s=60)
+    linked, _info = artifacts.link_assets(b'<img src="foto.png">', _project(tmp_path), "/assets/", store)
+    assert artifacts.linked_assets_available(linked, store, "/assets/")
+
+    name = re.search(rb"/assets/([^\"]+)", linked).group(1).decode("ascii")
+    os.remove(store.path(name))
+
+    assert not artifacts.linked_assets_available(linked, store, "/assets/")
+
+
+def test_asset_path_rejects_names_outside_the_store(tmp_path):
+    store = artifacts.AssetStore(str(tmp_path / "ativos"), ttl_s=60)
+    name = store.put(b"x", "a.js")
+
+    assert store.path(name)
+    assert store.path("../" + name) is None
+    assert store.path("a.js") is None
+    assert store.path("a.0123456789abcdef.js") is None
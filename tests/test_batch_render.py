@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+import batch_render
+
+
+def _manifest(tmp_path, lines: list[str]) -> str:
+    path = tmp_path / "decks.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_read_manifest_skips_comments_and_keeps_bad_lines_as_errors(tmp_path):
+    path = _manifest(tmp_path, [
+        "# um deck por linha",
+        "",
+        json.dumps({"id": "tcc-ana", "titulo": "Ana", "conteudo": "ana.md"}),
+        "{quebrado",
+        json.dumps(["nao", "objeto"]),
+        json.dumps({"titulo": "Sem id"}),
+    ])
+
+    specs = list(batch_render.read_manifest(path))
+
+    assert [spec["linha"] for spec in specs] == [3, 4, 5, 6]
+    assert specs[0]["id"] == "tcc-ana" and "erro" not in specs[0]
+    assert specs[1]["erro"].startswith("JSON inválido")
+    assert specs[2]["erro"] == "Cada linha do manifesto deve ser um objeto JSON."
+    assert specs[3]["id"] == "deck-0006"
+    assert all(spec["base_dir"] == str(tmp_path) for spec in specs)
+
+
+def test_load_deck_reads_content_and_images_relative_to_the_manifest(tmp_path):
+    (tmp_path / "ana.md").write_text("## Slide da Ana\n", encoding="utf-8")
+    (tmp_path / "figs").mkdir()
+    (tmp_path / "figs" / "b.png").write_bytes(b"png b")
+    (tmp_path / "figs" / "a.jpg").write_bytes(b"jpg a")
+    (tmp_path / "figs" / "notas.txt").write_text("ignorado", encoding="utf-8")
+
+    conteudo, uploads = batch_render.load_deck({"conteudo": "ana.md", "imagens": "figs", "base_dir": str(tmp_path)})
+
+    assert conteudo == "## Slide da Ana\n"
+    assert uploads == [("a.jpg", b"jpg a"), ("b.png", b"png b")]
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({"erro": "JSON inválido: x"}, "JSON inválido"),
+    ({"titulo": "Sem conteúdo"}, "conteudo"),
+])
+def test_load_deck_rejects_incomplete_specs(spec, message):
+    with pytest.raises(ValueError, match=message):
+        batch_render.load_deck(spec)
+
+
+def test_render_many_writes_one_file_per_deck_and_reports_failures(tmp_path, stub_quarto):
+    (tmp_path / "ana.md").write_text("## Deck da Ana\n", encoding="utf-8")
+    (tmp_path / "bruno.md").write_text("## Deck do Bruno\n", encoding="utf-8")
+    path = _manifest(tmp_path, [
+        json.dumps({"id": "ana", "titulo": "Ana", "conteudo": "ana.md"}),
+        json.dumps({"id": "bruno", "titulo": "Bruno", "conteudo": "bruno.md"}),
+        json.dumps({"id": "sem-arquivo", "titulo": "Falta", "conteudo": "nao_existe.md"}),
+    ])
+    out_dir = tmp_path / "saida"
+
+    results = {r["id"]: r for r in batch_render.render_many(batch_render.read_manifest(path), str(out_dir), workers=2)}
+
+    assert results["ana"]["status"] == "ok"
+    assert results["bruno"]["status"] == "ok"
+    assert "Deck do Bruno" in (out_dir / "bruno.html").read_text(encoding="utf-8")
+    assert results["sem-arquivo"]["status"] == "erro"
+    assert sorted(p.name for p in out_dir.iterdir()) == ["ana.html", "bruno.html"]
+
+
+def test_unique_deck_id_is_a_safe_and_unique_file_name():
+    used: set[str] = set()
+
+    ids = [batch_render.unique_deck_id(raw, used, n) for n, raw in enumerate(
+        ["tcc", "tcc", "../x", "/etc/passwd", "", None, "tcc"], start=1
+    )]
+
+    assert ids == ["tcc", "tcc-2", "x", "etc_passwd", "deck-0005", "deck-0006", "tcc-3"]
+    assert used == set(ids)
@@ -0,0 +1,54 @@
+import importlib.util
+import os
+import struct
+import zlib
+
+import pytest
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "benchmark_render.py")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("benchmark_render", _SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_synthetic_png_is_a_valid_png(bench):
+    data = bench.synthetic_png(40, 20, seed=1)
+
+    assert data.startswith(b"\x89PNG\r\n\x1a\n")
+    width, height = struct.unpack(">II", data[16:24])
+    assert (width, height) == (40, 20)
+    idat_len = struct.unpack(">I", data[33:37])[0]
+    raw = zlib.decompress(data[41:41 + idat_len])
+    assert len(raw) == 20 * (1 + 40 * 3)
+
+
+def test_synthetic_deck_follows_the_corpus_spec(bench):
+    conteudo, images = bench.synthetic_deck("medio", bench.CORPUS["medio"])
+
+    assert conteudo.count("## Slide ") == bench.CORPUS["medio"]["slides"]
+    assert len(images) == bench.CORPUS["medio"]["imagens"]
+    assert all(f"Figuras/{name}" in conteudo for name, _data in images)
+    assert conteudo.count("```{mermaid}") == bench.CORPUS["medio"]["mermaid"]
+
+
+def test_percentile_is_nearest_rank(bench):
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+
+    assert bench.percentile(values, 50) == 3.0
+    assert bench.percentile(values, 95) == 5.0
+    assert bench.percentile([7.0], 95) == 7.0
+
+
+def test_compare_flags_regressions_past_the_tolerance(bench):
+    baseline = {"decks": {"pequeno": {"bytes": 1000, "fases": {"total": {"p50": 1.0}}}}}
+    slower = {"decks": {"pequeno": {"bytes": 1000, "fases": {"total": {"p50": 1.5}}}}}
+    bigger = {"decks": {"pequeno": {"bytes": 1300, "fases": {"total": {"p50": 1.05}}}}}
+
+    assert bench.compare(slower, baseline, tolerance=0.2) == ["pequeno: tempo total +50%"]
+    assert bench.compare(bigger, baseline, tolerance=0.2) == ["pequeno: tamanho do HTML +30%"]
+    assert bench.compare(bigger, baseline, tolerance=0.5) == []
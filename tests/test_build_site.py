@@ -0,0 +1,49 @@
+import json
+import re
+import sys
+
+import build_site
+
+
+def _build(monkeypatch, *args: str) -> int:
+    monkeypatch.setattr(sys, "argv", ["build_site.py", *args])
+    return build_site.main()
+
+
+def _manifest(tmp_path, decks: list[dict]) -> str:
+    for deck in decks:
+        (tmp_path / f"{deck['id']}.md").write_text(f"## Deck {deck['id']}\n", encoding="utf-8")
+    path = tmp_path / "decks.jsonl"
+    path.write_text("".join(json.dumps({"conteudo": f"{d['id']}.md", **d}) + "\n" for d in decks), encoding="utf-8")
+    return str(path)
+
+
+def test_shared_assets_are_stored_once_for_every_deck(tmp_path, stub_quarto, monkeypatch):
+    manifest = _manifest(tmp_path, [{"id": "ana", "titulo": "Ana"}, {"id": "bruno", "titulo": "Bruno"}])
+    site = tmp_path / "site"
+
+    assert _build(monkeypatch, "--saida", str(site), "--manifesto", manifest, "--ativos-compartilhados") == 0
+
+    assets = [p.name for p in (site / "assets").iterdir()]
+    assert len(assets) == 1 and re.fullmatch(r"reveal\.[0-9a-f]{16}\.js", assets[0])
+    for deck in ("ana", "bruno"):
+        page = (site / deck / "index.html").read_text(encoding="utf-8")
+        assert f'src="../assets/{assets[0]}"' in page
+        assert not (site / deck / "apresentacao_files").exists()
+    index = (site / "index.html").read_text(encoding="utf-8")
+    assert 'href="ana/"' in index and 'href="bruno/"' in index
+    assert (site / ".nojekyll").exists()
+
+
+def test_unsafe_ids_stay_inside_the_site_and_errors_fail_the_build(tmp_path, stub_quarto, monkeypatch):
+    manifest = _manifest(tmp_path, [{"id": "ana", "titulo": "Ana"}])
+    with open(manifest, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "../fora", "titulo": "Fora", "conteudo": "ana.md"}) + "\n")
+        f.write(json.dumps({"id": "falta", "titulo": "Falta", "conteudo": "nao_existe.md"}) + "\n")
+    site = tmp_path / "site"
+
+    assert _build(monkeypatch, "--saida", str(site), "--manifesto", manifest) == 1
+
+    assert (site / "fora" / "index.html").exists()
+    assert not (tmp_path / "fora").exists()
+    assert sorted(p.name for p in site.iterdir()) == [".nojekyll", "ana", "fora", "index.html"]
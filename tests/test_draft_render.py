@@ -0,0 +1,93 @@
+import base64
+import re
+from collections import OrderedDict
+
+import draft_render
+
+
+def _render(conteudo: str, uploads: list | None = None) -> str:
+    html_bytes, erro, debug = draft_render.render_draft(
+        titulo="Meu TCC", subtitulo="Autora", instituto="IFS", conteudo=conteudo, uploaded_files=uploads
+    )
+    assert erro is None
+    assert debug["backend"] == "draft" and debug["exit_code"] == 0
+    return html_bytes.decode("utf-8")
+
+
+def _section_ids(page: str) -> list[str]:
+    return re.findall(r'<section id="([^"]+)"', page)
+
+
+def test_one_section_per_slide_after_the_title_slide():
+    page = _render("## Introdução\n\nTexto\n\n## Métodos\n\n- a\n- b\n\n---\n\nSem título")
+
+    assert _section_ids(page) == ["title-slide", "introdução", "métodos"]
+    assert page.count("<section") == 4
+    assert '<h1 class="title">Meu TCC</h1>' in page
+    assert "<li>a</li>" in page and "<li>b</li>" in page
+    assert draft_render.DECK_FOOTER in page
+
+
+def test_repeated_titles_get_distinct_ids():
+    ids = _section_ids(_render("## Resultados\n\nA\n\n## Resultados\n\nB"))
+
+    assert len(ids) == len(set(ids)) == 3
+
+
+def test_inline_markdown_and_escaping():
+    page = _render("## Texto\n\n**forte**, *ênfase*, `a < b` e 3 < 4 & 5")
+
+    assert "<strong>forte</strong>" in page
+    assert "<em>ênfase</em>" in page
+    assert "<code>a &lt; b</code>" in page
+    assert "3 &lt; 4 &amp; 5" in page
+
+
+def test_footnote_is_shown_on_the_slide_that_cites_it():
+    page = _render("## Um\n\nFrase[^nota].\n\n[^nota]: Fonte da frase.\n\n## Dois\n\nOutra")
+
+    um, dois = re.findall(r"<section id=\"(?:um|dois)\".*?</section>", page, re.DOTALL)
+    assert 'class="footnote-ref"' in um
+    assert "Fonte da frase." in um
+    assert "Fonte da frase." not in dois
+    assert "[^nota]:" not in page
+
+
+def test_math_and_callouts():
+    page = _render("## Fórmula\n\n$e^{i\\pi}$\n\n::: {.callout-note}\nCuidado com as unidades\n:::")
+
+    assert draft_render.MATHJAX_CDN in page
+    assert "Nota" in page and "Cuidado com as unidades" in page
+
+
+def test_uploaded_images_are_embedded():
+    png = b"\x89PNG\r\n\x1a\n imagem enviada"
+    page = _render("## Figura\n\n![Logo](Figuras/logo_enviado.png)", uploads=[("logo_enviado.png", png)])
+
+    assert f'src="data:image/png;base64,{base64.b64encode(png).decode("ascii")}"' in page
+
+
+def test_output_dir_gets_index_html(tmp_path):
+    html_bytes, erro, debug = draft_render.render_draft(
+        titulo="T", subtitulo="", instituto="", conteudo="## A", uploaded_files=None, output_dir=str(tmp_path)
+    )
+
+    assert (html_bytes, erro) == (None, None)
+    assert (tmp_path / "index.html").read_bytes().startswith(b"<!DOCTYPE html>")
+    assert debug["output_bytes"] == (tmp_path / "index.html").stat().st_size
+
+
+def test_image_uri_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(draft_render, "_blob_uris", OrderedDict())
+    monkeypatch.setattr(draft_render, "_blob_uris_bytes", 0)
+    monkeypatch.setattr(draft_render, "DRAFT_URI_CACHE_MAX_BYTES", 1000)
+    store = draft_render.get_blob_store()
+    digests = [store.put(bytes([n]) * 300) for n in range(3)]
+
+    uris = [draft_render._blob_data_uri("foto.png", digest) for digest in digests]
+    huge = draft_render._blob_data_uri("grande.png", store.put(b"x" * 2000))
+
+    assert base64.b64decode(uris[0].split(",", 1)[1]) == bytes([0]) * 300
+    assert huge.startswith("data:image/png;base64,")
+    assert [key[1] for key in draft_render._blob_uris] == digests[1:]
+    assert draft_render._blob_uris_bytes == sum(map(len, uris[1:]))
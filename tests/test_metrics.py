@@ -0,0 +1,88 @@
+import math
+
+import pytest
+
+import metrics
+
+
+def _value(metric: metrics._Metric, sample: str) -> float:
+    for line in metric.samples():
+        name, _, value = line.rpartition(" ")
+        if name == sample:
+            return float(value)
+    return 0.0
+
+
+def test_counter_and_gauge_text_format():
+    registry = metrics.Registry()
+    renders = registry.register(metrics.Counter("t_renders_total", "Renderizações", ("backend",)))
+    fila = registry.register(metrics.Gauge("t_fila", "Fila"))
+    renders.inc(backend="quarto")
+    renders.inc(2, backend='dra"ft')
+    fila.set(3)
+    fila.dec()
+
+    assert registry.render() == (
+        "# HELP t_renders_total Renderizações\n# TYPE t_renders_total counter\n"
+        't_renders_total{backend="dra\\"ft"} 2\nt_renders_total{backend="quarto"} 1\n'
+        "# HELP t_fila Fila\n# TYPE t_fila gauge\nt_fila 2\n"
+    )
+
+
+def test_register_is_idempotent_and_labels_are_checked():
+    registry = metrics.Registry()
+    first = registry.register(metrics.Counter("t_total", "x", ("result",)))
+
+    assert registry.register(metrics.Counter("t_total", "x", ("result",))) is first
+    with pytest.raises(ValueError):
+        first.inc(resultado="ok")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("t_seconds", "Duração", (0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        't_seconds_bucket{le="0.1"} 1',
+        't_seconds_bucket{le="1"} 3',
+        't_seconds_bucket{le="+Inf"} 4',
+        "t_seconds_sum 6.25",
+        "t_seconds_count 4",
+    ]
+    assert histogram.buckets[-1] == math.inf
+
+
+def test_gauge_function_is_read_at_collection_and_failures_are_dropped():
+    gauge = metrics.Gauge("t_slots", "Vagas", ("status",))
+    gauge.set_function(lambda: {("livre",): 2, ("ocupada",): 1})
+    assert gauge.samples() == ['t_slots{status="livre"} 2', 't_slots{status="ocupada"} 1']
+
+    gauge.set_function(lambda: 1 / 0)
+    assert gauge.samples() == []
+
+
+@pytest.mark.parametrize("error, debug, result", [
+    (None, {"cache": "miss", "exit_code": 0, "timings": {"quarto": 0.5, "total": 0.6}}, "ok"),
+    ("ocupado", {"busy": True}, "busy"),
+    ("prazo", {"limit": "timeout", "exit_code": None}, "limit_timeout"),
+    ("falhou", {"cache": "miss", "exit_code": 1}, "error"),
+])
+def test_observe_render_classifies_the_result(error, debug, result):
+    sample = f'gerador_renders_total{{backend="quarto",result="{result}"}}'
+    before = _value(metrics.RENDERS, sample)
+
+    metrics.observe_render("quarto", error, debug, 0.6)
+
+    assert _value(metrics.RENDERS, sample) == before + 1
+
+
+def test_observe_render_records_phases_but_not_the_total():
+    quarto = 'gerador_render_phase_seconds_count{phase="quarto"}'
+    total = 'gerador_render_phase_seconds_count{phase="total"}'
+    before = _value(metrics.PHASE_SECONDS, quarto)
+
+    metrics.observe_render("quarto", None, {"cache": "miss", "timings": {"quarto": 0.5, "total": 0.6}}, 0.6)
+
+    assert _value(metrics.PHASE_SECONDS, quarto) == before + 1
+    assert _value(metrics.PHASE_SECONDS, total) == 0
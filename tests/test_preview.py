@@ -0,0 +1,239 @@
+import re
+import threading
+import time
+
+import pytest
+
+import preview_render
+import quarto_runner
+import render_cache
+import utils_render
+
+
+def _slug(title: str) -> str:
+    # Mesmo algoritmo de identificadores do Pandoc (o suficiente para os títulos dos testes)
+    text = re.sub(r"[^\w\s.-]", "", title.lower()).strip()
+    text = re.sub(r"\s+", "-", text)
+    return re.sub(r"^[^a-z]+", "", text) or "section"
+
+
+def _fake_quarto_deck(conteudo: str) -> str:
+    """Deck como o Quarto gera: ids desambiguados e notas numeradas pela posição no deck inteiro."""
+    used = {"title-slide"}
+    notes: dict[str, int] = {}
+    sections = ['<section id="title-slide" class="quarto-title-block"><h1 class="title">Título</h1></section>']
+    for slide in preview_render.split_slides(conteudo):
+        lines = [line for line in slide.split("\n") if line.strip() != "---" and not line.startswith("[^")]
+        title = lines[0][3:] if lines and lines[0].startswith("## ") else ""
+        base = _slug(title) if title else "section"
+        slide_id, n = base, 0
+        while slide_id in used:
+            n += 1
+            slide_id = f"{base}-{n}"
+        used.add(slide_id)
+        body = " ".join(line for line in lines[1 if title else 0:] if line.strip())
+        body = re.sub(
+            r"\[\^([^\]]+)\]",
+            lambda m: f'<sup id="fnref{notes.setdefault(m.group(1), len(notes) + 1)}">{notes[m.group(1)]}</sup>',
+            body,
+        )
+        sections.append(f'<section id="{slide_id}" class="slide level2"><h2>{title}</h2><p>{body}</p></section>')
+    prefix = '<html><head></head><body><div class="reveal"><div class="slides">\n'
+    return prefix + "\n".join(sections) + "\n</div></div><script>Reveal.initialize()</script></body></html>"
+
+
+@pytest.fixture
+def fake_quarto(monkeypatch, tmp_path):
+    rendered: list[str] = []
+
+    def render_quarto(*, conteudo, **_kwargs):
+        rendered.append(conteudo)
+        html = _fake_quarto_deck(conteudo).encode("utf-8")
+        return html, None, {"stdout": "", "stderr": "", "exit_code": 0}
+
+    monkeypatch.setattr(utils_render, "render_quarto", render_quarto)
+    monkeypatch.setattr(preview_render, "ensure_theme_bundle", lambda _template_path: None)
+    monkeypatch.setattr(render_cache, "_slide_cache", render_cache.RenderCache(str(tmp_path / "slides"), 1 << 24, 3600))
+    return rendered
+
+
+def _preview(conteudo: str):
+    html, err, debug = preview_render.render_preview(
+        titulo="Título", subtitulo="", instituto="", conteudo=conteudo, uploaded_files=[]
+    )
+    assert err is None
+    return html.decode("utf-8"), debug
+
+
+def _section_ids(html: str) -> list[str]:
+    _prefix, sections, _suffix = preview_render.split_deck_html(html)
+    return [re.search(r'id="([^"]*)"', section).group(1) for section in sections]
+
+
+def test_split_slides_ignores_breaks_inside_code_and_divs():
+    conteudo = "## Um\n\n```\n## não\n---\n```\n\n::: {.notes}\n## também não\n:::\n\n---\n\n## Dois\n\n---\n\nsem título"
+    slides = preview_render.split_slides(conteudo)
+    assert [slide.split("\n")[0] for slide in slides] == ["## Um", "---", "---"]
+    assert slides[1].startswith("---\n\n## Dois")
+
+
+def test_stitch_only_rerenders_changed_slide(fake_quarto):
+    deck = "## Introdução\n\nA\n\n## Método\n\nB\n\n## Resultados\n\nC"
+    _preview(deck)
+    edited = deck.replace("B", "B revisado")
+    html, debug = _preview(edited)
+
+    assert debug["slides"] == {"total": 3, "rendered": 1, "mode": "partial"}
+    assert fake_quarto[-1] == "## Método\n\nB revisado"
+    assert html == _fake_quarto_deck(edited)
+
+
+@pytest.mark.parametrize(
+    "deck, edit",
+    [
+        ("## Intro\n\nA\n\n---\n\nsem título\n\n---\n\noutro sem título", ("outro", "mais um")),
+        ("## Intro\n\nA\n\n## Intro\n\nB\n\n## Intro\n\nC", ("C", "C revisado")),
+        ("## Um\n\nTexto[^a]\n\n## Dois\n\nMais[^b]\n\n[^a]: Nota A\n[^b]: Nota B", ("Mais", "Ainda mais")),
+    ],
+)
+def test_stitched_section_ids_are_unique(fake_quarto, deck, edit):
+    _preview(deck)
+    edited = deck.replace(*edit)
+    html, _debug = _preview(edited)
+
+    ids = _section_ids(html)
+    assert len(ids) == len(set(ids))
+    assert html == _fake_quarto_deck(edited)
+
+
+def test_fragments_of_unstitchable_decks_are_not_reused(fake_quarto):
+    # "intro-1" do deck com títulos repetidos não pode voltar quando o título deixa de repetir
+    _preview("## Intro\n\nA\n\n## Intro\n\nB")
+    html, _debug = _preview("## Outro\n\nA\n\n## Intro\n\nB")
+
+    assert _section_ids(html) == ["title-slide", "outro", "intro"]
+
+
+def _settle(background: preview_render.BackgroundRenderer, timeout_s: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout_s
+    while background.status()["busy"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return background.status()
+
+
+def test_background_debounce_renders_only_the_latest_content():
+    rendered: list[str] = []
+
+    def render(*, conteudo):
+        rendered.append(conteudo)
+        return f"<html>{conteudo}</html>".encode("utf-8"), None, {}
+
+    background = preview_render.BackgroundRenderer(render, debounce_s=0.1)
+    for key in ("a", "ab", "abc"):
+        background.request(key, conteudo=key)
+    status = _settle(background)
+
+    assert rendered == ["abc"]
+    assert status["key"] == "abc"
+    assert preview_render.get_preview_store().path(status["artifact"])
+
+    background.request("abc", conteudo="abc")
+    assert _settle(background)["key"] == "abc"
+    assert rendered == ["abc"]
+
+
+def test_background_new_content_cancels_the_running_render():
+    started = threading.Event()
+
+    def render(*, conteudo):
+        if conteudo == "lento":
+            started.set()
+            # Como o Quarto sob um CancelToken: termina assim que o token é acionado
+            while True:
+                try:
+                    quarto_runner.check_cancelled()
+                except quarto_runner.RenderCancelledError:
+                    return None, "cancelada", {"cancelled": True}
+                time.sleep(0.01)
+        return b"<html>rapido</html>", None, {}
+
+    background = preview_render.BackgroundRenderer(render, debounce_s=0.01)
+    background.request("lento", conteudo="lento")
+    assert started.wait(5)
+    background.request("rapido", conteudo="rapido")
+    status = _settle(background)
+
+    assert status["cancelled"] == 1
+    assert status["key"] == "rapido"
+
+
+def test_background_error_keeps_the_previous_preview():
+    def render(*, conteudo):
+        if conteudo == "quebrado":
+            return None, "Erro do Quarto", {"exit_code": 1}
+        return b"<html>bom</html>", None, {}
+
+    background = preview_render.BackgroundRenderer(render, debounce_s=0.01)
+    background.request("bom", conteudo="bom")
+    good = _settle(background)
+    background.request("quebrado", conteudo="quebrado")
+    status = _settle(background)
+
+    assert (status["key"], status["artifact"]) == ("bom", good["artifact"])
+    assert (status["error_key"], status["error"]) == ("quebrado", "Erro do Quarto")
+
+
+def _spill_log(spilled: list[str], key: str):
+    return lambda: spilled.append(key)
+
+
+def test_session_budget_spills_the_least_recent_sessions_over_the_cap():
+    budget = preview_render.SessionMemoryBudget(max_bytes=350, idle_s=3600)
+    spilled: list[str] = []
+
+    for key in ("a", "b", "c"):
+        budget.track(key, 100, _spill_log(spilled, key))
+    budget.track("a", 100, _spill_log(spilled, "a"))  # "a" volta a ser a mais recente
+    budget.track("d", 100, _spill_log(spilled, "d"))
+
+    assert spilled == ["b"]
+    assert budget.stats() == {"sessions": 3, "bytes": 300, "max_bytes": 350, "spills": 1}
+
+
+def test_session_budget_never_spills_the_session_being_tracked():
+    budget = preview_render.SessionMemoryBudget(max_bytes=50, idle_s=3600)
+    spilled: list[str] = []
+
+    budget.track("grande", 100, _spill_log(spilled, "grande"))
+
+    assert spilled == []
+    assert budget.stats()["bytes"] == 100
+
+
+def test_session_budget_spills_idle_sessions_and_survives_failing_spills():
+    budget = preview_render.SessionMemoryBudget(max_bytes=10_000, idle_s=0.05)
+    spilled: list[str] = []
+
+    def broken() -> None:
+        raise RuntimeError("sessão já fechada")
+
+    budget.track("fechada", 10, broken)
+    budget.track("parada", 10, _spill_log(spilled, "parada"))
+    time.sleep(0.1)
+    budget.track("ativa", 10, _spill_log(spilled, "ativa"))
+
+    assert spilled == ["parada"]
+    assert budget.stats()["sessions"] == 1
+
+
+def test_session_budget_forget_drops_a_session_without_spilling_it():
+    budget = preview_render.SessionMemoryBudget(max_bytes=150, idle_s=3600)
+    spilled: list[str] = []
+    budget.track("a", 100, _spill_log(spilled, "a"))
+
+    budget.forget("a")
+    budget.forget("nunca-vista")
+    budget.track("b", 100, _spill_log(spilled, "b"))
+
+    assert spilled == []
+    assert budget.stats()["sessions"] == 1
@@ -0,0 +1,79 @@
+import json
+import os
+
+import profiling
+import utils_render
+
+
+def _records(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_phase_accumulates_and_becomes_a_span_inside_a_profile(tmp_path):
+    timings: dict[str, float] = {}
+    with profiling.phase(timings, "fora"):
+        pass
+    assert "fora" in timings
+
+    with profiling.RenderProfile(str(tmp_path)) as profile:
+        assert profiling.current_profile() is profile
+        for _ in range(2):
+            with profiling.phase(timings, "quarto"):
+                pass
+    assert profiling.current_profile() is None
+
+    assert [span["name"] for span in profile.spans] == ["quarto", "quarto"]
+    assert timings["quarto"] >= 0
+
+
+def test_write_records_header_spans_and_quarto_log(tmp_path):
+    with profiling.RenderProfile(str(tmp_path)) as profile:
+        with profiling.phase({}, "uploads"):
+            pass
+        profile.log("stderr", "DEBUG: iniciando o Pandoc")
+
+    summary = profile.write("draft", None, {"exit_code": 0, "output_bytes": 42}, 0.5)
+
+    header, span = _records(summary["files"][0])
+    assert header["type"] == "render" and header["id"] == profile.id
+    assert (header["backend"], header["output_bytes"], header["total_s"]) == ("draft", 42, 0.5)
+    assert span["type"] == "span" and span["name"] == "uploads"
+    with open(summary["files"][1], encoding="utf-8") as f:
+        assert "stderr: DEBUG: iniciando o Pandoc" in f.read()
+
+
+def test_cprofile_is_skipped_while_another_render_holds_it(tmp_path):
+    with profiling.RenderProfile(str(tmp_path), cprofile=True) as first:
+        with profiling.RenderProfile(str(tmp_path), cprofile=True) as second:
+            pass
+
+    assert second.cprofile == "skipped"
+    assert first.cprofile == "on"
+    summary = first.write("draft", None, {}, 0.1)
+    assert any(path.endswith(".prof") and os.path.exists(path) for path in summary["files"])
+
+
+def test_should_profile_honours_the_request_and_the_sample_rate(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    assert profiling.should_profile(True) is True
+    assert profiling.should_profile(None) is False
+
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    assert profiling.should_profile(None) is True
+    assert profiling.should_profile(False) is False
+
+
+def test_profiled_render_skips_the_cache_and_traces_quarto(stub_quarto):
+    kwargs = {"titulo": "Perfil", "subtitulo": "", "instituto": "", "conteudo": "## Perfilado", "uploaded_files": None}
+    utils_render.render_quarto(**kwargs)
+
+    _html, erro, debug = utils_render.render_quarto(**kwargs, profile=True)
+
+    assert erro is None
+    assert debug["cache"] == "off"
+    jsonl, quarto_log = debug["profile"]["files"][:2]
+    names = {record["name"] for record in _records(jsonl) if record["type"] == "span"}
+    assert {"uploads", "workspace", "quarto"} <= names
+    with open(quarto_log, encoding="utf-8") as f:
+        assert "Output created" in f.read()
@@ -0,0 +1,52 @@
+import os
+
+import project_template
+
+
+def _template(tmp_path):
+    path = tmp_path / "template"
+    (path / "assets").mkdir(parents=True)
+    (path / ".quarto").mkdir()
+    (path / "_quarto.yml").write_text("format: revealjs\n", encoding="utf-8")
+    (path / "apresentacao.qmd").write_text("## Modelo\n", encoding="utf-8")
+    (path / "assets" / "custom.css").write_text(".a{}\n", encoding="utf-8")
+    (path / "apresentacao.html").write_text("render antigo", encoding="utf-8")
+    (path / ".quarto" / "cache").write_text("x", encoding="utf-8")
+    return path
+
+
+def test_link_mode_shares_read_only_files_and_copies_rewritten_ones(tmp_path):
+    src = _template(tmp_path)
+    dst = tmp_path / "projeto"
+
+    counts = project_template.copy_template(str(src), str(dst), mode="link")
+
+    assert counts["copy"] == 1
+    assert counts["hardlink"] + counts["reflink"] + counts["copy"] == 3
+    assert not os.path.samefile(src / "apresentacao.qmd", dst / "apresentacao.qmd")
+    if counts["hardlink"]:
+        assert os.path.samefile(src / "assets" / "custom.css", dst / "assets" / "custom.css")
+    # Artefatos de renderizações anteriores não vão para o workspace
+    assert not (dst / "apresentacao.html").exists()
+    assert not (dst / ".quarto").exists()
+
+
+def test_copy_mode_copies_everything(tmp_path):
+    src = _template(tmp_path)
+    dst = tmp_path / "projeto"
+
+    counts = project_template.copy_template(str(src), str(dst))
+
+    assert counts == {"hardlink": 0, "reflink": 0, "copy": 3}
+    assert not os.path.samefile(src / "assets" / "custom.css", dst / "assets" / "custom.css")
+
+
+def test_fingerprint_follows_content_and_ignores_render_output(tmp_path):
+    src = _template(tmp_path)
+    before = project_template.template_fingerprint(str(src))
+
+    (src / "apresentacao.html").write_text("outro render", encoding="utf-8")
+    assert project_template.template_fingerprint(str(src)) == before
+
+    (src / "assets" / "custom.css").write_text(".a{color:red}\n", encoding="utf-8")
+    assert project_template.template_fingerprint(str(src)) != before
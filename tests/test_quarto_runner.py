@@ -0,0 +1,139 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import quarto_runner
+from utils_fs import atomic_write
+
+
+@pytest.fixture
+def pool(stub_quarto):
+    pool = quarto_runner.QuartoDaemonPool(max_daemons=2, max_renders=10)
+    yield pool
+    pool.stop_all()
+
+
+def _workspace(tmp_path, name: str = "projeto") -> str:
+    work_dir = tmp_path / name
+    work_dir.mkdir()
+    (work_dir / "apresentacao.qmd").write_text("## inicial\n", encoding="utf-8")
+    return str(work_dir)
+
+
+def _qmd_writer(work_dir: str, conteudo: str):
+    def write_input() -> bool:
+        atomic_write(os.path.join(work_dir, "apresentacao.qmd"), conteudo.encode("utf-8"))
+        return True
+    return write_input
+
+
+def _html(work_dir: str) -> str:
+    with open(os.path.join(work_dir, "apresentacao.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_daemon_is_reused_across_renders(tmp_path, pool):
+    work_dir = _workspace(tmp_path)
+
+    first = pool.render(work_dir, dict(os.environ), _qmd_writer(work_dir, "## primeira\n"))
+    second = pool.render(work_dir, dict(os.environ), _qmd_writer(work_dir, "## segunda\n"))
+
+    assert first.returncode == 0 and second.returncode == 0
+    assert "## segunda" in _html(work_dir)
+    stats = pool.stats()
+    assert (stats["started"], stats["renders"], stats["alive"]) == (1, 2, 1)
+
+
+def test_daemon_is_recycled_after_max_renders(tmp_path, stub_quarto):
+    pool = quarto_runner.QuartoDaemonPool(max_daemons=2, max_renders=1)
+    work_dir = _workspace(tmp_path)
+    try:
+        pool.render(work_dir, dict(os.environ), _qmd_writer(work_dir, "## a\n"))
+        pool.render(work_dir, dict(os.environ), _qmd_writer(work_dir, "## b\n"))
+    finally:
+        pool.stop_all()
+
+    stats = pool.stats()
+    assert (stats["started"], stats["recycled"], stats["daemons"]) == (2, 2, 0)
+
+
+def test_least_recently_used_daemon_is_stopped_over_the_limit(tmp_path, stub_quarto):
+    pool = quarto_runner.QuartoDaemonPool(max_daemons=1, max_renders=10)
+    first_dir = _workspace(tmp_path, "a")
+    second_dir = _workspace(tmp_path, "b")
+    try:
+        pool.render(first_dir, dict(os.environ), _qmd_writer(first_dir, "## a\n"))
+        first_daemon = pool._daemons[first_dir]
+        pool.render(second_dir, dict(os.environ), _qmd_writer(second_dir, "## b\n"))
+
+        assert not first_daemon.alive()
+        assert list(pool._daemons) == [second_dir]
+    finally:
+        pool.stop_all()
+
+
+def test_daemon_that_does_not_embed_disables_the_pool(tmp_path, pool, monkeypatch):
+    monkeypatch.setenv("STUB_QUARTO_LINKED", "1")
+    work_dir = _workspace(tmp_path)
+
+    with pytest.raises(quarto_runner.QuartoDaemonError):
+        pool.render(work_dir, dict(os.environ), _qmd_writer(work_dir, "## a\n"))
+
+    assert pool.disabled_reason
+    with pytest.raises(quarto_runner.QuartoDaemonError):
+        pool.render(work_dir, dict(os.environ), _qmd_writer(work_dir, "## b\n"))
+
+
+def test_run_quarto_falls_back_to_the_cli_when_the_daemon_is_unavailable(tmp_path, pool, monkeypatch):
+    pool.disabled_reason = "desligado no teste"
+    monkeypatch.setattr(quarto_runner, "QUARTO_DAEMON_ENABLED", True)
+    monkeypatch.setattr(quarto_runner, "_quarto_daemon_pool", pool)
+    work_dir = _workspace(tmp_path)
+    cmd = ["quarto", "render", "apresentacao.qmd", "--to", "revealjs", "--embed-resources"]
+
+    result, via_daemon = quarto_runner.run_quarto(
+        cmd, work_dir, dict(os.environ), persistent=True, write_input=_qmd_writer(work_dir, "## avulso\n")
+    )
+
+    assert (result.returncode, via_daemon) == (0, False)
+    assert "## avulso" in _html(work_dir)
+
+
+def _python(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+def test_run_governed_reports_output_and_resources(tmp_path):
+    resources: dict = {}
+
+    result = quarto_runner.run_governed(
+        _python("print('Output created: apresentacao.html')"), str(tmp_path), dict(os.environ), resources
+    )
+
+    assert result.returncode == 0
+    assert "Output created" in result.stdout
+    assert resources["wall_s"] >= 0
+
+
+def test_run_governed_kills_the_tree_past_the_deadline(tmp_path, monkeypatch):
+    monkeypatch.setattr(quarto_runner, "RENDER_TIMEOUT_S", 0.3)
+    started = time.monotonic()
+
+    with pytest.raises(quarto_runner.RenderLimitError) as excinfo:
+        quarto_runner.run_governed(_python("import time; time.sleep(30)"), str(tmp_path), dict(os.environ))
+
+    assert excinfo.value.reason == "timeout"
+    assert time.monotonic() - started < 10
+
+
+def test_run_governed_stops_when_the_token_is_cancelled(tmp_path):
+    cancel = quarto_runner.CancelToken()
+    threading.Timer(0.2, cancel.cancel).start()
+
+    with pytest.raises(quarto_runner.RenderCancelledError):
+        quarto_runner.run_governed(
+            _python("import time; time.sleep(30)"), str(tmp_path), dict(os.environ), cancel=cancel
+        )
@@ -0,0 +1,84 @@
+import os
+import time
+
+import render_cache
+from uploads import Upload
+
+
+def _age(cache: render_cache.RenderCache, key: str, seconds: float) -> None:
+    # O mtime é o "último acesso" da entrada
+    path = cache._path(key)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_get_returns_what_put_stored(tmp_path):
+    cache = render_cache.RenderCache(str(tmp_path), max_bytes=1024, max_age_s=3600)
+
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, b"<html>deck</html>")
+
+    assert cache.get("ab" * 32) == b"<html>deck</html>"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert (stats["entries"], stats["bytes"]) == (1, len(b"<html>deck</html>"))
+
+
+def test_over_budget_evicts_least_recently_used(tmp_path):
+    cache = render_cache.RenderCache(str(tmp_path), max_bytes=250, max_age_s=3600)
+    for i, key in enumerate(("aa" * 32, "bb" * 32)):
+        cache.put(key, b"x" * 100)
+        _age(cache, key, 100 - i * 10)
+    # Acesso recente: "aa" passa a ser a mais nova e "bb" a menos usada
+    assert cache.get("aa" * 32) is not None
+
+    cache.put("cc" * 32, b"x" * 100)
+
+    assert cache.get("bb" * 32) is None
+    assert cache.get("aa" * 32) is not None
+    assert cache.get("cc" * 32) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss_and_removed(tmp_path):
+    cache = render_cache.RenderCache(str(tmp_path), max_bytes=1024, max_age_s=60)
+    cache.put("ab" * 32, b"velho")
+    _age(cache, "ab" * 32, 120)
+
+    assert cache.get("ab" * 32) is None
+    assert not os.path.exists(cache._path("ab" * 32))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evict_drops_stale_temporary_files(tmp_path):
+    cache = render_cache.RenderCache(str(tmp_path), max_bytes=1024, max_age_s=7 * 24 * 3600)
+    leftover = tmp_path / "ab" / "sobra.tmp"
+    leftover.parent.mkdir()
+    leftover.write_bytes(b"parcial")
+    past = time.time() - 2 * 3600
+    os.utime(leftover, (past, past))
+
+    cache.evict()
+
+    assert not leftover.exists()
+
+
+def test_key_depends_on_content_and_uploads_but_not_on_upload_order(tmp_path):
+    template = tmp_path / "template"
+    template.mkdir()
+    (template / "_quarto.yml").write_text("project:\n  type: default\n", encoding="utf-8")
+    a = Upload("a.png", "1" * 64)
+    b = Upload("b.png", "2" * 64)
+
+    key = render_cache.render_cache_key("## A", [a, b], str(template))
+
+    assert key == render_cache.render_cache_key("## A", [b, a], str(template))
+    assert key != render_cache.render_cache_key("## B", [a, b], str(template))
+    assert key != render_cache.render_cache_key("## A", [a], str(template))
+
+
+def test_date_today_is_resolved_before_hashing():
+    normalized = render_cache._normalize_qmd_for_key("---\ndate: today\n---\n")
+    assert "today" not in normalized
+    assert normalized == render_cache._normalize_qmd_for_key("---\ndate: today\n---\n")
@@ -0,0 +1,65 @@
+import os
+import re
+
+import pytest
+
+streamlit_testing = pytest.importorskip("streamlit.testing.v1")
+
+import artifacts  # noqa: E402
+import metrics  # noqa: E402
+import quarto_runner  # noqa: E402
+
+_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+
+def _renders_total() -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in metrics.RENDERS.samples())
+
+
+@pytest.fixture
+def setups(monkeypatch):
+    # O boot real baixaria o Quarto; aqui só conta quantas vezes roda
+    calls: list[int] = []
+
+    def setup_quarto_linux() -> str:
+        calls.append(1)
+        return "Quarto já instalado."
+
+    monkeypatch.setattr(quarto_runner, "setup_quarto_linux", setup_quarto_linux)
+    return calls
+
+
+@pytest.fixture
+def app(stub_quarto, setups):
+    import streamlit as st
+
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    return streamlit_testing.AppTest.from_file(_APP, default_timeout=60)
+
+
+def test_boot_runs_once_and_every_rerun_is_timed(app, setups):
+    app.run()
+    app.run()
+    app.run()
+
+    assert not app.exception
+    assert len(setups) == 1
+    assert len(app.session_state["rerun_ms"]) == 3
+
+
+def test_preview_keeps_only_the_artifact_id_and_reruns_do_not_render(app):
+    app.run()
+    next(b for b in app.button if "Atualizar Preview" in b.label).click().run()
+    assert not app.exception
+    state = app.session_state["preview_quarto"]
+    assert state["error"] == ""
+    assert re.fullmatch(r"[0-9a-f]{32}", state["artifact"])
+    assert artifacts.get_preview_store().path(state["artifact"])
+    assert not any(isinstance(value, bytes) for value in state.values())
+
+    renders = _renders_total()
+    app.run()
+
+    assert _renders_total() == renders
+    assert app.session_state["preview_quarto"]["artifact"] == state["artifact"]
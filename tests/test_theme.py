@@ -0,0 +1,56 @@
+import project_template
+import theme
+
+
+def test_css_statements_split_top_level_rules():
+    css = '@charset "UTF-8";\n/* comentário } */\n.a{color:red}\n@media (max-width:10px){.b{c:"}"}}\n'
+    assert theme._css_statements(css) == [
+        '@charset "UTF-8";',
+        ".a{color:red}",
+        '@media (max-width:10px){.b{c:"}"}}',
+    ]
+
+
+def test_theme_css_delta_keeps_only_what_the_full_theme_changes():
+    base = '@charset "UTF-8";\n.reveal{font-size:40px}\n.reveal h1{color:#000}\n.reveal a{color:blue}\n'
+    full = (
+        '@charset "UTF-8";\n@import url("fonte.css");\n.reveal{font-size:40px}\n'
+        ".reveal h1{color:green}\n.reveal a{color:blue}\n.ufs-capa{color:green}\n"
+    )
+    assert theme.theme_css_delta(base, full) == (
+        '@import url("fonte.css");\n.reveal h1{color:green}\n.ufs-capa{color:green}\n'
+    )
+
+
+def test_theme_css_delta_repeats_unchanged_rule_after_changed_selector():
+    # A segunda regra de `h1` não mudou, mas precisa vir depois da primeira (alterada) para a cascata valer
+    base = "h1{color:black}\nh1{margin:0}\n"
+    full = "h1{color:green}\nh1{margin:0}\n"
+    assert theme.theme_css_delta(base, full) == "h1{color:green}\nh1{margin:0}\n"
+
+
+def test_project_config_drops_theme_and_css_only_in_the_workspace(tmp_path):
+    template = tmp_path / "template"
+    work_dir = tmp_path / "projeto"
+    template.mkdir()
+    work_dir.mkdir()
+    config = (
+        "format:\n  revealjs:\n    logo: logo.png\n    theme:\n      - simple\n      - ufs.scss\n"
+        '    css: "./custom.css"\n    width: 1280\n'
+    )
+    (template / "_quarto.yml").write_text(config, encoding="utf-8")
+    project_template.copy_template(str(template), str(work_dir), mode="link")
+
+    project_template.write_project_config(str(template), str(work_dir))
+
+    assert (work_dir / "_quarto.yml").read_text(encoding="utf-8") == (
+        "format:\n  revealjs:\n    logo: logo.png\n    width: 1280\n"
+    )
+    assert (template / "_quarto.yml").read_text(encoding="utf-8") == config
+
+
+def test_generated_qmd_picks_the_theme():
+    with_bundle = project_template.build_qmd_content("T", "", "", "## A", theme_css="ufs-theme-abc.css")
+    assert "    theme: simple\n    css: assets/ufs-theme-abc.css\n" in with_bundle
+    without_bundle = project_template.build_qmd_content("T", "", "", "## A")
+    assert "    theme: [simple, assets/ufs.scss]\n    css: assets/custom.css\n" in without_bundle
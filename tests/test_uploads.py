@@ -0,0 +1,159 @@
+import io
+import os
+import time
+import zlib
+
+import pytest
+
+import uploads
+from project_template import SLIDE_HEIGHT, SLIDE_WIDTH
+
+
+def _jpeg_segment(marker: int, payload: bytes) -> bytes:
+    return bytes([0xFF, marker]) + (len(payload) + 2).to_bytes(2, "big") + payload
+
+
+def _png_chunk(chunk_type: bytes, payload: bytes) -> bytes:
+    crc = zlib.crc32(chunk_type + payload).to_bytes(4, "big")
+    return len(payload).to_bytes(4, "big") + chunk_type + payload + crc
+
+
+def test_strip_metadata_drops_jpeg_exif_and_comments():
+    app0 = _jpeg_segment(0xE0, b"JFIF\x00\x01\x01")
+    app2 = _jpeg_segment(0xE2, b"ICC_PROFILE\x00")
+    scan = b"\xff\xda\x00\x08dados comprimidos\xff\xd9"
+    data = (
+        b"\xff\xd8" + app0 + _jpeg_segment(0xE1, b"Exif\x00\x00GPS") + app2
+        + _jpeg_segment(0xFE, b"comentario") + scan
+    )
+
+    assert uploads._strip_metadata("JPEG", data) == b"\xff\xd8" + app0 + app2 + scan
+
+
+def test_strip_metadata_drops_png_text_and_exif_chunks():
+    ihdr = _png_chunk(b"IHDR", b"\x00" * 13)
+    idat = _png_chunk(b"IDAT", b"pixels")
+    iend = _png_chunk(b"IEND", b"")
+    data = (
+        uploads._PNG_SIGNATURE + ihdr + _png_chunk(b"tEXt", b"Author\x00Fulano")
+        + _png_chunk(b"eXIf", b"MM\x00*") + idat + iend
+    )
+
+    assert uploads._strip_metadata("PNG", data) == uploads._PNG_SIGNATURE + ihdr + idat + iend
+
+
+@pytest.mark.parametrize("image_format, data", [
+    ("JPEG", b"nao e jpeg"),
+    ("JPEG", b"\xff\xd8\xff\xe1\xff\xff curto"),
+    ("JPEG", b"\xff\xd8" + _jpeg_segment(0xE0, b"JFIF")),  # sem os dados da imagem
+    ("PNG", b"nao e png"),
+    ("PNG", uploads._PNG_SIGNATURE + _png_chunk(b"IHDR", b"\x00" * 13)),  # sem IEND
+])
+def test_strip_metadata_rejects_unexpected_structure(image_format, data):
+    assert uploads._strip_metadata(image_format, data) is None
+
+
+@pytest.fixture
+def Image():
+    return pytest.importorskip("PIL.Image")
+
+
+def _photo(Image, size: tuple[int, int], orientation: int = 1) -> bytes:
+    img = Image.new("RGB", size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "Camera"
+    out = io.BytesIO()
+    img.save(out, "JPEG", exif=exif.tobytes())
+    return out.getvalue()
+
+
+def test_optimize_image_fits_the_slide_and_drops_exif(Image):
+    optimized = uploads.optimize_image("foto.jpg", _photo(Image, (3000, 2000)))
+
+    with Image.open(io.BytesIO(optimized)) as img:
+        assert img.width <= SLIDE_WIDTH and img.height <= SLIDE_HEIGHT
+        assert not img.getexif()
+
+
+def test_optimize_image_applies_the_exif_rotation(Image):
+    optimized = uploads.optimize_image("foto.jpg", _photo(Image, (200, 100), orientation=6))
+
+    with Image.open(io.BytesIO(optimized)) as img:
+        assert img.size == (100, 200)
+        assert not img.getexif()
+
+
+def test_optimize_image_leaves_gifs_and_broken_files_alone():
+    assert uploads.optimize_image("anim.gif", b"GIF89a...") == b"GIF89a..."
+    assert uploads.optimize_image("quebrada.png", b"\x89PNG lixo") == b"\x89PNG lixo"
+
+
+def _idle(store: uploads.BlobStore, digest: str, seconds: float) -> None:
+    past = time.time() - seconds
+    os.utime(store.path(digest), (past, past))
+
+
+def test_blob_store_keeps_one_read_only_copy_per_content(tmp_path):
+    store = uploads.BlobStore(str(tmp_path), ttl_s=3600)
+
+    first = store.put(b"mesma imagem")
+    second = store.put(b"mesma imagem")
+
+    assert first == second
+    assert store.read(first) == b"mesma imagem"
+    assert store.stats()["blobs"] == 1
+    if os.name == "posix":
+        assert not os.stat(store.path(first)).st_mode & 0o222
+
+
+def test_sweep_keeps_referenced_blobs_and_removes_idle_ones(tmp_path):
+    store = uploads.BlobStore(str(tmp_path), ttl_s=60)
+    em_uso = store.put(b"ligada num workspace")
+    solta = store.put(b"sem referencia")
+    store.acquire(em_uso)
+    store.acquire(em_uso)
+    store.release(em_uso)
+    _idle(store, em_uso, 120)
+    _idle(store, solta, 120)
+
+    store.sweep(force=True)
+
+    assert store.exists(em_uso)
+    assert not store.exists(solta)
+
+    store.release(em_uso)
+    _idle(store, em_uso, 120)
+    store.sweep(force=True)
+    assert not store.exists(em_uso)
+
+
+def test_prepare_uploads_dedups_identical_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "_blob_store", uploads.BlobStore(str(tmp_path / "blobs"), ttl_s=3600))
+
+    prepared = uploads.prepare_uploads([("a.gif", b"GIF89a mesma"), ("b.gif", b"GIF89a mesma")])
+
+    assert [upload.name for upload in prepared] == ["a.gif", "b.gif"]
+    assert prepared[0].digest == prepared[1].digest
+    assert uploads.get_blob_store().stats()["blobs"] == 1
+
+
+def test_prepare_uploads_reuses_known_streamlit_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "_blob_store", uploads.BlobStore(str(tmp_path / "blobs"), ttl_s=3600))
+
+    class UploadedFile:
+        # Só o necessário do UploadedFile do Streamlit
+        file_id = "arquivo-123"
+        name = "logo.gif"
+        size = 12
+        reads = 0
+
+        def getbuffer(self) -> bytes:
+            UploadedFile.reads += 1
+            return b"GIF89a logo!"
+
+    first = uploads.prepare_uploads([UploadedFile()])
+    second = uploads.prepare_uploads([UploadedFile()])
+
+    assert first == second
+    assert UploadedFile.reads == 1
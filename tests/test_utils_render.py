@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+
+import quarto_runner
+import utils_render
+
+
+def _render(conteudo: str, **kwargs):
+    return utils_render.render_quarto(
+        titulo="Fases", subtitulo="", instituto="", conteudo=conteudo, uploaded_files=None, **kwargs
+    )
+
+
+def test_render_reports_time_per_phase(stub_quarto):
+    html_bytes, erro, debug = _render("## Fases do render\n\nmiss")
+
+    assert erro is None
+    for name in ("uploads", "qmd_build", "cache_lookup", "workspace", "queue_wait", "quarto", "find_html", "read_back", "total"):
+        assert name in debug["timings"], name
+    assert debug["timings"]["total"] >= debug["timings"]["quarto"]
+    assert debug["output_bytes"] == len(html_bytes)
+    assert debug["cache"] == "miss"
+
+
+def test_cache_hit_skips_quarto_but_keeps_timings(stub_quarto):
+    _render("## Fases do render\n\nhit")
+
+    html_bytes, erro, debug = _render("## Fases do render\n\nhit")
+
+    assert erro is None and debug["cache"] == "hit"
+    assert "quarto" not in debug["timings"]
+    assert debug["output_bytes"] == len(html_bytes)
+
+
+def test_engine_rejects_unknown_backends():
+    with pytest.raises(ValueError):
+        utils_render.RenderEngine(backend="pandoc")
+    with pytest.raises(ValueError):
+        utils_render.RenderEngine().render(
+            titulo="T", subtitulo="", instituto="", conteudo="## A", uploaded_files=None, backend="pandoc"
+        )
+
+
+def test_engine_default_backend_applies_to_every_render():
+    engine = utils_render.RenderEngine(backend="draft")
+
+    html_bytes, erro, debug = engine.render(
+        titulo="Rascunho", subtitulo="", instituto="", conteudo="## Via motor", uploaded_files=None
+    )
+
+    assert erro is None and debug["backend"] == "draft"
+    assert b"Via motor" in html_bytes
+
+
+def test_session_renders_reuse_the_workspace(stub_quarto):
+    engine = utils_render.RenderEngine()
+    session_id = engine.new_session()
+    kwargs = {"titulo": "Sessão", "subtitulo": "", "instituto": "", "uploaded_files": None, "use_cache": False}
+    try:
+        _html, _erro, first = engine.render(conteudo="## Um", session_id=session_id, **kwargs)
+        _html, _erro, second = engine.render(conteudo="## Dois", session_id=session_id, **kwargs)
+    finally:
+        engine.release_session(session_id)
+
+    assert first["workspace"]["reused"] is False
+    assert second["workspace"]["reused"] is True
+    assert second["workspace"]["written"] == ["apresentacao.qmd"]
+
+
+def test_jobs_run_in_the_pool_and_keep_their_status():
+    jobs = utils_render.RenderJobs(max_workers=1, ttl_s=60)
+    running = threading.Event()
+    release = threading.Event()
+
+    def hold() -> None:
+        running.set()
+        release.wait(5)
+
+    try:
+        blocking = jobs.submit(hold)
+        queued = jobs.submit(lambda: ("pronto", 200))
+        failing = jobs.submit(lambda: 1 / 0)
+        running.wait(5)
+
+        assert jobs.get(queued)["status"] == "queued"
+        assert jobs.get(queued)["position"] == 1
+        release.set()
+
+        assert jobs.get(blocking, wait_s=5)["status"] == "done"
+        assert jobs.get(queued, wait_s=5)["result"] == ("pronto", 200)
+        failed = jobs.get(failing, wait_s=5)
+        assert failed["status"] == "error" and "division" in failed["error"]
+        assert jobs.get("nao-existe") is None
+        assert jobs.stats()["done"] == 2 and jobs.stats()["error"] == 1
+    finally:
+        release.set()
+        jobs.shutdown()
+
+
+def test_finished_jobs_expire_after_the_ttl():
+    jobs = utils_render.RenderJobs(max_workers=1, ttl_s=0)
+    try:
+        first = jobs.submit(lambda: "ok")
+        jobs.get(first, wait_s=5)
+        time.sleep(0.01)
+        jobs.submit(lambda: "outro")
+
+        assert jobs.get(first) is None
+    finally:
+        jobs.shutdown()
+
+
+def test_readiness_waits_for_the_warmup(stub_quarto, monkeypatch):
+    monkeypatch.setattr(utils_render, "setup_quarto_linux", lambda: "Quarto já instalado.")
+    engine = utils_render.RenderEngine()
+    assert engine.readiness()["ready"] is False
+
+    state = engine.warmup()
+
+    assert state["state"] == "ready"
+    assert state["quarto_version"] == "1.8.27-stub"
+    assert {"version", "theme", "render"} <= set(state["timings"])
+    readiness = engine.readiness()
+    assert readiness["ready"] is True
+    assert set(readiness["capacity"]) == {"free_slots", "limit", "waiting", "queue_limit", "saturated"}
+
+
+def test_warmup_without_quarto_leaves_the_engine_not_ready(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils_render, "setup_quarto_linux", lambda: "sem rede no teste")
+    monkeypatch.setenv("PATH", str(tmp_path))
+    quarto_runner._quarto_version_for.cache_clear()
+    engine = utils_render.RenderEngine()
+    try:
+        state = engine.warmup()
+    finally:
+        quarto_runner._quarto_version_for.cache_clear()
+
+    assert state["state"] == "failed"
+    assert "Quarto não encontrado" in state["error"]
+    assert engine.readiness()["ready"] is False
+
+
+def test_start_warmup_is_skipped_when_disabled(monkeypatch):
+    monkeypatch.setattr(utils_render, "WARMUP_ENABLED", False)
+    engine = utils_render.RenderEngine()
+
+    engine.start_warmup()
+
+    assert engine.readiness()["warmup"] == {"state": "ready", "skipped": True}
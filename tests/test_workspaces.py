@@ -0,0 +1,114 @@
+import os
+import time
+
+import pytest
+
+import uploads
+import workspaces
+from uploads import Upload
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "template"
+    (path / "Figuras").mkdir(parents=True)
+    (path / "_quarto.yml").write_text("format:\n  revealjs:\n    width: 1280\n", encoding="utf-8")
+    (path / "Figuras" / "logo.png").write_bytes(b"logo do template")
+    return path
+
+
+@pytest.fixture
+def blob_store(tmp_path, monkeypatch):
+    store = uploads.BlobStore(str(tmp_path / "blobs"), ttl_s=3600)
+    monkeypatch.setattr(uploads, "_blob_store", store)
+    return store
+
+
+def test_sync_writes_only_what_changed(tmp_path, template, blob_store):
+    workspace = workspaces.Workspace(str(tmp_path / "ws"))
+
+    first = workspace.sync(str(template), "## A", [])
+    again = workspace.sync(str(template), "## A", [])
+    edited = workspace.sync(str(template), "## B", [])
+
+    assert first["reused"] is False and "apresentacao.qmd" in first["written"]
+    assert again["reused"] is True and again["written"] == []
+    assert edited["reused"] is True and edited["written"] == ["apresentacao.qmd"]
+    assert (tmp_path / "ws" / "projeto" / "apresentacao.qmd").read_text(encoding="utf-8") == "## B"
+
+
+def test_sync_starts_over_when_the_template_changes(tmp_path, template, blob_store):
+    workspace = workspaces.Workspace(str(tmp_path / "ws"))
+    workspace.sync(str(template), "## A", [])
+
+    (template / "_quarto.yml").write_text("format:\n  revealjs:\n    width: 1920\n    height: 1080\n", encoding="utf-8")
+    info = workspace.sync(str(template), "## A", [])
+
+    assert info["reused"] is False
+    assert "apresentacao.qmd" in info["written"]
+
+
+def test_sync_removes_stale_output(tmp_path, template, blob_store):
+    workspace = workspaces.Workspace(str(tmp_path / "ws"))
+    workspace.sync(str(template), "## A", [])
+    (tmp_path / "ws" / "projeto" / "apresentacao.html").write_text("deck antigo", encoding="utf-8")
+
+    workspace.sync(str(template), "## A", [])
+
+    assert not (tmp_path / "ws" / "projeto" / "apresentacao.html").exists()
+
+
+def test_dropped_upload_restores_the_template_image(tmp_path, template, blob_store):
+    workspace = workspaces.Workspace(str(tmp_path / "ws"))
+    digest = blob_store.put(b"logo enviado")
+    figura = tmp_path / "ws" / "projeto" / "Figuras" / "logo.png"
+
+    workspace.sync(str(template), "## A", [Upload("logo.png", digest)])
+    assert figura.read_bytes() == b"logo enviado"
+    assert blob_store.stats()["referenced"] == 1
+
+    workspace.sync(str(template), "## A", [])
+    assert figura.read_bytes() == b"logo do template"
+    assert blob_store.stats()["referenced"] == 0
+
+
+def test_manager_reuses_the_session_workspace(tmp_path, template, blob_store):
+    manager = workspaces.WorkspaceManager(str(tmp_path / "wss"), idle_ttl_s=3600, max_bytes=10**9)
+
+    with manager.acquire("sessao") as first:
+        first.sync(str(template), "## A", [])
+    with manager.acquire("sessao") as second:
+        info = second.sync(str(template), "## A", [])
+
+    assert first is second
+    assert info["reused"] is True
+    assert manager.stats()["workspaces"] == 1
+
+
+def test_cleanup_expires_idle_workspaces(tmp_path, template, blob_store):
+    manager = workspaces.WorkspaceManager(str(tmp_path / "wss"), idle_ttl_s=60, max_bytes=10**9)
+    with manager.acquire("parada") as workspace:
+        workspace.sync(str(template), "## A", [])
+    workspace.last_used = time.time() - 120
+
+    manager.cleanup(force=True)
+
+    assert manager.stats()["workspaces"] == 0
+    assert not os.path.exists(workspace.root)
+
+
+def test_cleanup_keeps_the_disk_budget_dropping_least_recent_first(tmp_path, template, blob_store):
+    manager = workspaces.WorkspaceManager(str(tmp_path / "wss"), idle_ttl_s=3600, max_bytes=10**9)
+    roots = {}
+    for i, session_id in enumerate(("antiga", "nova")):
+        with manager.acquire(session_id) as workspace:
+            workspace.sync(str(template), "## A", [])
+        workspace.last_used = time.time() - 100 + i * 10
+        roots[session_id] = workspace.root
+    # Cabe só um workspace
+    manager.max_bytes = workspaces._dir_size(roots["nova"])
+
+    manager.cleanup(force=True)
+
+    assert not os.path.exists(roots["antiga"])
+    assert os.path.exists(roots["nova"])
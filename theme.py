@@ -0,0 +1,203 @@
+"""Tema pré-compilado: o SCSS do IFS vira um bundle CSS versionado, fora do template."""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from hashlib import sha256
+
+from admission import RenderBusyError, get_admission
+from project_template import TEMPLATE_MATERIALIZE_MODE, build_qmd_content, copy_template, write_project_config
+from quarto_runner import RenderLimitError, get_quarto_binary, get_quarto_version, run_governed
+from utils_fs import atomic_write, clone_file, safe_rmtree
+
+
+# Bundle CSS do tema (scripts/build_theme.py ou aquecimento); fica fora do template versionado
+THEME_DIR = os.environ.get("GERADOR_THEME_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_theme"
+)
+
+THEME_SOURCES = ("assets/ufs.scss", "assets/custom.css")
+THEME_BUNDLE_PREFIX = "ufs-theme-"
+
+_theme_build_lock = threading.Lock()
+_theme_build_thread: threading.Thread | None = None
+# Evita recompilar em loop quando o Quarto não está disponível: bundle -> instante da falha
+_theme_build_failures: dict[str, float] = {}
+THEME_BUILD_RETRY_S = 600.0
+
+def theme_bundle_name(template_path: str) -> str:
+    """Nome do bundle CSS para a versão atual do SCSS/CSS e do Quarto."""
+    h = sha256(get_quarto_version().encode("utf-8"))
+    for rel_path in THEME_SOURCES:
+        with open(os.path.join(template_path, rel_path), "rb") as f:
+            h.update(b"\0" + rel_path.encode("utf-8") + b"\0" + f.read())
+    return f"{THEME_BUNDLE_PREFIX}{h.hexdigest()[:12]}.css"
+
+def find_theme_bundle(template_path: str) -> str | None:
+    try:
+        name = theme_bundle_name(template_path)
+    except OSError:
+        return None
+    return name if os.path.exists(os.path.join(THEME_DIR, name)) else None
+
+def _css_statements(css: str) -> list[str]:
+    """Divide um CSS nas regras/at-rules de nível mais alto (comentários descartados)."""
+    statements: list[str] = []
+    current: list[str] = []
+    depth = 0
+    i = 0
+    while i < len(css):
+        ch = css[i]
+        if css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = len(css) if end < 0 else end + 2
+            continue
+        if ch in "\"'":
+            end = i + 1
+            while end < len(css) and css[end] != ch:
+                end += 2 if css[end] == "\\" else 1
+            current.append(css[i:end + 1])
+            i = end + 1
+            continue
+        current.append(ch)
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        if depth == 0 and ch in ";}":
+            statement = "".join(current).strip()
+            if statement and statement != ";":
+                statements.append(statement)
+            current = []
+        i += 1
+    tail = "".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+def theme_css_delta(base_css: str, full_css: str) -> str:
+    """O que o tema completo (simple + ufs.scss) acrescenta ou muda em relação ao "simple" puro.
+
+    Servido depois do "simple" que o Quarto gera, reproduz o tema completo sem repetir o que já
+    está lá. Uma regra sem mudança volta junto quando o seletor dela foi alterado antes, para a
+    ordem da cascata continuar a mesma; @import/@charset vão para o topo.
+    """
+    remaining: dict[str, int] = {}
+    for statement in _css_statements(base_css):
+        remaining[statement] = remaining.get(statement, 0) + 1
+
+    head: list[str] = []
+    body: list[str] = []
+    changed_selectors: set[str] = set()
+    for statement in _css_statements(full_css):
+        selector = statement.split("{", 1)[0].strip()
+        if remaining.get(statement):
+            remaining[statement] -= 1
+            if selector not in changed_selectors:
+                continue
+        else:
+            changed_selectors.add(selector)
+        if statement.startswith(("@import", "@charset")):
+            head.append(statement)
+        else:
+            body.append(statement)
+    return "\n".join(head + body) + "\n"
+
+def build_theme_bundle(template_path: str) -> tuple[str | None, str | None]:
+    """Compila o tema uma vez e grava em THEME_DIR o bundle (diferença do ufs.scss + custom.css).
+
+    Retorna (nome do bundle, erro).
+    """
+    name = theme_bundle_name(template_path)
+    target = os.path.join(THEME_DIR, name)
+    if os.path.exists(target):
+        return name, None
+
+    env = os.environ.copy()
+    env["QUARTO_PYTHON"] = sys.executable
+    cmd = [get_quarto_binary(), "render", "apresentacao.qmd", "--to", "revealjs", "--output-dir", "."]
+    compiled: dict[str, str] = {}
+    # Diretório descartável próprio: o tema não passa pelos workspaces de sessão nem pelos uploads
+    with tempfile.TemporaryDirectory(prefix="gerador_tema_", ignore_cleanup_errors=True) as work_dir:
+        copy_template(template_path, work_dir, mode=TEMPLATE_MATERIALIZE_MODE)
+        write_project_config(template_path, work_dir)
+        qmd_path = os.path.join(work_dir, "apresentacao.qmd")
+        # Duas compilações: só o "simple" (o que o Quarto continua gerando) e o tema completo
+        # (o css do cabeçalho não entra no tema compilado; custom.css serve de marcador para o "simple")
+        for variant, theme_css in (("base", "custom.css"), ("full", None)):
+            qmd = build_qmd_content("Tema", "", "", "## Tema\n", theme_css=theme_css)
+            atomic_write(qmd_path, qmd.encode("utf-8"))
+            safe_rmtree(os.path.join(work_dir, "apresentacao_files"))
+            try:
+                with get_admission().slot():
+                    result = run_governed(cmd, work_dir, env)
+            except (RenderBusyError, RenderLimitError) as exc:
+                return None, str(exc)
+            except FileNotFoundError:
+                return None, "Comando 'quarto' não encontrado."
+
+            # Sem --embed-resources o Quarto deixa o tema compilado em *_files/libs/revealjs/dist/theme/
+            found: list[str] = []
+            for root, _dirs, files in os.walk(work_dir):
+                if root.replace(os.sep, "/").endswith("revealjs/dist/theme"):
+                    found.extend(os.path.join(root, f) for f in files if f.startswith("quarto") and f.endswith(".css"))
+            if result.returncode != 0 or len(found) != 1:
+                return None, f"Falha ao compilar o tema (exit={result.returncode}): {result.stderr[-2000:]}"
+            with open(found[0], encoding="utf-8") as f:
+                compiled[variant] = f.read()
+    with open(os.path.join(template_path, "assets", "custom.css"), encoding="utf-8") as f:
+        custom_css = f.read()
+
+    bundle = (
+        "/* assets/ufs.scss (diferença em relação ao tema simple) */\n"
+        + theme_css_delta(compiled["base"], compiled["full"])
+        + "\n/* assets/custom.css */\n"
+        + custom_css
+    )
+    os.makedirs(THEME_DIR, exist_ok=True)
+    atomic_write(target, bundle.encode("utf-8"))
+    # Bundles de versões anteriores do tema não servem mais
+    for old in os.listdir(THEME_DIR):
+        if old.startswith(THEME_BUNDLE_PREFIX) and old != name:
+            try:
+                os.remove(os.path.join(THEME_DIR, old))
+            except OSError:
+                pass
+    return name, None
+
+def install_theme_bundle(work_dir: str, name: str) -> bool:
+    """Liga o bundle de THEME_DIR em assets/ do workspace, ao lado das imagens que o custom.css usa."""
+    target = os.path.join(work_dir, "assets", name)
+    if os.path.exists(target):
+        return False
+    clone_file(os.path.join(THEME_DIR, name), target)
+    return True
+
+def ensure_theme_bundle(template_path: str) -> str | None:
+    """Retorna o bundle do tema se já existir; senão dispara a compilação em segundo plano.
+
+    Enquanto o bundle não fica pronto, as renderizações continuam usando o SCSS diretamente.
+    """
+    global _theme_build_thread
+    bundle = find_theme_bundle(template_path)
+    if bundle:
+        return bundle
+
+    def build() -> None:
+        try:
+            _bundle, err = build_theme_bundle(template_path)
+        except Exception as exc:
+            err = str(exc)
+        if err:
+            with _theme_build_lock:
+                _theme_build_failures[template_path] = time.time()
+
+    with _theme_build_lock:
+        failed_at = _theme_build_failures.get(template_path, 0.0)
+        idle = _theme_build_thread is None or not _theme_build_thread.is_alive()
+        if idle and time.time() - failed_at > THEME_BUILD_RETRY_S:
+            _theme_build_thread = threading.Thread(target=build, name="theme-bundle", daemon=True)
+            _theme_build_thread.start()
+    return None
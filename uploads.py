@@ -0,0 +1,332 @@
+"""Uploads: blobs endereçados por conteúdo e otimização das imagens para a resolução dos slides."""
+
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any, NamedTuple
+
+from project_template import SLIDE_HEIGHT, SLIDE_WIDTH
+from render_cache import get_image_cache
+from utils_fs import atomic_write
+
+try:
+    from PIL import Image, ImageOps  # opcional: sem Pillow as imagens vão como foram enviadas
+except ImportError:
+    Image = None  # type: ignore[assignment]
+    ImageOps = None  # type: ignore[assignment]
+
+try:
+    from PIL import ImageCms  # opcional: sem LittleCMS, CMYK vira RGB sem o perfil de cor
+except ImportError:
+    ImageCms = None  # type: ignore[assignment]
+
+
+# Uploads deduplicados por conteúdo, compartilhados entre workspaces
+BLOBS_DIR = os.environ.get("GERADOR_BLOBS_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_blobs"
+)
+BLOB_TTL_S = float(os.environ.get("GERADOR_BLOB_TTL_H", "24")) * 3600
+
+
+class Upload(NamedTuple):
+    """Upload já preparado: nome no Figuras/ e hash do conteúdo (id no BlobStore)."""
+
+    name: str
+    digest: str
+
+
+class BlobStore:
+    """Uploads endereçados por conteúdo: cada imagem distinta existe uma única vez em disco.
+
+    Os workspaces ligam (hardlink) os blobs em Figuras/ e seguram uma referência enquanto
+    os usam; blobs sem referência e sem uso há mais de `ttl_s` são removidos.
+    """
+
+    def __init__(self, root_dir: str, ttl_s: float, sweep_interval_s: float = 60.0) -> None:
+        self.root_dir = root_dir
+        self.ttl_s = ttl_s
+        self.sweep_interval_s = sweep_interval_s
+        self._refs: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, data: bytes, digest: str | None = None) -> str:
+        digest = digest or sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+            if os.name == "posix":
+                # Somente leitura: o blob é compartilhado por hardlink com vários workspaces
+                os.chmod(path, 0o444)
+        self.sweep()
+        return digest
+
+    def read(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def acquire(self, digest: str) -> None:
+        with self._lock:
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+
+    def release(self, digest: str) -> None:
+        with self._lock:
+            count = self._refs.get(digest, 0) - 1
+            if count > 0:
+                self._refs[digest] = count
+            else:
+                self._refs.pop(digest, None)
+        try:
+            os.utime(self.path(digest))
+        except OSError:
+            pass
+
+    def sweep(self, force: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sweep < self.sweep_interval_s:
+                return
+            self._last_sweep = now
+            referenced = set(self._refs)
+        for root, _dirs, files in os.walk(self.root_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    idle = now - os.path.getmtime(path) > self.ttl_s
+                    if idle and name not in referenced:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict[str, Any]:
+        blobs = 0
+        total = 0
+        for root, _dirs, files in os.walk(self.root_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                    blobs += 1
+                except OSError:
+                    pass
+        with self._lock:
+            referenced = len(self._refs)
+        return {"blobs": blobs, "bytes": total, "referenced": referenced}
+
+
+_blob_store: BlobStore | None = None
+_blob_store_lock = threading.Lock()
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(BLOBS_DIR, BLOB_TTL_S)
+        return _blob_store
+
+def read_upload(uploaded_file: Any) -> tuple[str, bytes]:
+    """Normaliza um upload (Streamlit UploadedFile, werkzeug FileStorage ou tupla nome/bytes)."""
+    if isinstance(uploaded_file, tuple):
+        name, data = uploaded_file
+        return os.path.basename(name), bytes(data)
+
+    name = getattr(uploaded_file, "name", None) or getattr(uploaded_file, "filename", None) or ""
+    if hasattr(uploaded_file, "getbuffer"):
+        data = bytes(uploaded_file.getbuffer())
+    else:
+        stream = getattr(uploaded_file, "stream", uploaded_file)
+        if hasattr(stream, "seek"):
+            stream.seek(0)
+        data = stream.read()
+    return os.path.basename(name), data
+
+
+# --- Otimização das imagens enviadas ---------------------------------------------------------
+
+# Versão dos parâmetros de otimização (entra na chave do cache: mudar aqui invalida tudo)
+IMAGE_OPTIMIZE_VERSION = f"v2-{SLIDE_WIDTH}x{SLIDE_HEIGHT}-q85"
+_OPTIMIZABLE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+
+
+def _image_key(name: str, data: bytes) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    return sha256(f"{IMAGE_OPTIMIZE_VERSION}\0{ext}\0".encode("utf-8") + data).hexdigest()
+
+# JPEG: segmentos de metadados (EXIF/XMP em APP1, IPTC em APP13, comentários). APP0 (JFIF),
+# APP2 (ICC) e APP14 (Adobe, necessário para decodificar CMYK) ficam
+_JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+# PNG: chunks auxiliares só de metadados (EXIF, texto, data)
+_PNG_METADATA_CHUNKS = {b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _strip_metadata(image_format: str, data: bytes) -> bytes | None:
+    """Remove EXIF/GPS/texto sem recomprimir. None se o arquivo não tiver a estrutura esperada."""
+    out = bytearray()
+    if image_format == "JPEG":
+        if data[:2] != b"\xff\xd8":
+            return None
+        out += data[:2]
+        pos = 2
+        while pos + 4 <= len(data):
+            if data[pos] != 0xFF:
+                return None
+            marker = data[pos + 1]
+            if marker == 0xDA:  # início dos dados comprimidos: o resto vai inteiro
+                return bytes(out + data[pos:])
+            length = int.from_bytes(data[pos + 2:pos + 4], "big")
+            if length < 2 or pos + 2 + length > len(data):
+                return None
+            if marker not in _JPEG_METADATA_MARKERS:
+                out += data[pos:pos + 2 + length]
+            pos += 2 + length
+        return None
+    if not data.startswith(_PNG_SIGNATURE):
+        return None
+    out += _PNG_SIGNATURE
+    pos = len(_PNG_SIGNATURE)
+    while pos + 12 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], "big")
+        chunk_type = data[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if end > len(data):
+            return None
+        if chunk_type not in _PNG_METADATA_CHUNKS:
+            out += data[pos:end]
+        pos = end
+        if chunk_type == b"IEND":
+            return bytes(out)
+    return None
+
+def _color_family(mode: str) -> str:
+    if mode in ("1", "L", "LA", "La", "I", "I;16", "F"):
+        return "gray"
+    if mode == "CMYK":
+        return "cmyk"
+    return "rgb"  # RGB, RGBA, RGBX, P/PA (paleta em RGB)
+
+def _to_rgb(img: Any, icc_profile: bytes | None) -> tuple[Any, bytes | None]:
+    """Converte para RGB; o perfil ICC só segue junto se continuar descrevendo as cores."""
+    if img.mode in ("RGB", "L"):
+        return img, icc_profile
+    if img.mode == "CMYK" and icc_profile and ImageCms is not None:
+        try:
+            # Converte pelas cores do perfil CMYK para sRGB (o padrão sem perfil embutido)
+            source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            return ImageCms.profileToProfile(img, source, ImageCms.createProfile("sRGB"), outputMode="RGB"), None
+        except Exception:
+            pass
+    converted = img.convert("RGB")
+    same_family = _color_family(img.mode) == "rgb"
+    return converted, icc_profile if same_family else None
+
+def optimize_image(name: str, data: bytes) -> bytes:
+    """Reduz a imagem à resolução do slide, remove metadados e recomprime.
+
+    O resultado nunca carrega EXIF/GPS: se a recompressão não ficar menor que o original, vale o
+    original sem os segmentos de metadados (quando a imagem não precisou girar nem mudar de cor).
+    GIFs (possivelmente animados) e formatos desconhecidos passam intactos. O cache por hash
+    (cada imagem é processada uma única vez) fica em prepare_uploads.
+    """
+    image_format = _OPTIMIZABLE_FORMATS.get(os.path.splitext(name)[1].lower())
+    if Image is None or image_format is None:
+        return data
+
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            icc_profile = original.info.get("icc_profile")
+            untouched = original.getexif().get(0x0112, 1) == 1
+            # Aplica a rotação do EXIF antes de descartá-lo (fotos de celular)
+            img = ImageOps.exif_transpose(original)
+            if img.width > SLIDE_WIDTH or img.height > SLIDE_HEIGHT:
+                untouched = False
+                if img.mode == "P":
+                    img = img.convert("RGBA")
+                img.thumbnail((SLIDE_WIDTH, SLIDE_HEIGHT), Image.LANCZOS)
+            out = io.BytesIO()
+            if image_format == "JPEG":
+                if img.mode not in ("RGB", "L"):
+                    untouched = False
+                    img, icc_profile = _to_rgb(img, icc_profile)
+                img.save(out, "JPEG", quality=85, optimize=True, progressive=True, icc_profile=icc_profile)
+            else:
+                if _color_family(img.mode) != _color_family(original.mode):
+                    icc_profile = None
+                img.save(out, "PNG", optimize=True, icc_profile=icc_profile)
+    except Exception:
+        # Arquivo corrompido ou formato inesperado: deixa o Quarto lidar com o original
+        return data
+
+    optimized = out.getvalue()
+    stripped = _strip_metadata(image_format, data) if untouched else None
+    return stripped if stripped is not None and len(stripped) <= len(optimized) else optimized
+
+
+# Hash calculado uma única vez por upload do Streamlit (file_id é estável entre reruns)
+_UPLOAD_MEMO_MAX = 1024
+_upload_memo: "OrderedDict[tuple, Upload]" = OrderedDict()
+_upload_memo_lock = threading.Lock()
+
+def _upload_memo_key(uploaded_file: Any) -> tuple | None:
+    file_id = getattr(uploaded_file, "file_id", None)
+    if not file_id:
+        return None
+    return (file_id, getattr(uploaded_file, "name", ""), getattr(uploaded_file, "size", None))
+
+def prepare_uploads(uploaded_files: list[Any] | None) -> list[Upload]:
+    """Lê os uploads, otimiza as imagens e guarda o resultado no BlobStore.
+
+    Uploads do Streamlit já vistos (mesmo file_id) não são relidos nem rehashados.
+    """
+    store = get_blob_store()
+    image_cache = get_image_cache()
+    uploads: list[Upload] = []
+    for uploaded_file in uploaded_files or []:
+        if isinstance(uploaded_file, Upload):
+            uploads.append(uploaded_file)
+            continue
+
+        memo_key = _upload_memo_key(uploaded_file)
+        if memo_key is not None:
+            with _upload_memo_lock:
+                known = _upload_memo.get(memo_key)
+                if known is not None:
+                    _upload_memo.move_to_end(memo_key)
+            if known is not None and store.exists(known.digest):
+                uploads.append(known)
+                continue
+
+        name, data = read_upload(uploaded_file)
+        key = _image_key(name, data)
+        cached_digest = image_cache.get(key)
+        if cached_digest is not None and store.exists(cached_digest.decode("ascii")):
+            digest = cached_digest.decode("ascii")
+        else:
+            optimized = optimize_image(name, data)
+            digest = store.put(optimized)
+            try:
+                image_cache.put(key, digest.encode("ascii"))
+                # Reenviar o arquivo já otimizado cai no mesmo blob
+                image_cache.put(_image_key(name, optimized), digest.encode("ascii"))
+            except OSError:
+                pass
+
+        upload = Upload(name, digest)
+        uploads.append(upload)
+        if memo_key is not None:
+            with _upload_memo_lock:
+                _upload_memo[memo_key] = upload
+                while len(_upload_memo) > _UPLOAD_MEMO_MAX:
+                    _upload_memo.popitem(last=False)
+    return uploads
@@ -0,0 +1,73 @@
+"""Operações de arquivo compartilhadas pelo motor: gravação atômica, clone sem cópia e remoção com novas tentativas."""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem reflink
+    fcntl = None  # type: ignore[assignment]
+
+
+def _reflink(src: str, dst: str) -> bool:
+    # FICLONE (Btrfs/XFS/overlayfs): o destino compartilha os blocos até alguém escrever nele
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    ficlone = 0x40049409
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), ficlone, fsrc.fileno())
+    except OSError:
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+def clone_file(src: str, dst: str) -> str:
+    """Materializa src em dst sem copiar bytes quando possível; retorna o método usado."""
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        # EXDEV (outro sistema de arquivos), EPERM etc.
+        pass
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    # Grava em arquivo temporário + os.replace: leitores nunca veem arquivo parcial
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def safe_rmtree(path: str, attempts: int = 6, delay_s: float = 0.25) -> None:
+    if not os.path.exists(path):
+        return
+    last_exc: Exception | None = None
+    for _ in range(attempts):
+        try:
+            shutil.rmtree(path)
+            return
+        except Exception as exc:
+            last_exc = exc
+            time.sleep(delay_s)
+    try:
+        shutil.rmtree(path, ignore_errors=True)
+    except Exception:
+        if last_exc:
+            raise last_exc
@@ -1,192 +1,67 @@
+"""Motor de renderização: o RenderEngine e o pipeline do Quarto, sobre os subsistemas dos módulos vizinhos.
+
+Flask, Streamlit, build_site e os scripts entram por aqui (get_render_engine/render_quarto); cache,
+workspaces, fila, daemons, artefatos e preview ficam cada um no seu módulo.
+"""
+
+import functools
 import os
-import shutil
-import subprocess
 import sys
-import tempfile
+import threading
 import time
-import requests
-import tarfile
-from typing import Any
-from pathlib import Path
-
-
-def get_quarto_binary() -> str:
-    """Retorna o caminho do executável do Quarto, priorizando instalação local no Linux."""
-    # 1. Verifica instalação local (Streamlit Cloud / Linux)
-    if os.name == 'posix':
-        QUARTO_VERSION = "1.8.27"
-        INSTALL_DIR = Path.home() / ".quarto_local"
-        EXTRACTED_FOLDER_NAME = f"quarto-{QUARTO_VERSION}-linux-amd64"
-        QUARTO_EXEC = INSTALL_DIR / EXTRACTED_FOLDER_NAME / "bin" / "quarto"
-        if QUARTO_EXEC.exists():
-            return str(QUARTO_EXEC)
-
-    # 2. Verifica se está no PATH global
-    if shutil.which('quarto'):
-        return 'quarto'
-    
-    # 3. Retorna 'quarto' como fallback (vai falhar se não existir)
-    return 'quarto'
-
-def setup_quarto_linux():
-    """Baixa e configura o Quarto CLI no Linux se não estiver presente."""
-    if os.name != 'posix':
-        return "Windows/Mac detectado (não é Linux)." # Apenas para Linux (Streamlit Cloud)
-
-    # Configuração local
-    QUARTO_VERSION = "1.8.27"
-    INSTALL_DIR = Path.home() / ".quarto_local"
-    EXTRACTED_FOLDER_NAME = f"quarto-{QUARTO_VERSION}-linux-amd64"
-    QUARTO_BIN_DIR = INSTALL_DIR / EXTRACTED_FOLDER_NAME / "bin"
-    QUARTO_EXEC = QUARTO_BIN_DIR / "quarto"
-    
-    # Tenta adicionar o PATH imediatamente, caso já exista
-    if QUARTO_BIN_DIR.exists():
-         os.environ["PATH"] = str(QUARTO_BIN_DIR) + os.pathsep + os.environ["PATH"]
-
-    if QUARTO_EXEC.exists():
-        # Tenta garantir execução
-        try:
-            QUARTO_EXEC.chmod(0o755)
-            # Testa execução rápida
-            subprocess.run([str(QUARTO_EXEC), "--version"], check=True, capture_output=True)
-            return "Quarto já instalado e verificado."
-        except Exception as e:
-            # Se falhar, removemos para tentar instalar novamente na próxima execução (ou agora se continuasse)
-            # Mas como estamos no return, vamos apenas avisar e limpar.
-            shutil.rmtree(INSTALL_DIR, ignore_errors=True)
-            return f"Quarto corrompido detectado e removido. Recarregue a página para tentar reinstalar. Erro: {e}"
-
-    # Se system quarto existir
-    if shutil.which('quarto'):
-        return "Quarto encontrado no PATH do sistema."
-
-    print(f"Instalando Quarto CLI v{QUARTO_VERSION} no Linux...")
-    url = f"https://github.com/quarto-dev/quarto-cli/releases/download/v{QUARTO_VERSION}/quarto-{QUARTO_VERSION}-linux-amd64.tar.gz"
-    
-    try:
-        # Aumentando timeout para 120s para evitar falhas em conexões lentas
-        response = requests.get(url, stream=True, timeout=120)
-        if response.status_code == 200:
-            # Limpa dir anterior se existir (reinstalação limpa)
-            if INSTALL_DIR.exists():
-                shutil.rmtree(INSTALL_DIR)
-                
-            INSTALL_DIR.mkdir(parents=True, exist_ok=True)
-            tar_path = INSTALL_DIR / "quarto.tar.gz"
-            
-            with open(tar_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            with tarfile.open(tar_path, "r:gz") as tar:
-                tar.extractall(path=INSTALL_DIR)
-            
-            # Limpeza do arquivo tar.gz após extração
-            if tar_path.exists():
-                os.remove(tar_path)
-
-            if QUARTO_EXEC.exists():
-                os.environ["PATH"] = str(QUARTO_BIN_DIR) + os.pathsep + os.environ["PATH"]
-                QUARTO_EXEC.chmod(0o755) 
-                return f"Instalação do Quarto v{QUARTO_VERSION} realizada com sucesso."
-            else:
-                # Debug: listar pastas criadas
-                found = list(INSTALL_DIR.glob("**/*"))
-                return f"Falha: executável não encontrado após extração. Conteúdo de {INSTALL_DIR}: {found}"
-        else:
-            return f"Erro HTTP {response.status_code} ao baixar Quarto."
-    except Exception as e:
-        return f"Exceção na instalação do Quarto: {e}"
-
-def copy_template(src: str, dst: str) -> None:
-    ignore = shutil.ignore_patterns(
-        ".quarto",
-        "_site",
-        "*.html",
-        "*.pdf",
-        "*.log",
-    )
-    shutil.copytree(src, dst, dirs_exist_ok=True, ignore=ignore)
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from hashlib import sha256
+from typing import Any, Callable, Iterable, Iterator
+
+import metrics
+from admission import RenderAdmission, RenderBusyError, get_admission
+from artifacts import (
+    ASSETS_URL,
+    PREVIEW_LINKED_ASSETS,
+    ArtifactStore,
+    AssetStore,
+    close_artifact_stores,
+    get_artifact_store,
+    get_asset_store,
+    get_preview_store,
+    link_assets,
+    linked_assets_available,
+)
+from batch_render import render_many
+from preview_render import PREVIEW_DEBOUNCE_S, BackgroundRenderer, render_preview
+from profiling import PROFILE_CPROFILE, PROFILE_DIR, RenderProfile, current_profile, phase, should_profile
+from project_template import TEMPLATE_DIR, build_qmd_content, find_rendered_html
+from quarto_runner import (
+    QuartoDaemonPool,
+    RenderCancelledError,
+    RenderLimitError,
+    check_cancelled,
+    get_quarto_binary,
+    get_quarto_daemon_pool,
+    get_quarto_version,
+    quarto_daemon_stats,
+    run_quarto,
+    setup_quarto_linux,
+    stop_all_quarto_daemons,
+)
+from render_cache import RenderCache, get_image_cache, get_render_cache, get_slide_cache, render_cache_key
+from theme import build_theme_bundle, ensure_theme_bundle
+from uploads import get_blob_store, prepare_uploads
+from workspaces import WorkspaceManager, get_workspace_manager, new_session_id
+
+
+# "quarto" (final) ou "draft" (rascunho em Python puro, ver draft_render.py)
+RENDER_BACKENDS = ("quarto", "draft")
+
+# Renderizações em segundo plano (API assíncrona do Flask)
+RENDER_WORKERS = int(os.environ.get("GERADOR_RENDER_WORKERS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+RENDER_JOB_TTL_S = float(os.environ.get("GERADOR_JOB_TTL_MIN", "30")) * 60
+
+# Aquecimento na partida (Flask/Streamlit): verifica o Quarto, compila o tema e renderiza um deck pequeno
+WARMUP_ENABLED = os.environ.get("GERADOR_WARMUP", "1").strip().lower() in ("1", "true", "yes", "sim")
 
-def safe_rmtree(path: str, attempts: int = 6, delay_s: float = 0.25) -> None:
-    if not os.path.exists(path):
-        return
-    last_exc: Exception | None = None
-    for _ in range(attempts):
-        try:
-            shutil.rmtree(path)
-            return
-        except Exception as exc:
-            last_exc = exc
-            time.sleep(delay_s)
-    try:
-        shutil.rmtree(path, ignore_errors=True)
-    except Exception:
-        if last_exc:
-            raise last_exc
-
-def find_rendered_html(work_dir: str) -> str | None:
-    candidates = [
-        os.path.join(work_dir, "apresentacao.html"),
-        os.path.join(work_dir, "_site", "apresentacao.html"),
-        os.path.join(work_dir, "_site", "index.html"),
-    ]
-    for candidate in candidates:
-        if os.path.exists(candidate):
-            return candidate
-
-    found_html: list[str] = []
-    found_apresentacao: list[str] = []
-    for root, dirs, files in os.walk(work_dir):
-        dirs[:] = [d for d in dirs if d not in {".quarto", "node_modules"}]
-        for filename in files:
-            if filename.lower().endswith(".html"):
-                full_path = os.path.join(root, filename)
-                found_html.append(full_path)
-                if filename.lower() == "apresentacao.html":
-                    found_apresentacao.append(full_path)
-
-    if found_apresentacao:
-        found_apresentacao.sort(key=lambda p: p.count(os.sep))
-        return found_apresentacao[0]
-
-    if len(found_html) == 1:
-        return found_html[0]
-
-    for p in found_html:
-        if p.lower().endswith(os.sep + "_site" + os.sep + "index.html"):
-            return p
-
-    return None
-
-def build_qmd_content(titulo: str, subtitulo: str, instituto: str, conteudo: str) -> str:
-    return f"""---
-title: "{titulo}"
-subtitle: "{subtitulo}"
-institute: "{instituto}"
-date: today
-date-format: "D [de] MMMM [de] YYYY"
-lang: pt-BR
-title-slide-attributes:
-  class: title-slide
-format:
-  revealjs:
-    theme: [simple, assets/ufs.scss]
-    css: assets/custom.css
-    logo: assets/logo_IFS.png
-    footer: "IFS | Apresentação do TCC"
-    slide-number: true
-    controls: true
-    width: 1280
-    height: 720
-    transition: slide
-    background-transition: fade
-    preview-links: auto
----
-
-{conteudo}
-"""
 
 def render_quarto(
     *,
@@ -195,38 +70,95 @@ def render_quarto(
     instituto: str,
     conteudo: str,
     uploaded_files: list[Any] | None,
-    output_dir: str | None = None
+    output_dir: str | None = None,
+    use_cache: bool = True,
+    session_id: str | None = None,
+    backend: str = "quarto",
+    profile: bool | None = None,
+    embed: bool = True,
+    assets: "AssetStore | None" = None,
+    assets_url: str = ASSETS_URL,
 ) -> tuple[bytes | None, str | None, dict[str, Any]]:
-    # Se output_dir não for None, usamos ele como diretório de trabalho persistente (não temp)
-    # Mas atenção: para streamlit usamos temp.
-    # Vamos manter a lógica original: cria temp, renderiza, retorna bytes.
-    # Mas se output_dir for fornecido (para build estático), copiamos o resultado para lá.
-    
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    template_path = os.path.join(base_path, "template")
+    """Atalho para get_render_engine().render(...) (veja RenderEngine.render)."""
+    return get_render_engine().render(
+        titulo=titulo,
+        subtitulo=subtitulo,
+        instituto=instituto,
+        conteudo=conteudo,
+        uploaded_files=uploaded_files,
+        output_dir=output_dir,
+        use_cache=use_cache,
+        session_id=session_id,
+        backend=backend,
+        profile=profile,
+        embed=embed,
+        assets=assets,
+        assets_url=assets_url,
+    )
+
 
+def _render_with_quarto(
+    *,
+    titulo: str,
+    subtitulo: str,
+    instituto: str,
+    conteudo: str,
+    uploaded_files: list[Any] | None,
+    output_dir: str | None,
+    use_cache: bool,
+    session_id: str | None,
+    embed: bool = True,
+    assets: "AssetStore | None" = None,
+    assets_url: str = ASSETS_URL,
+) -> tuple[bytes | None, str | None, dict[str, Any]]:
+    template_path = TEMPLATE_DIR
+    assets = assets or get_asset_store()
     if not os.path.isdir(template_path):
         return None, "Pasta 'template' não encontrada dentro do projeto.", {}
 
-    tmpdirname = tempfile.mkdtemp(prefix="gerador_apresentacao_")
-    try:
-        work_dir = os.path.join(tmpdirname, "projeto")
-        copy_template(template_path, work_dir)
-
-        figuras_dir = os.path.join(work_dir, "Figuras")
-        os.makedirs(figuras_dir, exist_ok=True)
-
-        if uploaded_files:
-            for uploaded_file in uploaded_files:
-                # uploaded_file pode ser Streamlit UploadedFile ou arquivo normal se adaptarmos
-                pass 
-                # Nota: Na versao "util", uploaded_files pode ser quebrado se usarmos fora do Streamlit.
-                # Para o script de build, vamos assumir que as imagens ja estao em template/Figuras se for o caso.
-
-        qmd_content = build_qmd_content(titulo, subtitulo, instituto, conteudo)
-        qmd_path = os.path.join(work_dir, "apresentacao.qmd")
-        with open(qmd_path, "w", encoding="utf-8") as f:
-            f.write(qmd_content)
+    # Tempo (s) de cada fase, devolvido em debug["timings"]
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    with phase(timings, "uploads"):
+        uploads = prepare_uploads(uploaded_files)
+    with phase(timings, "qmd_build"):
+        theme_bundle = ensure_theme_bundle(template_path)
+        qmd_content = build_qmd_content(titulo, subtitulo, instituto, conteudo, theme_css=theme_bundle)
+
+    cache_key = ""
+    if use_cache:
+        with phase(timings, "cache_lookup"):
+            cache = get_render_cache()
+            cache_key = render_cache_key(qmd_content, uploads, template_path)
+            if not embed:
+                linked = f"{cache_key}\0linked\0{assets_url}\0{assets.root_dir}"
+                cache_key = sha256(linked.encode("utf-8")).hexdigest()
+            cached_html = cache.get(cache_key)
+            if cached_html is not None and not embed and not linked_assets_available(cached_html, assets, assets_url):
+                cached_html = None  # ativos já varridos do AssetStore: renderiza de novo
+        if cached_html is not None:
+            debug_hit: dict[str, Any] = {
+                "stdout": "", "stderr": "", "exit_code": 0, "cache": "hit",
+                "timings": timings, "output_bytes": len(cached_html),
+            }
+            if output_dir:
+                with phase(timings, "output_write"):
+                    os.makedirs(output_dir, exist_ok=True)
+                    with open(os.path.join(output_dir, "index.html"), "wb") as f:
+                        f.write(cached_html)
+                timings["total"] = round(time.perf_counter() - started, 4)
+                return None, None, debug_hit
+            timings["total"] = round(time.perf_counter() - started, 4)
+            return cached_html, None, debug_hit
+
+    manager = get_workspace_manager()
+    workspace_ctx = manager.acquire(session_id) if session_id else manager.ephemeral()
+    with workspace_ctx as workspace:
+        with phase(timings, "workspace"):
+            # O QMD só é gravado com a vaga (write_qmd, em run_quarto): gravá-lo aqui já dispararia o daemon
+            workspace_info = workspace.sync(template_path, None, uploads, theme_bundle)
+        timings.update(workspace_info.pop("timings"))
+        work_dir = workspace.work_dir
 
         # Determina o comando do Quarto
         quarto_cmd = get_quarto_binary()
@@ -237,26 +169,48 @@ def render_quarto(
             "apresentacao.qmd",
             "--to",
             "revealjs",
-            "--embed-resources", 
+            "--embed-resources",
             "--output-dir",
             ".",
         ]
-        
-        # Se for para salvar em output_dir, talvez não queiramos --embed-resources se for deployment com multiplos assets?
-        # Mas o user pediu "como site". Single file é mais fácil. Vamos manter embed-resources.
+        if not embed:
+            # Preview linkado: as bibliotecas e imagens ficam em arquivos e vão para o AssetStore
+            cmd.remove("--embed-resources")
 
         env = os.environ.copy()
         env["QUARTO_PYTHON"] = sys.executable
 
         try:
-            result = subprocess.run(
-                cmd,
-                cwd=work_dir,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                check=False,
-                env=env,
+            resources: dict[str, Any] = {}
+            check_cancelled()
+            with get_admission().slot() as queue_wait_s, phase(timings, "quarto"):
+                # Cancelada enquanto esperava vaga: nem começa
+                check_cancelled()
+                # Com sessão, o daemon do workspace evita a partida a frio do Quarto (ele sempre embute)
+                persistent = session_id is not None and embed
+
+                def write_input() -> bool:
+                    written = workspace.write_qmd(qmd_content)
+                    if written:
+                        workspace_info["written"].append("apresentacao.qmd")
+                    return written
+
+                result, via_daemon = run_quarto(
+                    cmd, work_dir, env, persistent=persistent, write_input=write_input, resources=resources,
+                    profile=current_profile(),
+                )
+        except RenderCancelledError as exc:
+            return None, str(exc), {"stdout": "", "stderr": "", "exit_code": None, "cancelled": True, "timings": timings}
+        except RenderLimitError as exc:
+            return None, str(exc), {
+                "stdout": exc.stdout, "stderr": exc.stderr, "exit_code": None, "limit": exc.reason,
+                "resources": resources, "timings": timings,
+            }
+        except RenderBusyError as exc:
+            return (
+                None,
+                f"Servidor ocupado gerando outras apresentações. Tente novamente em {exc.retry_after_s} s.",
+                {"stdout": "", "stderr": str(exc), "exit_code": None, "busy": True, "retry_after": exc.retry_after_s},
             )
         except FileNotFoundError:
             return (
@@ -265,27 +219,449 @@ def render_quarto(
                 {"stdout": "", "stderr": "", "exit_code": None},
             )
 
-        html_file = find_rendered_html(work_dir)
+        timings["queue_wait"] = round(queue_wait_s, 4)
+        with phase(timings, "find_html"):
+            html_file = find_rendered_html(work_dir)
         debug: dict[str, Any] = {
             "stdout": result.stdout,
             "stderr": result.stderr,
             "exit_code": result.returncode,
+            "cache": "miss" if use_cache else "off",
+            "workspace": workspace_info,
+            "queue_wait_s": round(queue_wait_s, 3),
+            "quarto_daemon": via_daemon,
+            "resources": resources,
+            "timings": timings,
         }
 
         if not html_file:
+            timings["total"] = round(time.perf_counter() - started, 4)
             return None, "Arquivo HTML não foi gerado.", debug
-        
-        if output_dir:
-             # Para build script: copia o gerado para o destino
-             os.makedirs(output_dir, exist_ok=True)
-             shutil.copy(html_file, os.path.join(output_dir, "index.html"))
-             
-             # Copia ativos se necessário? Com embed-resources = true, não precisa.
-             return None, None, debug
-
-        with open(html_file, "rb") as f:
-            html_bytes = f.read()
-
-        return html_bytes, None, debug
-    finally:
-        safe_rmtree(tmpdirname)
+
+        with phase(timings, "read_back"):
+            with open(html_file, "rb") as f:
+                html_bytes = f.read()
+        if not embed and result.returncode == 0:
+            with phase(timings, "link_assets"):
+                html_bytes, debug["assets"] = link_assets(html_bytes, os.path.dirname(html_file), assets_url, assets)
+        debug["output_bytes"] = len(html_bytes)
+
+    if use_cache and result.returncode == 0:
+        with phase(timings, "cache_store"):
+            try:
+                get_render_cache().put(cache_key, html_bytes)
+            except OSError:
+                # Cache é otimização: disco cheio/sem permissão não pode derrubar a renderização
+                pass
+
+    if output_dir:
+        # Para build script: copia o gerado para o destino (com embed-resources não há ativos extras)
+        with phase(timings, "output_write"):
+            os.makedirs(output_dir, exist_ok=True)
+            with open(os.path.join(output_dir, "index.html"), "wb") as f:
+                f.write(html_bytes)
+        timings["total"] = round(time.perf_counter() - started, 4)
+        return None, None, debug
+
+    timings["total"] = round(time.perf_counter() - started, 4)
+    return html_bytes, None, debug
+
+
+# --- Estatísticas dos caches (todos os subsistemas) -------------------------------------------
+
+def render_cache_stats() -> dict[str, Any]:
+    return {
+        "decks": get_render_cache().stats(),
+        "slides": get_slide_cache().stats(),
+        "images": get_image_cache().stats(),
+        "blobs": get_blob_store().stats(),
+        "artifacts": get_artifact_store().stats(),
+        "previews": get_preview_store().stats(),
+    }
+
+
+# render_cache_stats percorre todos os diretórios: as métricas reaproveitam a última varredura
+# por alguns segundos (uma varredura serve às duas séries e a coletas seguidas)
+CACHE_STATS_TTL_S = 30.0
+_cache_stats_snapshot: tuple[float, dict[str, Any]] | None = None
+_cache_stats_lock = threading.Lock()
+
+def _cached_render_cache_stats() -> dict[str, Any]:
+    global _cache_stats_snapshot
+    with _cache_stats_lock:
+        if _cache_stats_snapshot is None or time.monotonic() - _cache_stats_snapshot[0] > CACHE_STATS_TTL_S:
+            _cache_stats_snapshot = (time.monotonic(), render_cache_stats())
+        return _cache_stats_snapshot[1]
+
+def _cache_gauge(field: str) -> Callable[[], dict[tuple[str, ...], float]]:
+    # O BlobStore conta entradas em "blobs"; os RenderCache, em "entries"
+    return lambda: {
+        (name,): stats.get(field, stats.get("blobs", 0)) for name, stats in _cached_render_cache_stats().items()
+    }
+
+metrics.gauge("gerador_cache_bytes", "Bytes ocupados em disco por cache", ("cache",)).set_function(_cache_gauge("bytes"))
+metrics.gauge("gerador_cache_entries", "Entradas por cache", ("cache",)).set_function(_cache_gauge("entries"))
+
+
+# --- Jobs de renderização em segundo plano ---------------------------------------------------
+
+class RenderJobs:
+    """Executa renderizações num pool limitado de threads e guarda o status de cada job.
+
+    O Quarto roda em subprocesso, então threads bastam: o número de renderizações simultâneas
+    é limitado por `max_workers`, não pelo número de conexões HTTP.
+    """
+
+    def __init__(self, max_workers: int, ttl_s: float) -> None:
+        self.max_workers = max_workers
+        self.ttl_s = ttl_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        self._expire()
+        job_id = uuid.uuid4().hex
+        job: dict[str, Any] = {"id": job_id, "status": "queued", "created": time.time(), "result": None}
+
+        def run() -> Any:
+            with self._lock:
+                job["status"] = "running"
+                job["started"] = time.time()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                with self._lock:
+                    job["status"] = "error"
+                    job["error"] = str(exc)
+                    job["finished"] = time.time()
+                raise
+            with self._lock:
+                job["status"] = "done"
+                job["result"] = result
+                job["finished"] = time.time()
+            return result
+
+        with self._lock:
+            self._jobs[job_id] = job
+            job["future"] = self._executor.submit(run)
+        return job_id
+
+    def get(self, job_id: str, wait_s: float = 0.0) -> dict[str, Any] | None:
+        """Status do job; com wait_s > 0 espera (long-poll) até ele terminar ou o tempo acabar."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future: Future = job["future"]
+        if wait_s > 0:
+            try:
+                future.result(timeout=wait_s)
+            except FutureTimeoutError:
+                pass
+            except Exception:
+                # O erro já foi registrado no job
+                pass
+        with self._lock:
+            snapshot = {k: v for k, v in job.items() if k != "future"}
+            if snapshot["status"] == "queued":
+                snapshot["position"] = sum(
+                    1 for other in self._jobs.values()
+                    if other["status"] == "queued" and other["created"] <= job["created"]
+                )
+        return snapshot
+
+    def _expire(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in ("done", "error") and now - job.get("finished", now) > self.ttl_s
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.max_workers,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "done": statuses.count("done"),
+            "error": statuses.count("error"),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# --- Motor de renderização ----------------------------------------------------------------------
+
+# Deck de aquecimento: passa por Pandoc, filtros Lua, realce de código e embed, sem depender de rede
+WARMUP_DECK = "## Aquecimento\n\n- Item com **negrito** e `código`\n\n```python\nprint(\"ok\")\n```\n"
+
+
+class RenderEngine:
+    """Ponto de entrada único da renderização: Flask, Streamlit, build_site, lote e smoke test.
+
+    Guarda a configuração (backend padrão, pool de jobs) e o ciclo de vida dos recursos
+    compartilhados do processo: workspaces, caches, fila global, daemons do Quarto, jobs e
+    artefatos. Cache, pooling e limites de concorrência adicionados aqui valem para todos.
+    """
+
+    def __init__(
+        self,
+        backend: str = "quarto",
+        job_workers: int = RENDER_WORKERS,
+        job_ttl_s: float = RENDER_JOB_TTL_S,
+    ) -> None:
+        if backend not in RENDER_BACKENDS:
+            raise ValueError(f"backend inválido: {backend!r} (use {', '.join(RENDER_BACKENDS)})")
+        self.backend = backend
+        self.template_path = TEMPLATE_DIR
+        self.job_workers = job_workers
+        self.job_ttl_s = job_ttl_s
+        self._jobs: RenderJobs | None = None
+        self._lock = threading.Lock()
+        self._warmup: dict[str, Any] = {"state": "pending"}
+        self._warmup_thread: threading.Thread | None = None
+
+    # Recursos compartilhados (um por processo, criados sob demanda)
+
+    @property
+    def workspaces(self) -> WorkspaceManager:
+        return get_workspace_manager()
+
+    @property
+    def cache(self) -> RenderCache:
+        return get_render_cache()
+
+    @property
+    def admission(self) -> RenderAdmission:
+        return get_admission()
+
+    @property
+    def daemons(self) -> QuartoDaemonPool:
+        return get_quarto_daemon_pool()
+
+    @property
+    def artifacts(self) -> ArtifactStore:
+        return get_artifact_store()
+
+    @property
+    def previews(self) -> ArtifactStore:
+        return get_preview_store()
+
+    @property
+    def assets(self) -> AssetStore:
+        return get_asset_store()
+
+    @property
+    def jobs(self) -> RenderJobs:
+        """Pool de threads para renderizações em segundo plano (Flask)."""
+        with self._lock:
+            if self._jobs is None:
+                self._jobs = RenderJobs(max_workers=self.job_workers, ttl_s=self.job_ttl_s)
+            return self._jobs
+
+    # Sessões (workspaces persistentes)
+
+    def new_session(self) -> str:
+        return new_session_id()
+
+    def release_session(self, session_id: str) -> None:
+        self.workspaces.release(session_id)
+
+    # Renderização
+
+    def render(
+        self,
+        *,
+        titulo: str,
+        subtitulo: str,
+        instituto: str,
+        conteudo: str,
+        uploaded_files: list[Any] | None,
+        output_dir: str | None = None,
+        use_cache: bool = True,
+        session_id: str | None = None,
+        backend: str | None = None,
+        profile: bool | None = None,
+        embed: bool = True,
+        assets: "AssetStore | None" = None,
+        assets_url: str = ASSETS_URL,
+    ) -> tuple[bytes | None, str | None, dict[str, Any]]:
+        # Renderiza num workspace e retorna os bytes do HTML. Com session_id o workspace é
+        # reaproveitado entre chamadas (só o que mudou é regravado); sem ele, é temporário.
+        # Se output_dir for fornecido (build estático), o resultado é copiado para lá como index.html.
+        # Renderizações idênticas (mesmo QMD, imagens, template e versão do Quarto) vêm do cache em disco.
+        # backend="draft" gera um rascunho em Python puro, sem Quarto (preview ao vivo).
+        # Cada chamada alimenta as métricas de metrics.py (expostas em /metrics).
+        # profile=True (ou sorteio por GERADOR_PROFILE_RATE, se None) grava um RenderProfile em
+        # PROFILE_DIR e ignora o cache, para medir uma renderização real; o resumo vai em debug["profile"].
+        # embed=False (só Quarto) não embute reveal.js/fontes/imagens: o HTML aponta para o AssetStore
+        # (`assets`, padrão o do preview) pela URL base `assets_url`.
+        backend = backend or self.backend
+        if backend not in RENDER_BACKENDS:
+            raise ValueError(f"backend inválido: {backend!r} (use {', '.join(RENDER_BACKENDS)})")
+        kwargs: dict[str, Any] = {
+            "titulo": titulo,
+            "subtitulo": subtitulo,
+            "instituto": instituto,
+            "conteudo": conteudo,
+            "uploaded_files": uploaded_files,
+            "output_dir": output_dir,
+            "use_cache": use_cache,
+            "session_id": session_id,
+        }
+        render_profile = RenderProfile(PROFILE_DIR, cprofile=PROFILE_CPROFILE) if should_profile(profile) else None
+        if render_profile is not None:
+            kwargs["use_cache"] = False
+        started = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            with render_profile or nullcontext():
+                if backend == "draft":
+                    from draft_render import render_draft
+
+                    html_bytes, err, debug = render_draft(**kwargs)
+                else:
+                    html_bytes, err, debug = _render_with_quarto(
+                        **kwargs, embed=embed, assets=assets, assets_url=assets_url
+                    )
+        finally:
+            metrics.IN_FLIGHT.dec()
+        elapsed_s = time.perf_counter() - started
+        metrics.observe_render(backend, err, debug, elapsed_s)
+        if render_profile is not None:
+            try:
+                debug["profile"] = render_profile.write(backend, err, debug, elapsed_s)
+            except Exception as exc:
+                # Perfil é diagnóstico: falhar ao gravá-lo não derruba a renderização
+                debug["profile"] = {"id": render_profile.id, "error": str(exc)}
+        return html_bytes, err, debug
+
+    def preview(self, embed: bool | None = None, **kwargs: Any) -> tuple[bytes | None, str | None, dict[str, Any]]:
+        """Preview incremental por slide (veja render_preview); por padrão com ativos linkados."""
+        return render_preview(**kwargs, embed=not PREVIEW_LINKED_ASSETS if embed is None else embed)
+
+    def render_many(
+        self, decks: Iterable[dict[str, Any]], output_dir: str, workers: int | None = None
+    ) -> Iterator[dict[str, Any]]:
+        """Lote em processos separados (veja render_many); cada processo usa o próprio motor."""
+        return render_many(decks, output_dir, workers=workers)
+
+    def background(
+        self, session_id: str | None = None, debounce_s: float = PREVIEW_DEBOUNCE_S, embed: bool | None = None
+    ) -> BackgroundRenderer:
+        """Renderizador em segundo plano (debounce + cancelamento) do preview incremental de uma sessão."""
+        return BackgroundRenderer(functools.partial(self.preview, session_id=session_id, embed=embed), debounce_s)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        """Enfileira `fn` no pool de jobs e retorna o id do job."""
+        return self.jobs.submit(fn, *args, **kwargs)
+
+    # Ciclo de vida
+
+    def warmup(self) -> dict[str, Any]:
+        """Prepara o processo para a primeira renderização real (bloqueante).
+
+        Instala/verifica o Quarto uma vez, compila o tema e renderiza WARMUP_DECK sem cache,
+        aquecendo os caches do Deno/Pandoc e do disco. O resultado fica em readiness()["warmup"].
+        """
+        started = time.time()
+        timings: dict[str, float] = {}
+        with self._lock:
+            self._warmup = {"state": "running", "started_at": started}
+        state: dict[str, Any] = {"state": "ready"}
+        try:
+            with phase(timings, "setup"):
+                state["setup"] = setup_quarto_linux()
+            with phase(timings, "version"):
+                state["quarto_version"] = get_quarto_version()
+            if state["quarto_version"] == "desconhecida":
+                raise RuntimeError(f"Quarto não encontrado ({state['setup']})")
+            with phase(timings, "theme"):
+                _bundle, theme_err = build_theme_bundle(self.template_path)
+            if theme_err:
+                # Sem bundle o Quarto compila o SCSS a cada renderização: mais lento, mas funciona
+                state["theme_error"] = theme_err
+            with phase(timings, "render"):
+                _html, err, debug = self.render(
+                    titulo="Aquecimento",
+                    subtitulo="",
+                    instituto="",
+                    conteudo=WARMUP_DECK,
+                    uploaded_files=None,
+                    use_cache=False,
+                    backend="quarto",
+                    profile=False,
+                )
+            if err:
+                raise RuntimeError(f"{err} {(debug.get('stderr') or '')[-500:]}".strip())
+        except Exception as exc:
+            state = {"state": "failed", "error": str(exc)}
+        state.update(started_at=started, seconds=round(time.time() - started, 3), timings=timings)
+        with self._lock:
+            self._warmup = state
+        return state
+
+    def start_warmup(self) -> None:
+        """Dispara warmup() numa thread (uma vez por processo); sem GERADOR_WARMUP, o motor já nasce pronto."""
+        with self._lock:
+            if self._warmup_thread is not None or self._warmup["state"] != "pending":
+                return
+            if not WARMUP_ENABLED:
+                self._warmup = {"state": "ready", "skipped": True}
+                return
+            self._warmup_thread = threading.Thread(target=self.warmup, name="render-warmup", daemon=True)
+            self._warmup_thread.start()
+
+    def readiness(self) -> dict[str, Any]:
+        """Pronto = aquecimento concluído. Inclui a capacidade livre agora, para o balanceador."""
+        with self._lock:
+            warmup = dict(self._warmup)
+        admission = self.admission.stats()
+        return {
+            "ready": warmup["state"] == "ready",
+            "warmup": warmup,
+            "capacity": {
+                "free_slots": admission["free_slots"],
+                "limit": admission["limit"],
+                "waiting": admission["global_waiting"],
+                "queue_limit": admission["queue_limit"],
+                "saturated": self.admission.is_saturated(),
+            },
+        }
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "admission": self.admission.stats(),
+            "caches": render_cache_stats(),
+            "workspaces": self.workspaces.stats(),
+            "quarto_daemons": quarto_daemon_stats(),
+        }
+        if self._jobs is not None:
+            stats["jobs"] = self._jobs.stats()
+        return stats
+
+    def close(self) -> None:
+        """Encerra o pool de jobs, os daemons do Quarto e a limpeza dos artefatos (o que está em disco fica)."""
+        with self._lock:
+            jobs, self._jobs = self._jobs, None
+        if jobs is not None:
+            jobs.shutdown(wait=False)
+        stop_all_quarto_daemons()
+        close_artifact_stores()
+
+
+_render_engine: RenderEngine | None = None
+_render_engine_lock = threading.Lock()
+
+def get_render_engine() -> RenderEngine:
+    global _render_engine
+    with _render_engine_lock:
+        if _render_engine is None:
+            _render_engine = RenderEngine()
+        return _render_engine
@@ -0,0 +1,268 @@
+"""Workspaces do Quarto: um diretório incremental por sessão de edição, com expiração e orçamento de disco."""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from hashlib import sha256
+from typing import Any, Iterator
+
+from profiling import phase
+from project_template import TEMPLATE_MATERIALIZE_MODE, copy_template, template_fingerprint, write_project_config
+from quarto_runner import stop_quarto_daemon
+from theme import install_theme_bundle
+from uploads import Upload, get_blob_store
+from utils_fs import atomic_write, clone_file, safe_rmtree
+
+
+# Workspaces persistentes por sessão de edição
+WORKSPACES_DIR = os.environ.get("GERADOR_WORKSPACES_DIR") or os.path.join(
+    tempfile.gettempdir(), "gerador_apresentacao_workspaces"
+)
+WORKSPACE_IDLE_TTL_S = float(os.environ.get("GERADOR_WORKSPACE_TTL_MIN", "30")) * 60
+WORKSPACE_MAX_BYTES = int(float(os.environ.get("GERADOR_WORKSPACE_MAX_MB", "1024")) * 1024 * 1024)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class Workspace:
+    """Diretório de trabalho do Quarto reaproveitado entre renderizações de uma mesma sessão."""
+
+    def __init__(self, root: str, session_id: str | None = None) -> None:
+        self.root = root
+        self.session_id = session_id
+        self.work_dir = os.path.join(root, "projeto")
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self.template_fp: str | None = None
+        # caminho relativo -> sha256 do conteúdo que nós mesmos gravamos
+        self.written: dict[str, str] = {}
+        # caminho relativo em Figuras/ -> blob ligado ali (referência segura no BlobStore)
+        self.blobs: dict[str, str] = {}
+
+    def _link_blob(self, rel_path: str, digest: str) -> bool:
+        full_path = os.path.join(self.work_dir, rel_path)
+        if self.blobs.get(rel_path) == digest and os.path.exists(full_path):
+            return False
+        store = get_blob_store()
+        if os.path.lexists(full_path):
+            os.remove(full_path)
+        clone_file(store.path(digest), full_path)
+        store.acquire(digest)
+        previous = self.blobs.get(rel_path)
+        if previous:
+            store.release(previous)
+        self.blobs[rel_path] = digest
+        return True
+
+    def release_blobs(self) -> None:
+        store = get_blob_store()
+        for digest in self.blobs.values():
+            store.release(digest)
+        self.blobs = {}
+
+    def destroy(self) -> None:
+        stop_quarto_daemon(self.work_dir)
+        self.release_blobs()
+        safe_rmtree(self.root)
+
+    def _write_if_changed(self, rel_path: str, data: bytes) -> bool:
+        digest = sha256(data).hexdigest()
+        full_path = os.path.join(self.work_dir, rel_path)
+        if self.written.get(rel_path) == digest and os.path.exists(full_path):
+            return False
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        atomic_write(full_path, data)
+        self.written[rel_path] = digest
+        return True
+
+    def write_qmd(self, qmd_content: str) -> bool:
+        """Grava o QMD se mudou. Retorna se gravou (o daemon do workspace re-renderiza a cada gravação)."""
+        return self._write_if_changed("apresentacao.qmd", qmd_content.encode("utf-8"))
+
+    def sync(
+        self, template_path: str, qmd_content: str | None, uploads: list[Upload], theme_bundle: str | None = None
+    ) -> dict[str, Any]:
+        """Atualiza o workspace gravando apenas o que mudou desde a última renderização.
+
+        Com qmd_content=None o QMD fica para depois (Workspace.write_qmd), dentro da vaga de renderização.
+        """
+        timings: dict[str, float] = {}
+        info: dict[str, Any] = {"reused": True, "written": [], "timings": timings}
+        fingerprint = template_fingerprint(template_path)
+        if fingerprint != self.template_fp or not os.path.isdir(self.work_dir):
+            # Template novo (ou workspace recém-criado): recomeça do zero
+            stop_quarto_daemon(self.work_dir)
+            with phase(timings, "template_copy"):
+                safe_rmtree(self.work_dir)
+                info["materialize"] = copy_template(template_path, self.work_dir, mode=TEMPLATE_MATERIALIZE_MODE)
+                write_project_config(template_path, self.work_dir)
+            self.template_fp = fingerprint
+            self.written = {}
+            self.release_blobs()
+            info["reused"] = False
+
+        os.makedirs(os.path.join(self.work_dir, "Figuras"), exist_ok=True)
+        if theme_bundle and install_theme_bundle(self.work_dir, theme_bundle):
+            info["written"].append(theme_bundle)
+
+        if qmd_content is not None:
+            with phase(timings, "qmd_write"):
+                if self.write_qmd(qmd_content):
+                    info["written"].append("apresentacao.qmd")
+        current: set[str] = set()
+        with phase(timings, "upload_write"):
+            for upload in uploads:
+                rel_path = "Figuras/" + upload.name
+                current.add(rel_path)
+                if self._link_blob(rel_path, upload.digest):
+                    info["written"].append(rel_path)
+
+        # Imagens que deixaram de ser enviadas: remove (ou restaura a versão do template)
+        for rel_path in [p for p in self.blobs if p not in current]:
+            full_path = os.path.join(self.work_dir, rel_path)
+            original = os.path.join(template_path, rel_path)
+            try:
+                os.remove(full_path)
+                if os.path.exists(original):
+                    clone_file(original, full_path)
+            except OSError:
+                pass
+            get_blob_store().release(self.blobs.pop(rel_path))
+
+        # Saídas antigas não podem ser confundidas com o resultado desta renderização
+        for stale in ("apresentacao.html", os.path.join("_site", "apresentacao.html"), os.path.join("_site", "index.html")):
+            try:
+                os.remove(os.path.join(self.work_dir, stale))
+            except OSError:
+                pass
+
+        self.last_used = time.time()
+        return info
+
+
+class WorkspaceManager:
+    """Mantém um workspace por sessão, expira os ociosos e respeita um orçamento global de disco."""
+
+    def __init__(self, root_dir: str, idle_ttl_s: float, max_bytes: int, cleanup_interval_s: float = 60.0) -> None:
+        self.root_dir = root_dir
+        self.idle_ttl_s = idle_ttl_s
+        self.max_bytes = max_bytes
+        self.cleanup_interval_s = cleanup_interval_s
+        self._workspaces: dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _dir_for(self, session_id: str) -> str:
+        return os.path.join(self.root_dir, sha256(session_id.encode("utf-8")).hexdigest()[:16])
+
+    @contextmanager
+    def acquire(self, session_id: str) -> Iterator[Workspace]:
+        """Workspace exclusivo da sessão (renderizações da mesma sessão são serializadas)."""
+        self.cleanup()
+        with self._lock:
+            workspace = self._workspaces.get(session_id)
+            if workspace is None:
+                workspace = Workspace(self._dir_for(session_id), session_id)
+                self._workspaces[session_id] = workspace
+        with workspace.lock:
+            workspace.last_used = time.time()
+            try:
+                yield workspace
+            finally:
+                workspace.last_used = time.time()
+
+    @contextmanager
+    def ephemeral(self) -> Iterator[Workspace]:
+        """Workspace descartável (comportamento antigo: um diretório temporário por renderização)."""
+        workspace = Workspace(tempfile.mkdtemp(prefix="gerador_apresentacao_"))
+        try:
+            yield workspace
+        finally:
+            workspace.destroy()
+
+    def release(self, session_id: str) -> None:
+        with self._lock:
+            workspace = self._workspaces.pop(session_id, None)
+        if workspace is not None:
+            with workspace.lock:
+                workspace.destroy()
+
+    def cleanup(self, force: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_cleanup < self.cleanup_interval_s:
+                return
+            self._last_cleanup = now
+            candidates = list(self._workspaces.items())
+            known_dirs = {ws.root for _, ws in candidates}
+
+        # 1) Expira workspaces ociosos (e sobras de processos anteriores)
+        for session_id, workspace in candidates:
+            if now - workspace.last_used > self.idle_ttl_s and workspace.lock.acquire(blocking=False):
+                try:
+                    with self._lock:
+                        self._workspaces.pop(session_id, None)
+                    workspace.destroy()
+                finally:
+                    workspace.lock.release()
+        if os.path.isdir(self.root_dir):
+            for name in os.listdir(self.root_dir):
+                path = os.path.join(self.root_dir, name)
+                try:
+                    orphan = path not in known_dirs and now - os.path.getmtime(path) > self.idle_ttl_s
+                except OSError:
+                    continue
+                if orphan:
+                    safe_rmtree(path)
+
+        # 2) Orçamento de disco: remove os menos usados recentemente até caber
+        with self._lock:
+            active = sorted(self._workspaces.items(), key=lambda item: item[1].last_used)
+        sizes = {sid: _dir_size(ws.root) for sid, ws in active}
+        total = sum(sizes.values())
+        for session_id, workspace in active:
+            if total <= self.max_bytes:
+                break
+            if not workspace.lock.acquire(blocking=False):
+                continue
+            try:
+                with self._lock:
+                    self._workspaces.pop(session_id, None)
+                workspace.destroy()
+            finally:
+                workspace.lock.release()
+            total -= sizes[session_id]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            workspaces = list(self._workspaces.values())
+        return {
+            "workspaces": len(workspaces),
+            "bytes": sum(_dir_size(ws.root) for ws in workspaces),
+        }
+
+
+_workspace_manager: WorkspaceManager | None = None
+_workspace_manager_lock = threading.Lock()
+
+def get_workspace_manager() -> WorkspaceManager:
+    global _workspace_manager
+    with _workspace_manager_lock:
+        if _workspace_manager is None:
+            _workspace_manager = WorkspaceManager(WORKSPACES_DIR, WORKSPACE_IDLE_TTL_S, WORKSPACE_MAX_BYTES)
+        return _workspace_manager
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex